@@ -4,8 +4,11 @@ from .models import (
     AgentPromptConfig,
     KnowledgeChunk,
     KnowledgeDocument,
+    KnowledgeEmbeddingMigration,
     KnowledgeEntity,
+    KnowledgeIngestJob,
     KnowledgeRelation,
+    KnowledgeSourceFetch,
     McpAdapter,
     ModelEndpoint,
 )
@@ -13,8 +16,11 @@ from .models import (
 
 admin.site.register(KnowledgeDocument)
 admin.site.register(KnowledgeChunk)
+admin.site.register(KnowledgeEmbeddingMigration)
 admin.site.register(KnowledgeEntity)
+admin.site.register(KnowledgeIngestJob)
 admin.site.register(KnowledgeRelation)
+admin.site.register(KnowledgeSourceFetch)
 admin.site.register(ModelEndpoint)
 admin.site.register(McpAdapter)
 admin.site.register(AgentPromptConfig)
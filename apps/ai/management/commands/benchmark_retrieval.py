@@ -0,0 +1,168 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from apps.ai.services.quantization import QUANTIZATION_INT8, QUANTIZATION_NONE
+from apps.ai.services.retrieval import (
+    _token_contributions,
+    deterministic_embedding,
+    deterministic_embedding_scalar,
+    split_text_into_chunks,
+)
+from apps.ai.services.vector_index import MODE_ANN, MODE_EXACT, VectorIndex
+
+
+def synthetic_corpus(rows, dimension, clusters, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=rows)
+    matrix = centers[labels] + 0.35 * rng.standard_normal((rows, dimension)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.ascontiguousarray(matrix, dtype=np.float32), centers
+
+
+def synthetic_queries(centers, count, seed):
+    rng = np.random.default_rng(seed + 1)
+    picks = centers[rng.integers(0, centers.shape[0], size=count)]
+    queries = picks + 0.5 * rng.standard_normal(picks.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def synthetic_manual(words, vocabulary, seed):
+    # Zipf-distributed terms approximate the repetition of a real service manual.
+    rng = np.random.default_rng(seed)
+    terms = np.array([f"term{i}" for i in range(vocabulary)])
+    picks = np.minimum(rng.zipf(1.2, size=words) - 1, vocabulary - 1)
+    return " ".join(terms[picks].tolist())
+
+
+def percentile_ms(samples, percentile):
+    return round(float(np.percentile(np.asarray(samples) * 1000.0, percentile)), 3)
+
+
+def timed_search(index, queries, k, **kwargs):
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        hits = index.search(query, k, **kwargs)
+        latencies.append(time.perf_counter() - started)
+        results.append([chunk_id for chunk_id, _ in hits])
+    return results, latencies
+
+
+def recall_at_k(expected, actual, k):
+    overlaps = [len(set(truth[:k]) & set(found[:k])) / max(len(truth[:k]), 1) for truth, found in zip(expected, actual)]
+    return round(float(np.mean(overlaps)), 4)
+
+
+class Command(BaseCommand):
+    help = "Benchmark knowledge retrieval index variants on a synthetic corpus."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--suite", choices=["ann", "quantized", "deterministic"], default="ann")
+        parser.add_argument("--rows", type=int, default=100000)
+        parser.add_argument("--dimension", type=int, default=128)
+        parser.add_argument("--clusters", type=int, default=512)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--nprobe", type=int, default=8)
+        parser.add_argument("--rescore", type=int, default=256)
+        parser.add_argument("--seed", type=int, default=7)
+        parser.add_argument("--words", type=int, default=200000, help="Manual length for the deterministic suite.")
+        parser.add_argument("--vocabulary", type=int, default=20000)
+
+    def handle(self, *args, **options):
+        if options["suite"] == "deterministic":
+            self._run_deterministic(options)
+            return
+        matrix, centers = synthetic_corpus(options["rows"], options["dimension"], options["clusters"], options["seed"])
+        queries = synthetic_queries(centers, options["queries"], options["seed"])
+        self.stdout.write(f"corpus rows={matrix.shape[0]} dimension={matrix.shape[1]} queries={queries.shape[0]}")
+        getattr(self, f"_run_{options['suite']}")(matrix, queries, options)
+
+    def _report(self, label, latencies, **extra):
+        fields = " ".join(f"{key}={value}" for key, value in extra.items())
+        self.stdout.write(
+            f"{label:<10} p50_ms={percentile_ms(latencies, 50)} p99_ms={percentile_ms(latencies, 99)} {fields}".rstrip()
+        )
+
+    def _load(self, index, matrix):
+        chunk_ids = np.arange(matrix.shape[0], dtype=np.int64)
+        index.load_matrix(matrix.shape[1], matrix, chunk_ids, np.zeros_like(chunk_ids))
+        return index
+
+    def _run_ann(self, matrix, queries, options):
+        index = self._load(VectorIndex(quantization=QUANTIZATION_NONE), matrix)
+        k = options["k"]
+
+        exact, exact_latencies = timed_search(index, queries, k, mode=MODE_EXACT)
+        self._report("exact", exact_latencies, recall=1.0)
+
+        started = time.perf_counter()
+        index.search(queries[0], k, mode=MODE_ANN, nprobe=options["nprobe"])
+        build_seconds = time.perf_counter() - started
+        approximate, ann_latencies = timed_search(index, queries, k, mode=MODE_ANN, nprobe=options["nprobe"])
+        self._report(
+            index.resolve_mode(matrix.shape[1], MODE_ANN),
+            ann_latencies,
+            recall=recall_at_k(exact, approximate, k),
+            nprobe=options["nprobe"],
+            build_s=round(build_seconds, 2),
+        )
+
+    def _run_quantized(self, matrix, queries, options):
+        k = options["k"]
+        full = self._load(VectorIndex(quantization=QUANTIZATION_NONE), matrix)
+        exact, exact_latencies = timed_search(full, queries, k)
+        self._report("float32", exact_latencies, recall=1.0, memory_mb=round(full.nbytes() / 2**20, 1))
+
+        # Chunk ids are row positions, so rescoring reads full-precision rows straight from the matrix.
+        quantized = self._load(
+            VectorIndex(
+                quantization=QUANTIZATION_INT8,
+                rescore_candidates=options["rescore"],
+                vector_loader=lambda chunk_ids: (chunk_ids, matrix[chunk_ids]),
+            ),
+            matrix,
+        )
+        approximate, int8_latencies = timed_search(quantized, queries, k)
+        self._report(
+            "int8",
+            int8_latencies,
+            recall=recall_at_k(exact, approximate, k),
+            memory_mb=round(quantized.nbytes() / 2**20, 1),
+            rescore=options["rescore"],
+        )
+
+    def _run_deterministic(self, options):
+        manual = synthetic_manual(options["words"], options["vocabulary"], options["seed"])
+        chunks = split_text_into_chunks(manual, chunk_size=120, overlap=20)
+        self.stdout.write(f"manual words={options['words']} chunks={len(chunks)}")
+
+        timings = {}
+        outputs = {}
+        # Best of three passes. "bincount" starts each pass with an empty token cache, "warm" keeps it.
+        for label, embed, cold in (
+            ("scalar", deterministic_embedding_scalar, False),
+            ("bincount", deterministic_embedding, True),
+            ("warm", deterministic_embedding, False),
+        ):
+            runs = []
+            for _ in range(3):
+                if cold:
+                    _token_contributions.cache_clear()
+                started = time.perf_counter()
+                outputs[label] = [embed(chunk) for chunk in chunks]
+                runs.append(time.perf_counter() - started)
+            timings[label] = min(runs)
+        cache = _token_contributions.cache_info()
+
+        self.stdout.write(f"{'scalar':<10} total_ms={round(timings['scalar'] * 1000, 1)}")
+        for label in ("bincount", "warm"):
+            self.stdout.write(
+                f"{label:<10} total_ms={round(timings[label] * 1000, 1)} "
+                f"speedup={round(timings['scalar'] / timings[label], 2)}x "
+                f"identical={outputs['scalar'] == outputs[label]}"
+            )
+        self.stdout.write(f"token_cache hits={cache.hits} misses={cache.misses} size={cache.currsize}")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.ai.services.vector_index import VectorIndex
+
+
+class Command(BaseCommand):
+    help = "Write a versioned snapshot of chunk vectors and BM25 postings for fast worker warm starts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=None, help="Defaults to KNOWLEDGE_INDEX_SNAPSHOT_PATH.")
+        parser.add_argument("--quantization", default=None, help="Defaults to KNOWLEDGE_VECTOR_QUANTIZATION.")
+
+    def handle(self, *args, **options):
+        index = VectorIndex(quantization=options["quantization"], shared_path="", snapshot_path=options["path"])
+        if not index.snapshot_path:
+            raise CommandError("Set KNOWLEDGE_INDEX_SNAPSHOT_PATH or pass --path.")
+        stats = index.export_snapshot()
+        self.stdout.write(
+            f"exported {stats['path']} version={stats['version']} rows={stats['rows']} bytes={stats['bytes']}"
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.ai.services.knowledge_transfer import export_lines
+
+
+class Command(BaseCommand):
+    help = "Stream documents, chunks (with their vectors), entities and relations to a JSONL file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Output file; use - for stdout.")
+
+    def handle(self, *args, **options):
+        if options["path"] == "-":
+            for line in export_lines():
+                self.stdout.write(line, ending="")
+            return
+        lines = 0
+        with open(options["path"], "w", encoding="utf-8") as output:
+            for line in export_lines():
+                output.write(line)
+                lines += 1
+        self.stderr.write(f"exported {options['path']} lines={lines}")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.ai.services.knowledge_transfer import IMPORT_BATCH_SIZE, import_lines
+
+
+class Command(BaseCommand):
+    help = "Load a JSONL knowledge export in one transaction, reusing its stored vectors."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], encoding="utf-8") as lines:
+                stats = import_lines(lines, batch_size=options["batch_size"])
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(" ".join(f"{key}={value}" for key, value in stats.items()))
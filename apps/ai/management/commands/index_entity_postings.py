@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from apps.ai.models import KnowledgeChunk, KnowledgeEntityPosting
+from apps.ai.services.knowledge_graph import link_chunk_entities
+
+
+class Command(BaseCommand):
+    help = "Link every chunk to the term entities it mentions; backfills postings missing from older data."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--all", action="store_true", help="Drop and rebuild every entity posting.")
+
+    def handle(self, *args, **options):
+        batch_size = max(options["batch_size"], 1)
+        if options["all"]:
+            KnowledgeEntityPosting.objects.all().delete()
+
+        chunk_count = 0
+        posting_count = 0
+        pending = []
+        # Existing postings are kept by the conflict-ignoring insert, so reruns only add new links.
+        for chunk in KnowledgeChunk.objects.only("id", "content").order_by("id").iterator(chunk_size=batch_size):
+            pending.append(chunk)
+            if len(pending) >= batch_size:
+                posting_count += link_chunk_entities(pending)
+                chunk_count += len(pending)
+                pending = []
+        if pending:
+            posting_count += link_chunk_entities(pending)
+            chunk_count += len(pending)
+
+        self.stdout.write(f"chunks={chunk_count} postings={posting_count}")
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from apps.ai.models import KnowledgeChunk, KnowledgeDocument
+from apps.ai.services.minhash import index_document_signature, minhash_signature, signature_bytes
+
+
+class Command(BaseCommand):
+    help = "Compute MinHash signatures and LSH bands for documents and chunks that do not have one yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--all", action="store_true", help="Recompute every signature, not only missing ones.")
+
+    def handle(self, *args, **options):
+        batch_size = max(options["batch_size"], 1)
+        documents = KnowledgeDocument.objects.only("id", "content")
+        chunks = KnowledgeChunk.objects.only("id", "content")
+        if not options["all"]:
+            documents = documents.filter(minhash=b"")
+            chunks = chunks.filter(minhash=b"")
+
+        document_count = 0
+        for document in documents.iterator(chunk_size=batch_size):
+            index_document_signature(document)
+            document_count += 1
+
+        chunk_count = 0
+        pending = []
+        for chunk in chunks.iterator(chunk_size=batch_size):
+            chunk.minhash = signature_bytes(minhash_signature(chunk.content))
+            pending.append(chunk)
+            if len(pending) >= batch_size:
+                KnowledgeChunk.objects.bulk_update(pending, ["minhash"])
+                chunk_count += len(pending)
+                pending = []
+        if pending:
+            KnowledgeChunk.objects.bulk_update(pending, ["minhash"])
+            chunk_count += len(pending)
+
+        self.stdout.write(f"documents={document_count} chunks={chunk_count}")
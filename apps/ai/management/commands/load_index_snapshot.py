@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.ai.services.index_snapshot import read_snapshot, restore_postings
+from apps.ai.services.vector_index import VectorIndex
+
+
+class Command(BaseCommand):
+    help = "Warm-load the vector index from a snapshot and report what had to be replayed from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=None, help="Defaults to KNOWLEDGE_INDEX_SNAPSHOT_PATH.")
+        parser.add_argument(
+            "--restore-postings",
+            action="store_true",
+            help="Fill empty BM25 posting tables from the snapshot instead of re-tokenizing every chunk.",
+        )
+
+    def handle(self, *args, **options):
+        index = VectorIndex(shared_path="", snapshot_path=options["path"])
+        if not index.snapshot_path:
+            raise CommandError("Set KNOWLEDGE_INDEX_SNAPSHOT_PATH or pass --path.")
+        try:
+            snapshot = read_snapshot(index.snapshot_path)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if snapshot is None:
+            raise CommandError(f"No snapshot at {index.snapshot_path}.")
+
+        if options["restore_postings"]:
+            try:
+                stats = restore_postings(snapshot)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(" ".join(f"{key}={value}" for key, value in stats.items()))
+
+        index.ensure_built()
+        if index.warm_start is None:
+            raise CommandError(f"Snapshot quantization {snapshot.quantization!r} does not match {index.quantization!r}.")
+        summary = " ".join(f"{key}={value}" for key, value in index.warm_start.items())
+        self.stdout.write(f"loaded {index.snapshot_path} {summary} rows={index.size()}")
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.ai.models import KnowledgeEmbeddingMigration
+from apps.ai.services.embedding_migration import cut_over, run_migration, start_migration
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-embed every chunk under a new model side by side (then --cut-over), or rechunk every document "
+        "with a new chunk size. Progress is checkpointed, so re-running the same command resumes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default="", help="Embedding model tag to stage vectors for.")
+        parser.add_argument("--chunk-size", type=int, default=None, help="Rechunk documents in place instead.")
+        parser.add_argument("--overlap", type=int, default=20)
+        parser.add_argument("--workers", type=int, default=None, help="Defaults to KNOWLEDGE_MIGRATION_WORKERS.")
+        parser.add_argument("--batch-size", type=int, default=None, help="Chunks per embedding call.")
+        parser.add_argument("--documents-per-task", type=int, default=None)
+        parser.add_argument("--max-documents", type=int, default=None, help="Stop after this many documents.")
+        parser.add_argument("--restart", action="store_true", help="Discard an unfinished run and start over.")
+        parser.add_argument(
+            "--cut-over", action="store_true", help="Switch search to the staged vectors once every chunk has one."
+        )
+
+    def handle(self, *args, **options):
+        model_tag = (options["model"] or "").strip()
+        chunk_size = options["chunk_size"]
+        if bool(model_tag) == bool(chunk_size):
+            raise CommandError("Pass exactly one of --model or --chunk-size.")
+        if chunk_size is not None and (chunk_size < 1 or options["overlap"] < 0):
+            raise CommandError("--chunk-size must be positive and --overlap non-negative.")
+        if chunk_size and options["cut_over"]:
+            raise CommandError("Rechunking rewrites chunks in place; --cut-over only applies to --model.")
+
+        migration = start_migration(
+            model_tag=model_tag,
+            chunk_size=chunk_size,
+            overlap=options["overlap"] if chunk_size else None,
+            restart=options["restart"],
+        )
+        migration = run_migration(
+            migration,
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+            documents_per_task=options["documents_per_task"],
+            max_documents=options["max_documents"],
+        )
+        self.stdout.write(
+            f"migration={migration.id} status={migration.status} documents={migration.processed_documents} "
+            f"chunks={migration.processed_chunks} checkpoint={migration.last_document_id}"
+        )
+        if options["cut_over"]:
+            if migration.status != KnowledgeEmbeddingMigration.STATUS_READY:
+                raise CommandError(f"Migration {migration.id} is {migration.status}; run it to completion first.")
+            try:
+                stats = cut_over(migration, batch_size=options["batch_size"])
+            except ValueError as exc:
+                raise CommandError(f"Cut-over of migration {migration.id} failed ({exc}); re-run to catch up.")
+            self.stdout.write(" ".join(f"{key}={value}" for key, value in stats.items()))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.ai.services.vector_index import VectorIndex
+
+
+class Command(BaseCommand):
+    help = "Rebuild the shared memory-mapped vector index file from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=None, help="Defaults to KNOWLEDGE_SHARED_INDEX_PATH.")
+
+    def handle(self, *args, **options):
+        index = VectorIndex(shared_path=options["path"])
+        if not index.shared_path:
+            raise CommandError("Set KNOWLEDGE_SHARED_INDEX_PATH or pass --path.")
+        version = index.publish()
+        self.stdout.write(
+            f"published {index.shared_path} version={version} rows={index.size()} bytes={index.nbytes()}"
+        )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from apps.ai.models import KnowledgeSourceFetch
+from apps.ai.services.ingest_jobs import create_ingest_job, run_ingest_job
+
+
+class Command(BaseCommand):
+    help = "Re-fetch every tracked URL source with conditional requests and rechunk the changed ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=120)
+        parser.add_argument("--overlap", type=int, default=20)
+        parser.add_argument("--timeout", type=int, default=15)
+
+    def handle(self, *args, **options):
+        urls = list(
+            KnowledgeSourceFetch.objects.filter(document__isnull=False)
+            .order_by("source_uri")
+            .values_list("source_uri", flat=True)
+        )
+        if not urls:
+            self.stdout.write("no tracked url sources")
+            return
+        settings = {
+            "chunk_size": options["chunk_size"],
+            "overlap": options["overlap"],
+            "timeout_seconds": options["timeout"],
+        }
+        job = create_ingest_job([{"url": url, **settings} for url in urls], options=settings, start=False)
+        # Runs in the foreground; items still fan out over the shared ingest pool.
+        job = run_ingest_job(job.id)
+
+        not_modified = sum(
+            1
+            for chunking in job.items.values_list("chunking", flat=True)
+            if (chunking.get("source_fetch") or {}).get("not_modified")
+        )
+        self.stdout.write(
+            f"job={job.id} sources={job.total_items} not_modified={not_modified} "
+            f"failed={job.failed_items} created_chunks={job.created_chunks}"
+        )
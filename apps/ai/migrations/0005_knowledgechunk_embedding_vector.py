@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-17 00:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0004_alter_mcpadapter_auth_type_agentactionproposal_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgechunk',
+            name='embedding_dimension',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='knowledgechunk',
+            name='embedding_dtype',
+            field=models.CharField(choices=[('float32', 'float32'), ('float16', 'float16')], default='float32', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='knowledgechunk',
+            name='embedding_model',
+            field=models.CharField(blank=True, max_length=128),
+        ),
+        migrations.AddField(
+            model_name='knowledgechunk',
+            name='embedding_vector',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+    ]
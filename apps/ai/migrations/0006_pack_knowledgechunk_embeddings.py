@@ -0,0 +1,73 @@
+import math
+import os
+import struct
+
+from django.db import migrations
+
+
+DETERMINISTIC_DIMENSION = 128
+
+
+def _legacy_model_tag(dimension):
+    if dimension == DETERMINISTIC_DIMENSION:
+        return f"deterministic-{DETERMINISTIC_DIMENSION}"
+    return os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+
+
+def pack_json_embeddings(apps, schema_editor):
+    KnowledgeChunk = apps.get_model("ai", "KnowledgeChunk")
+    batch = []
+    for chunk in KnowledgeChunk.objects.only("id", "embedding").iterator(chunk_size=500):
+        if not chunk.embedding:
+            continue
+        try:
+            values = [float(value) for value in chunk.embedding]
+        except (TypeError, ValueError):
+            values = []
+        norm = math.sqrt(sum(value * value for value in values))
+        if norm > 0:
+            values = [value / norm for value in values]
+        chunk.embedding_vector = struct.pack(f"<{len(values)}f", *values) if values else b""
+        chunk.embedding_dtype = "float32"
+        chunk.embedding_dimension = len(values)
+        chunk.embedding_model = _legacy_model_tag(len(values)) if values else ""
+        chunk.embedding = []
+        batch.append(chunk)
+        if len(batch) >= 500:
+            KnowledgeChunk.objects.bulk_update(
+                batch,
+                ["embedding_vector", "embedding_dtype", "embedding_dimension", "embedding_model", "embedding"],
+            )
+            batch = []
+    if batch:
+        KnowledgeChunk.objects.bulk_update(
+            batch,
+            ["embedding_vector", "embedding_dtype", "embedding_dimension", "embedding_model", "embedding"],
+        )
+
+
+def unpack_binary_embeddings(apps, schema_editor):
+    KnowledgeChunk = apps.get_model("ai", "KnowledgeChunk")
+    batch = []
+    for chunk in KnowledgeChunk.objects.exclude(embedding_dimension=0).iterator(chunk_size=500):
+        data = bytes(chunk.embedding_vector or b"")
+        fmt = "e" if chunk.embedding_dtype == "float16" else "f"
+        count = chunk.embedding_dimension
+        chunk.embedding = [round(value, 8) for value in struct.unpack(f"<{count}{fmt}", data)] if data else []
+        batch.append(chunk)
+        if len(batch) >= 500:
+            KnowledgeChunk.objects.bulk_update(batch, ["embedding"])
+            batch = []
+    if batch:
+        KnowledgeChunk.objects.bulk_update(batch, ["embedding"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0005_knowledgechunk_embedding_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(pack_json_embeddings, unpack_binary_embeddings),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0.2 on 2026-10-17 00:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0006_pack_knowledgechunk_embeddings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnowledgeCorpusStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.CharField(default='current', max_length=64, unique=True)),
+                ('chunk_count', models.PositiveIntegerField(default=0)),
+                ('total_tokens', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='KnowledgeTermStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=128, unique=True)),
+                ('document_frequency', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='KnowledgePosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=128)),
+                ('term_frequency', models.PositiveIntegerField(default=1)),
+                ('chunk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='ai.knowledgechunk')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term'], name='ai_knowledg_term_a44755_idx')],
+                'constraints': [models.UniqueConstraint(fields=('term', 'chunk'), name='unique_posting_term_chunk')],
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+import re
+from collections import Counter
+
+from django.db import migrations
+
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+MAX_TERM_LENGTH = 128
+
+
+def build_postings(apps, schema_editor):
+    KnowledgeChunk = apps.get_model("ai", "KnowledgeChunk")
+    KnowledgePosting = apps.get_model("ai", "KnowledgePosting")
+    KnowledgeTermStat = apps.get_model("ai", "KnowledgeTermStat")
+    KnowledgeCorpusStats = apps.get_model("ai", "KnowledgeCorpusStats")
+
+    document_frequency = Counter()
+    chunk_count = 0
+    total_tokens = 0
+    postings = []
+    for chunk in KnowledgeChunk.objects.only("id", "content", "token_count").iterator(chunk_size=500):
+        terms = Counter(
+            match.group(0).lower()
+            for match in TOKEN_PATTERN.finditer(chunk.content or "")
+            if len(match.group(0)) <= MAX_TERM_LENGTH
+        )
+        document_frequency.update(terms.keys())
+        chunk_count += 1
+        total_tokens += int(chunk.token_count or 0)
+        postings.extend(
+            KnowledgePosting(term=term, chunk_id=chunk.id, term_frequency=count) for term, count in terms.items()
+        )
+        if len(postings) >= 5000:
+            KnowledgePosting.objects.bulk_create(postings, batch_size=1000)
+            postings = []
+    if postings:
+        KnowledgePosting.objects.bulk_create(postings, batch_size=1000)
+
+    KnowledgeTermStat.objects.bulk_create(
+        [KnowledgeTermStat(term=term, document_frequency=df) for term, df in document_frequency.items()],
+        batch_size=1000,
+    )
+    KnowledgeCorpusStats.objects.update_or_create(
+        slug="current",
+        defaults={"chunk_count": chunk_count, "total_tokens": total_tokens},
+    )
+
+
+def drop_postings(apps, schema_editor):
+    apps.get_model("ai", "KnowledgePosting").objects.all().delete()
+    apps.get_model("ai", "KnowledgeTermStat").objects.all().delete()
+    apps.get_model("ai", "KnowledgeCorpusStats").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0007_knowledge_keyword_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_postings, drop_postings),
+    ]
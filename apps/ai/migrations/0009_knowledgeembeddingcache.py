@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-17 00:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0008_backfill_knowledge_postings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnowledgeEmbeddingCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=128)),
+                ('text_hash', models.CharField(max_length=64)),
+                ('vector', models.BinaryField()),
+                ('dimension', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('model', 'text_hash'), name='unique_embedding_cache_model_hash')],
+            },
+        ),
+    ]
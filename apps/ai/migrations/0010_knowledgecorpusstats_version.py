@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 00:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0009_knowledgeembeddingcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgecorpusstats',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-17 01:05
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_content_hashes(apps, schema_editor):
+    KnowledgeChunk = apps.get_model("ai", "KnowledgeChunk")
+    pending = []
+    for chunk in KnowledgeChunk.objects.only("id", "content").iterator(chunk_size=500):
+        chunk.content_hash = hashlib.sha256((chunk.content or "").encode("utf-8")).hexdigest()
+        pending.append(chunk)
+        if len(pending) >= 500:
+            KnowledgeChunk.objects.bulk_update(pending, ["content_hash"])
+            pending = []
+    if pending:
+        KnowledgeChunk.objects.bulk_update(pending, ["content_hash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0010_knowledgecorpusstats_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgechunk',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.RunPython(fill_content_hashes, migrations.RunPython.noop),
+    ]
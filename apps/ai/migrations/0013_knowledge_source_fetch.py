@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-17 00:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0012_knowledge_ingest_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnowledgeSourceFetch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_uri', models.CharField(max_length=1024, unique=True)),
+                ('etag', models.CharField(blank=True, max_length=512)),
+                ('last_modified', models.CharField(blank=True, max_length=128)),
+                ('content_hash', models.CharField(blank=True, max_length=64)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('fetch_count', models.PositiveIntegerField(default=0)),
+                ('not_modified_count', models.PositiveIntegerField(default=0)),
+                ('checked_at', models.DateTimeField(blank=True, null=True)),
+                ('changed_at', models.DateTimeField(blank=True, null=True)),
+                ('document', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='source_fetches', to='ai.knowledgedocument')),
+            ],
+        ),
+    ]
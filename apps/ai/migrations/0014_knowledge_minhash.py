@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-17 01:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0013_knowledge_source_fetch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgechunk',
+            name='minhash',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.AddField(
+            model_name='knowledgedocument',
+            name='minhash',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.CreateModel(
+            name='KnowledgeMinHashBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('bucket', models.BigIntegerField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='minhash_bands', to='ai.knowledgedocument')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band', 'bucket'], name='ai_knowledg_band_62acaf_idx')],
+                'constraints': [models.UniqueConstraint(fields=('document', 'band'), name='unique_minhash_band_document')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 01:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0014_knowledge_minhash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgedocument',
+            name='index_version',
+            field=models.PositiveBigIntegerField(db_index=True, default=0),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.0.2 on 2026-10-17 01:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0015_knowledge_document_index_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnowledgeEmbeddingMigration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('reembed', 'Re-embed'), ('rechunk', 'Rechunk')], default='reembed', max_length=16)),
+                ('model_tag', models.CharField(blank=True, max_length=128)),
+                ('chunk_size', models.PositiveIntegerField(blank=True, null=True)),
+                ('overlap', models.PositiveIntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('ready', 'Ready for cut-over'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], default='running', max_length=16)),
+                ('last_document_id', models.BigIntegerField(default=0)),
+                ('processed_documents', models.PositiveIntegerField(default=0)),
+                ('processed_chunks', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='knowledgecorpusstats',
+            name='embedding_model',
+            field=models.CharField(blank=True, max_length=128),
+        ),
+        migrations.CreateModel(
+            name='KnowledgeStagedEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('embedding_vector', models.BinaryField(blank=True, default=b'')),
+                ('embedding_dtype', models.CharField(choices=[('float32', 'float32'), ('float16', 'float16')], default='float32', max_length=16)),
+                ('embedding_dimension', models.PositiveIntegerField(default=0)),
+                ('embedding_model', models.CharField(blank=True, max_length=128)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('chunk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='staged_embeddings', to='ai.knowledgechunk')),
+                ('migration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='staged_embeddings', to='ai.knowledgeembeddingmigration')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('migration', 'chunk'), name='unique_staged_embedding_chunk')],
+            },
+        ),
+    ]
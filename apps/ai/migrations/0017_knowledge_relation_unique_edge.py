@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-17 01:18
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def drop_duplicate_relations(apps, schema_editor):
+    # get_or_create races could store the same edge twice; keep the heaviest copy.
+    KnowledgeRelation = apps.get_model("ai", "KnowledgeRelation")
+    duplicated = (
+        KnowledgeRelation.objects.values("source_entity_id", "target_entity_id", "relation_type")
+        .annotate(copies=Count("id"))
+        .filter(copies__gt=1)
+    )
+    for edge in duplicated:
+        copies = KnowledgeRelation.objects.filter(
+            source_entity_id=edge["source_entity_id"],
+            target_entity_id=edge["target_entity_id"],
+            relation_type=edge["relation_type"],
+        ).order_by("-weight", "id")
+        keep = copies.values_list("id", flat=True).first()
+        copies.exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0016_knowledge_embedding_migration'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_relations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='knowledgerelation',
+            constraint=models.UniqueConstraint(fields=('source_entity', 'target_entity', 'relation_type'), name='unique_relation_edge'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0017_knowledge_relation_unique_edge'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgecorpusstats',
+            name='graph_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
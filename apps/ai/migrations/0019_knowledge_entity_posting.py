@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-17 01:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0018_knowledge_graph_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnowledgeEntityPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mentions', models.PositiveIntegerField(default=1)),
+                ('chunk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entity_postings', to='ai.knowledgechunk')),
+                ('entity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='ai.knowledgeentity')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('entity', 'chunk'), name='unique_entity_chunk_posting')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-17 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0019_knowledge_entity_posting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgeentity',
+            name='degree_centrality',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='knowledgeentity',
+            name='pagerank',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddIndex(
+            model_name='knowledgeentity',
+            index=models.Index(fields=['-pagerank'], name='ai_knowledg_pageran_45165b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='knowledgeentity',
+            index=models.Index(fields=['-degree_centrality'], name='ai_knowledg_degree__e116d0_idx'),
+        ),
+    ]
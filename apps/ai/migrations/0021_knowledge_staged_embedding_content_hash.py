@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-17 01:50
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_staged_hashes(apps, schema_editor):
+    # Rows staged before the hash was recorded are assumed to match their chunk as it is now.
+    KnowledgeChunk = apps.get_model("ai", "KnowledgeChunk")
+    KnowledgeStagedEmbedding = apps.get_model("ai", "KnowledgeStagedEmbedding")
+    KnowledgeStagedEmbedding.objects.update(
+        content_hash=Subquery(KnowledgeChunk.objects.filter(pk=OuterRef("chunk_id")).values("content_hash")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0020_knowledge_entity_centrality'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgestagedembedding',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.RunPython(fill_staged_hashes, migrations.RunPython.noop),
+    ]
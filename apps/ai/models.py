@@ -21,6 +21,9 @@ class KnowledgeDocument(models.Model):
     title = models.CharField(max_length=255, blank=True)
     content = models.TextField(blank=True)
     metadata = models.JSONField(default=dict, blank=True)
+    minhash = models.BinaryField(blank=True, default=b"")
+    # Corpus version of the last chunk change; index snapshots replay documents newer than theirs.
+    index_version = models.PositiveBigIntegerField(default=0, db_index=True)
     created_by = models.ForeignKey(
         "users.User",
         on_delete=models.SET_NULL,
@@ -43,14 +46,39 @@ class KnowledgeDocument(models.Model):
         return f"KnowledgeDocument<{label}>"
 
 
+class KnowledgeChunkQuerySet(models.QuerySet):
+    def live(self):
+        return self.filter(chunk_index__lt=KnowledgeChunk.PARKED_INDEX_OFFSET)
+
+    def parked(self):
+        return self.filter(chunk_index__gte=KnowledgeChunk.PARKED_INDEX_OFFSET)
+
+
 class KnowledgeChunk(models.Model):
+    DTYPE_FLOAT32 = "float32"
+    DTYPE_FLOAT16 = "float16"
+    EMBEDDING_DTYPE_CHOICES = (
+        (DTYPE_FLOAT32, "float32"),
+        (DTYPE_FLOAT16, "float16"),
+    )
+    # Chunks being rebuilt are staged at this offset and are not searchable until moved into place.
+    PARKED_INDEX_OFFSET = 1_000_000_000
+
     document = models.ForeignKey(KnowledgeDocument, on_delete=models.CASCADE, related_name="chunks")
     chunk_index = models.PositiveIntegerField()
     content = models.TextField()
+    content_hash = models.CharField(max_length=64, blank=True, default="")
+    minhash = models.BinaryField(blank=True, default=b"")
     token_count = models.PositiveIntegerField(default=0)
     embedding = models.JSONField(default=list, blank=True)
+    embedding_vector = models.BinaryField(blank=True, default=b"")
+    embedding_dtype = models.CharField(max_length=16, choices=EMBEDDING_DTYPE_CHOICES, default=DTYPE_FLOAT32)
+    embedding_dimension = models.PositiveIntegerField(default=0)
+    embedding_model = models.CharField(max_length=128, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = KnowledgeChunkQuerySet.as_manager()
+
     class Meta:
         ordering = ["document_id", "chunk_index"]
         constraints = [
@@ -61,10 +89,230 @@ class KnowledgeChunk(models.Model):
         return f"KnowledgeChunk<doc={self.document_id}, idx={self.chunk_index}>"
 
 
+class KnowledgeEmbeddingCache(models.Model):
+    model = models.CharField(max_length=128)
+    text_hash = models.CharField(max_length=64)
+    vector = models.BinaryField()
+    dimension = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=("model", "text_hash"), name="unique_embedding_cache_model_hash"),
+        ]
+
+    def __str__(self):
+        return f"KnowledgeEmbeddingCache<{self.model}:{self.text_hash[:12]}>"
+
+
+class KnowledgePosting(models.Model):
+    term = models.CharField(max_length=128)
+    chunk = models.ForeignKey(KnowledgeChunk, on_delete=models.CASCADE, related_name="postings")
+    term_frequency = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=("term", "chunk"), name="unique_posting_term_chunk"),
+        ]
+        indexes = [
+            models.Index(fields=["term"]),
+        ]
+
+    def __str__(self):
+        return f"KnowledgePosting<{self.term}:{self.chunk_id}>"
+
+
+class KnowledgeMinHashBand(models.Model):
+    document = models.ForeignKey(KnowledgeDocument, on_delete=models.CASCADE, related_name="minhash_bands")
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=("document", "band"), name="unique_minhash_band_document"),
+        ]
+        indexes = [
+            models.Index(fields=["band", "bucket"]),
+        ]
+
+    def __str__(self):
+        return f"KnowledgeMinHashBand<doc={self.document_id}, band={self.band}>"
+
+
+class KnowledgeTermStat(models.Model):
+    term = models.CharField(max_length=128, unique=True)
+    document_frequency = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"KnowledgeTermStat<{self.term}:{self.document_frequency}>"
+
+
+class KnowledgeCorpusStats(models.Model):
+    slug = models.CharField(max_length=64, unique=True, default="current")
+    chunk_count = models.PositiveIntegerField(default=0)
+    total_tokens = models.PositiveBigIntegerField(default=0)
+    version = models.PositiveBigIntegerField(default=0)
+    graph_version = models.PositiveBigIntegerField(default=0)
+    # Set when an embedding migration is cut over; blank serves OPENAI_EMBEDDING_MODEL.
+    embedding_model = models.CharField(max_length=128, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def get_current(cls):
+        obj, _ = cls.objects.get_or_create(slug="current")
+        return obj
+
+    def __str__(self):
+        return f"KnowledgeCorpusStats<{self.chunk_count} chunks>"
+
+
+class KnowledgeEmbeddingMigration(models.Model):
+    KIND_REEMBED = "reembed"
+    KIND_RECHUNK = "rechunk"
+    KIND_CHOICES = (
+        (KIND_REEMBED, "Re-embed"),
+        (KIND_RECHUNK, "Rechunk"),
+    )
+    STATUS_RUNNING = "running"
+    STATUS_READY = "ready"
+    STATUS_COMPLETED = "completed"
+    STATUS_CANCELLED = "cancelled"
+    STATUS_CHOICES = (
+        (STATUS_RUNNING, "Running"),
+        (STATUS_READY, "Ready for cut-over"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_CANCELLED, "Cancelled"),
+    )
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES, default=KIND_REEMBED)
+    model_tag = models.CharField(max_length=128, blank=True)
+    chunk_size = models.PositiveIntegerField(null=True, blank=True)
+    overlap = models.PositiveIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    # Every document with an id up to the checkpoint has been processed.
+    last_document_id = models.BigIntegerField(default=0)
+    processed_documents = models.PositiveIntegerField(default=0)
+    processed_chunks = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"KnowledgeEmbeddingMigration<{self.kind}:{self.model_tag or self.chunk_size}:{self.status}>"
+
+
+class KnowledgeStagedEmbedding(models.Model):
+    migration = models.ForeignKey(
+        KnowledgeEmbeddingMigration, on_delete=models.CASCADE, related_name="staged_embeddings"
+    )
+    chunk = models.ForeignKey(KnowledgeChunk, on_delete=models.CASCADE, related_name="staged_embeddings")
+    # The chunk text the vector was computed from; a row whose chunk changed since is re-staged.
+    content_hash = models.CharField(max_length=64, blank=True, default="")
+    embedding_vector = models.BinaryField(blank=True, default=b"")
+    embedding_dtype = models.CharField(
+        max_length=16, choices=KnowledgeChunk.EMBEDDING_DTYPE_CHOICES, default=KnowledgeChunk.DTYPE_FLOAT32
+    )
+    embedding_dimension = models.PositiveIntegerField(default=0)
+    embedding_model = models.CharField(max_length=128, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=("migration", "chunk"), name="unique_staged_embedding_chunk"),
+        ]
+
+    def __str__(self):
+        return f"KnowledgeStagedEmbedding<{self.migration_id}:{self.chunk_id}>"
+
+
+class KnowledgeIngestJob(models.Model):
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    status = models.CharField(max_length=32, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    total_items = models.PositiveIntegerField(default=0)
+    succeeded_items = models.PositiveIntegerField(default=0)
+    failed_items = models.PositiveIntegerField(default=0)
+    created_chunks = models.PositiveIntegerField(default=0)
+    options = models.JSONField(default=dict, blank=True)
+    created_by = models.ForeignKey(
+        "users.User",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="knowledge_ingest_jobs",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"KnowledgeIngestJob<{self.pk}:{self.status}>"
+
+
+class KnowledgeIngestItem(models.Model):
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    job = models.ForeignKey(KnowledgeIngestJob, on_delete=models.CASCADE, related_name="items")
+    position = models.PositiveIntegerField()
+    status = models.CharField(max_length=32, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    payload = models.JSONField(default=dict, blank=True)
+    document = models.ForeignKey(
+        KnowledgeDocument,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="ingest_items",
+    )
+    chunking = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    duration_ms = models.IntegerField(default=0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["job_id", "position"]
+        constraints = [
+            models.UniqueConstraint(fields=("job", "position"), name="unique_ingest_item_position"),
+        ]
+        indexes = [
+            models.Index(fields=["job", "status"]),
+        ]
+
+    def __str__(self):
+        return f"KnowledgeIngestItem<job={self.job_id}, pos={self.position}:{self.status}>"
+
+
 class KnowledgeEntity(models.Model):
     name = models.CharField(max_length=255)
     entity_type = models.CharField(max_length=100, default="term")
     metadata = models.JSONField(default=dict, blank=True)
+    pagerank = models.FloatField(default=0.0)
+    degree_centrality = models.FloatField(default=0.0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -72,6 +320,10 @@ class KnowledgeEntity(models.Model):
         constraints = [
             models.UniqueConstraint(fields=("name", "entity_type"), name="unique_entity_name_type"),
         ]
+        indexes = [
+            models.Index(fields=["-pagerank"]),
+            models.Index(fields=["-degree_centrality"]),
+        ]
 
     def __str__(self):
         return f"{self.entity_type}:{self.name}"
@@ -95,6 +347,11 @@ class KnowledgeRelation(models.Model):
 
     class Meta:
         ordering = ["-weight", "-created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=("source_entity", "target_entity", "relation_type"), name="unique_relation_edge"
+            ),
+        ]
         indexes = [
             models.Index(fields=["relation_type"]),
         ]
@@ -103,6 +360,20 @@ class KnowledgeRelation(models.Model):
         return f"{self.source_entity_id} -[{self.relation_type}]-> {self.target_entity_id}"
 
 
+class KnowledgeEntityPosting(models.Model):
+    entity = models.ForeignKey(KnowledgeEntity, on_delete=models.CASCADE, related_name="postings")
+    chunk = models.ForeignKey(KnowledgeChunk, on_delete=models.CASCADE, related_name="entity_postings")
+    mentions = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=("entity", "chunk"), name="unique_entity_chunk_posting"),
+        ]
+
+    def __str__(self):
+        return f"KnowledgeEntityPosting<{self.entity_id}:{self.chunk_id}>"
+
+
 class ModelEndpoint(models.Model):
     name = models.CharField(max_length=255, unique=True)
     provider = models.CharField(max_length=100)
@@ -288,3 +559,26 @@ class AgentExecutionTrace(models.Model):
 
     def __str__(self):
         return f"AgentExecutionTrace<{self.tool_name}:{'ok' if self.ok else 'error'}>"
+
+
+class KnowledgeSourceFetch(models.Model):
+    source_uri = models.CharField(max_length=1024, unique=True)
+    document = models.ForeignKey(
+        KnowledgeDocument,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="source_fetches",
+    )
+    etag = models.CharField(max_length=512, blank=True)
+    last_modified = models.CharField(max_length=128, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    error = models.CharField(max_length=255, blank=True)
+    fetch_count = models.PositiveIntegerField(default=0)
+    not_modified_count = models.PositiveIntegerField(default=0)
+    checked_at = models.DateTimeField(null=True, blank=True)
+    changed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"KnowledgeSourceFetch<{self.source_uri}:{self.status_code}>"
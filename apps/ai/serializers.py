@@ -1,3 +1,6 @@
+import math
+
+from django.utils import timezone
 from rest_framework import serializers
 
 from .models import (
@@ -7,17 +10,23 @@ from .models import (
     KnowledgeChunk,
     KnowledgeDocument,
     KnowledgeEntity,
+    KnowledgeIngestItem,
+    KnowledgeIngestJob,
     KnowledgeRelation,
     McpAdapter,
     ModelEndpoint,
 )
+from .services.embedding_cache import text_digest
+from .services.minhash import DEFAULT_DUPLICATE_POLICY, DUPLICATE_POLICIES, minhash_signature, signature_bytes
+from .services.retrieval import apply_embedding
+from .services.vector_codec import vector_to_list
 
 
 class KnowledgeDocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = KnowledgeDocument
-        fields = "__all__"
-        read_only_fields = ("created_at", "updated_at")
+        exclude = ("minhash",)
+        read_only_fields = ("index_version", "created_at", "updated_at")
 
 
 class KnowledgeDocumentIngestSerializer(serializers.Serializer):
@@ -28,6 +37,7 @@ class KnowledgeDocumentIngestSerializer(serializers.Serializer):
     chunk_size = serializers.IntegerField(required=False, min_value=1, default=120)
     overlap = serializers.IntegerField(required=False, min_value=0, default=20)
     timeout_seconds = serializers.IntegerField(required=False, min_value=1, max_value=60, default=15)
+    on_duplicate = serializers.ChoiceField(choices=DUPLICATE_POLICIES, required=False, default=DEFAULT_DUPLICATE_POLICY)
 
     def validate(self, attrs):
         content = (attrs.get("content") or "").strip()
@@ -39,20 +49,120 @@ class KnowledgeDocumentIngestSerializer(serializers.Serializer):
         return attrs
 
 
+class KnowledgeIngestItemSerializer(serializers.ModelSerializer):
+    source = serializers.SerializerMethodField()
+
+    class Meta:
+        model = KnowledgeIngestItem
+        fields = (
+            "id",
+            "position",
+            "status",
+            "source",
+            "document",
+            "chunking",
+            "error",
+            "duration_ms",
+            "started_at",
+            "finished_at",
+        )
+        read_only_fields = fields
+
+    def get_source(self, obj):
+        payload = obj.payload if isinstance(obj.payload, dict) else {}
+        return payload.get("url") or payload.get("title") or ""
+
+
+class KnowledgeIngestJobSerializer(serializers.ModelSerializer):
+    processed_items = serializers.SerializerMethodField()
+    throughput = serializers.SerializerMethodField()
+
+    class Meta:
+        model = KnowledgeIngestJob
+        fields = (
+            "id",
+            "status",
+            "total_items",
+            "processed_items",
+            "succeeded_items",
+            "failed_items",
+            "created_chunks",
+            "throughput",
+            "options",
+            "created_by",
+            "created_at",
+            "started_at",
+            "finished_at",
+        )
+        read_only_fields = fields
+
+    def get_processed_items(self, obj):
+        return obj.succeeded_items + obj.failed_items
+
+    def get_throughput(self, obj):
+        if not obj.started_at:
+            return {"elapsed_seconds": 0.0, "items_per_second": 0.0, "chunks_per_second": 0.0}
+        elapsed = max(((obj.finished_at or timezone.now()) - obj.started_at).total_seconds(), 1e-6)
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "items_per_second": round(self.get_processed_items(obj) / elapsed, 3),
+            "chunks_per_second": round(obj.created_chunks / elapsed, 3),
+        }
+
+
 class KnowledgeChunkSerializer(serializers.ModelSerializer):
     document_title = serializers.CharField(source="document.title", read_only=True)
 
     class Meta:
         model = KnowledgeChunk
-        fields = "__all__"
-        read_only_fields = ("created_at",)
+        exclude = ("embedding_vector", "minhash")
+        read_only_fields = ("created_at", "content_hash", "embedding_dtype", "embedding_dimension", "embedding_model")
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.embedding_vector:
+            data["embedding"] = vector_to_list(instance.embedding_vector, instance.embedding_dtype)
+        return data
+
+    def validate_embedding(self, value):
+        if value is None:
+            return None
+        if not isinstance(value, list) or not all(
+            isinstance(item, (int, float)) and not isinstance(item, bool) and math.isfinite(item) for item in value
+        ):
+            raise serializers.ValidationError("Embedding must be a list of numbers.")
+        return [float(item) for item in value]
+
+    def _pop_embedding(self, validated_data):
+        return validated_data.pop("embedding", None)
+
+    def create(self, validated_data):
+        vector = self._pop_embedding(validated_data)
+        chunk = KnowledgeChunk(**validated_data)
+        chunk.content_hash = text_digest(chunk.content)
+        chunk.minhash = signature_bytes(minhash_signature(chunk.content))
+        if vector is not None:
+            apply_embedding(chunk, vector, model_tag="client")
+        chunk.save()
+        return chunk
+
+    def update(self, instance, validated_data):
+        vector = self._pop_embedding(validated_data)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.content_hash = text_digest(instance.content)
+        instance.minhash = signature_bytes(minhash_signature(instance.content))
+        if vector is not None:
+            apply_embedding(instance, vector, model_tag="client")
+        instance.save()
+        return instance
 
 
 class KnowledgeEntitySerializer(serializers.ModelSerializer):
     class Meta:
         model = KnowledgeEntity
         fields = "__all__"
-        read_only_fields = ("created_at",)
+        read_only_fields = ("pagerank", "degree_centrality", "created_at")
 
 
 class KnowledgeRelationSerializer(serializers.ModelSerializer):
@@ -0,0 +1,74 @@
+import math
+import os
+
+import numpy as np
+
+
+ANN_MIN_ROWS = int(os.getenv("KNOWLEDGE_ANN_MIN_ROWS", "2048"))
+DEFAULT_NPROBE = int(os.getenv("KNOWLEDGE_ANN_NPROBE", "8"))
+TRAINING_SAMPLE_SIZE = 50000
+ASSIGN_BLOCK_ROWS = 16384
+
+
+def _assign(matrix, centroids):
+    assignments = np.empty(matrix.shape[0], dtype=np.int32)
+    for start in range(0, matrix.shape[0], ASSIGN_BLOCK_ROWS):
+        block = matrix[start : start + ASSIGN_BLOCK_ROWS]
+        assignments[start : start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def train_centroids(matrix, n_lists, n_iter=10, seed=0):
+    rng = np.random.default_rng(seed)
+    sample = matrix
+    if matrix.shape[0] > TRAINING_SAMPLE_SIZE:
+        sample = matrix[rng.choice(matrix.shape[0], TRAINING_SAMPLE_SIZE, replace=False)]
+    n_lists = max(min(int(n_lists), sample.shape[0]), 1)
+    # Rows may be int8 codes; only their direction matters for bucketing.
+    centroids = sample[rng.choice(sample.shape[0], n_lists, replace=False)].astype(np.float32)
+    centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+    # Spherical k-means: vectors are unit length, so cosine is a dot product.
+    for _ in range(max(int(n_iter), 1)):
+        assignments = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()), replace=False)]
+            norms[empty] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return np.ascontiguousarray(centroids)
+
+
+class IVFIndex:
+    """Inverted-file ANN index: rows are bucketed under their nearest k-means centroid."""
+
+    def __init__(self, centroids, matrix, trained_rows=None):
+        self.centroids = centroids
+        self.trained_rows = int(trained_rows if trained_rows is not None else matrix.shape[0])
+        assignments = _assign(matrix, centroids)
+        self.order = np.argsort(assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(assignments, minlength=centroids.shape[0])
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.rows = int(matrix.shape[0])
+
+    @classmethod
+    def build(cls, matrix, n_lists=None, n_iter=10, seed=0):
+        if n_lists is None:
+            n_lists = max(int(math.sqrt(matrix.shape[0])), 1)
+        return cls(train_centroids(matrix, n_lists, n_iter=n_iter, seed=seed), matrix)
+
+    def reassigned(self, matrix):
+        # Keeps the trained centroids and only re-buckets rows after incremental changes.
+        return IVFIndex(self.centroids, matrix, trained_rows=self.trained_rows)
+
+    def needs_retraining(self, rows):
+        return rows > 2 * self.trained_rows or rows < self.trained_rows // 2
+
+    def candidates(self, query, nprobe=DEFAULT_NPROBE):
+        nprobe = max(min(int(nprobe), self.centroids.shape[0]), 1)
+        centroid_scores = self.centroids @ query
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self.order[self.offsets[probe] : self.offsets[probe + 1]] for probe in probes])
@@ -0,0 +1,39 @@
+import hashlib
+
+from apps.ai.models import KnowledgeEmbeddingCache
+from apps.ai.services.vector_codec import DTYPE_FLOAT32, pack_vector, vector_to_list
+
+
+LOOKUP_BATCH_SIZE = 500
+
+
+def text_digest(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def lookup_cached_embeddings(model, digests):
+    digests = list(dict.fromkeys(digests))
+    found = {}
+    for start in range(0, len(digests), LOOKUP_BATCH_SIZE):
+        rows = KnowledgeEmbeddingCache.objects.filter(
+            model=model,
+            text_hash__in=digests[start : start + LOOKUP_BATCH_SIZE],
+        ).values_list("text_hash", "vector")
+        for digest, vector in rows:
+            found[digest] = vector_to_list(vector, DTYPE_FLOAT32)
+    return found
+
+
+def store_cached_embeddings(model, vectors_by_digest):
+    rows = [
+        KnowledgeEmbeddingCache(
+            model=model,
+            text_hash=digest,
+            vector=pack_vector(vector, DTYPE_FLOAT32),
+            dimension=len(vector),
+        )
+        for digest, vector in vectors_by_digest.items()
+        if vector
+    ]
+    KnowledgeEmbeddingCache.objects.bulk_create(rows, batch_size=LOOKUP_BATCH_SIZE, ignore_conflicts=True)
+    return len(rows)
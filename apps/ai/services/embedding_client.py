@@ -0,0 +1,233 @@
+import http.client
+import json
+import math
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+
+OPENAI_EMBEDDINGS_URL = os.getenv("OPENAI_EMBEDDINGS_URL", "https://api.openai.com/v1/embeddings")
+DEFAULT_MAX_BATCH_ITEMS = int(os.getenv("OPENAI_EMBEDDING_BATCH_ITEMS", "256"))
+DEFAULT_MAX_BATCH_TOKENS = int(os.getenv("OPENAI_EMBEDDING_BATCH_TOKENS", "100000"))
+DEFAULT_CONCURRENCY = int(os.getenv("OPENAI_EMBEDDING_CONCURRENCY", "4"))
+DEFAULT_MAX_RETRIES = int(os.getenv("OPENAI_EMBEDDING_MAX_RETRIES", "3"))
+DEFAULT_MAX_BACKOFF_SECONDS = float(os.getenv("OPENAI_EMBEDDING_MAX_BACKOFF_SECONDS", "8"))
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return max(len(text or "") // CHARS_PER_TOKEN, 1)
+
+
+@dataclass
+class EmbeddingResult:
+    vectors: list[list[float] | None]
+    batches: int = 0
+    failed_batches: int = 0
+    retries: int = 0
+    errors: list[str] = field(default_factory=list)
+
+
+class _RetryableError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _ConnectionPool:
+    """Keeps idle HTTP/1.1 connections to a single host for reuse across batches."""
+
+    def __init__(self, url, size, timeout_seconds):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme or "https"
+        self.host = parts.hostname or ""
+        self.port = parts.port
+        self.path = parts.path or "/"
+        if parts.query:
+            self.path = f"{self.path}?{parts.query}"
+        self.timeout_seconds = timeout_seconds
+        self._idle = queue.LifoQueue(maxsize=max(int(size), 1))
+
+    def _connect(self):
+        connection_class = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=self.timeout_seconds)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, connection):
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class EmbeddingClient:
+    """Batched client for OpenAI-compatible embedding endpoints."""
+
+    def __init__(
+        self,
+        api_key,
+        model,
+        url=None,
+        max_batch_items=DEFAULT_MAX_BATCH_ITEMS,
+        max_batch_tokens=DEFAULT_MAX_BATCH_TOKENS,
+        concurrency=DEFAULT_CONCURRENCY,
+        max_retries=DEFAULT_MAX_RETRIES,
+        timeout_seconds=20,
+        backoff_seconds=0.5,
+        max_backoff_seconds=DEFAULT_MAX_BACKOFF_SECONDS,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.url = url or OPENAI_EMBEDDINGS_URL
+        self.max_batch_items = max(int(max_batch_items), 1)
+        self.max_batch_tokens = max(int(max_batch_tokens), 1)
+        self.concurrency = max(int(concurrency), 1)
+        self.max_retries = max(int(max_retries), 0)
+        self.backoff_seconds = float(backoff_seconds)
+        self.max_backoff_seconds = max(float(max_backoff_seconds), 0.0)
+        self._pool = _ConnectionPool(self.url, size=self.concurrency, timeout_seconds=timeout_seconds)
+        self._retry_lock = threading.Lock()
+
+    def close(self):
+        self._pool.close()
+
+    def plan_batches(self, texts):
+        batches = []
+        current, current_tokens = [], 0
+        for position, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            if current and (len(current) >= self.max_batch_items or current_tokens + tokens > self.max_batch_tokens):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(position)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def embed(self, texts):
+        texts = [text or "" for text in texts]
+        result = EmbeddingResult(vectors=[None] * len(texts))
+        batches = self.plan_batches(texts)
+        result.batches = len(batches)
+        if not batches:
+            return result
+
+        def run(batch):
+            return batch, self._embed_batch([texts[position] for position in batch], result)
+
+        workers = min(self.concurrency, len(batches))
+        if workers == 1:
+            outcomes = [run(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                outcomes = list(executor.map(run, batches))
+
+        for batch, (vectors, error) in outcomes:
+            if vectors is None:
+                result.failed_batches += 1
+                result.errors.append(error)
+                continue
+            for position, vector in zip(batch, vectors):
+                result.vectors[position] = vector
+        return result
+
+    def _embed_batch(self, texts, result):
+        body = json.dumps({"model": self.model, "input": texts}).encode("utf-8")
+        last_error = ""
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                with self._retry_lock:
+                    result.retries += 1
+            try:
+                return self._parse(self._post(body), len(texts)), ""
+            except _RetryableError as exc:
+                last_error = str(exc)
+                if attempt >= self.max_retries:
+                    break
+                delay = exc.retry_after
+                if delay is None:
+                    delay = self.backoff_seconds * (2**attempt) * (1.0 + random.random() * 0.25)
+                # The caller is usually a search or chat request, so the server never holds it for long.
+                time.sleep(min(delay, self.max_backoff_seconds))
+            except ValueError as exc:
+                return None, str(exc)
+        return None, last_error
+
+    def _post(self, body):
+        connection = self._pool.acquire()
+        try:
+            connection.request(
+                "POST",
+                self._pool.path,
+                body=body,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                    "Connection": "keep-alive",
+                },
+            )
+            response = connection.getresponse()
+            raw = response.read()
+        except (OSError, http.client.HTTPException) as exc:
+            connection.close()
+            raise _RetryableError(f"connection_error:{exc.__class__.__name__}")
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._pool.release(connection)
+
+        if response.status in RETRYABLE_STATUS_CODES:
+            retry_after = response.getheader("Retry-After")
+            try:
+                retry_after = float(retry_after) if retry_after is not None else None
+            except ValueError:
+                retry_after = None
+            if retry_after is not None and not (math.isfinite(retry_after) and retry_after >= 0):
+                retry_after = None
+            raise _RetryableError(f"http_{response.status}", retry_after=retry_after)
+        if response.status >= 400:
+            raise ValueError(f"http_{response.status}")
+        return raw
+
+    @staticmethod
+    def _parse(raw, expected):
+        try:
+            data = json.loads(raw.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise ValueError("invalid_json")
+
+        records = data.get("data") if isinstance(data, dict) else None
+        if not isinstance(records, list) or len(records) != expected:
+            raise ValueError("unexpected_record_count")
+        records = sorted(records, key=lambda row: row.get("index", 0) if isinstance(row, dict) else 0)
+
+        vectors = []
+        for record in records:
+            embedding = record.get("embedding") if isinstance(record, dict) else None
+            if not isinstance(embedding, list) or not embedding:
+                raise ValueError("missing_embedding")
+            try:
+                vectors.append([float(value) for value in embedding])
+            except (TypeError, ValueError):
+                raise ValueError("invalid_embedding")
+        return vectors
@@ -0,0 +1,267 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.ai.models import (
+    KnowledgeChunk,
+    KnowledgeCorpusStats,
+    KnowledgeDocument,
+    KnowledgeEmbeddingMigration,
+    KnowledgeStagedEmbedding,
+)
+from apps.ai.services.retrieval import active_embedding_model, embed_texts, embedding_tag, rebuild_document_chunks
+from apps.ai.services.search_cache import bump_corpus_version
+from apps.ai.services.vector_codec import DEFAULT_STORAGE_DTYPE, pack_vector
+from apps.ai.services.vector_index import get_vector_index
+
+
+MIGRATION_WORKERS = int(os.getenv("KNOWLEDGE_MIGRATION_WORKERS", "4"))
+MIGRATION_BATCH_SIZE = int(os.getenv("KNOWLEDGE_MIGRATION_BATCH_SIZE", "256"))
+DOCUMENTS_PER_TASK = 8
+CUTOVER_BATCH_SIZE = 500
+CUTOVER_CATCH_UP_PASSES = 3
+
+
+def _in_worker_thread(func, *args):
+    try:
+        return func(*args)
+    finally:
+        connection.close()
+
+
+def start_migration(model_tag="", chunk_size=None, overlap=None, restart=False):
+    """Returns the unfinished migration with the same target, or starts a new one."""
+    kind = KnowledgeEmbeddingMigration.KIND_RECHUNK if chunk_size else KnowledgeEmbeddingMigration.KIND_REEMBED
+    unfinished = KnowledgeEmbeddingMigration.objects.filter(
+        status__in=(KnowledgeEmbeddingMigration.STATUS_RUNNING, KnowledgeEmbeddingMigration.STATUS_READY),
+        kind=kind,
+        model_tag=model_tag,
+        chunk_size=chunk_size,
+        overlap=overlap,
+    )
+    current = unfinished.first()
+    if current is not None and not restart:
+        return current
+    with transaction.atomic():
+        for migration in unfinished:
+            migration.staged_embeddings.all().delete()
+            migration.status = KnowledgeEmbeddingMigration.STATUS_CANCELLED
+            migration.finished_at = timezone.now()
+            migration.save(update_fields=["status", "finished_at", "updated_at"])
+        return KnowledgeEmbeddingMigration.objects.create(
+            kind=kind, model_tag=model_tag, chunk_size=chunk_size, overlap=overlap
+        )
+
+
+def _stage_chunks(migration, chunks, batch_size):
+    # Fallback vectors come from another model, so those chunks stay unstaged for the next pass to retry.
+    target = embedding_tag(migration.model_tag)
+    staged = 0
+    for start in range(0, len(chunks), batch_size):
+        batch = chunks[start : start + batch_size]
+        embedded = embed_texts([content for _, content, _ in batch], model=migration.model_tag)
+        rows = [
+            KnowledgeStagedEmbedding(
+                migration=migration,
+                chunk_id=chunk_id,
+                content_hash=content_hash,
+                embedding_vector=pack_vector(vector, DEFAULT_STORAGE_DTYPE),
+                embedding_dtype=DEFAULT_STORAGE_DTYPE,
+                embedding_dimension=len(vector),
+                embedding_model=model_tag,
+            )
+            for (chunk_id, _, content_hash), vector, model_tag in zip(batch, embedded.vectors, embedded.model_tags)
+            if model_tag == target
+        ]
+        KnowledgeStagedEmbedding.objects.bulk_create(rows, ignore_conflicts=True)
+        staged += len(rows)
+    return staged
+
+
+def _unstaged_queryset(migration):
+    # Parked rows belong to a rebuild in flight, which embeds them with the active model itself.
+    return KnowledgeChunk.objects.live().exclude(staged_embeddings__migration=migration)
+
+
+def _unstaged_chunks(migration, documents=None):
+    chunks = _unstaged_queryset(migration)
+    if documents is not None:
+        chunks = chunks.filter(document_id__in=documents)
+    return list(chunks.order_by("id").values_list("id", "content", "content_hash"))
+
+
+def _drop_stale_staged(migration):
+    # Chunks edited since they were staged get a fresh vector from the next _stage_chunks pass.
+    stale = KnowledgeStagedEmbedding.objects.filter(migration=migration).exclude(content_hash=F("chunk__content_hash"))
+    return stale.delete()[0]
+
+
+def _drop_foreign_staged(migration):
+    # Rows staged from a fallback model before _stage_chunks filtered them are re-embedded too.
+    foreign = KnowledgeStagedEmbedding.objects.filter(migration=migration).exclude(
+        embedding_model=embedding_tag(migration.model_tag)
+    )
+    return foreign.delete()[0]
+
+
+def _process_documents(migration, document_ids, batch_size):
+    if migration.kind == KnowledgeEmbeddingMigration.KIND_RECHUNK:
+        created = 0
+        for document in KnowledgeDocument.objects.filter(id__in=document_ids).order_by("id"):
+            stats = rebuild_document_chunks(document, chunk_size=migration.chunk_size, overlap=migration.overlap)
+            created += stats["created_chunks"]
+        return created
+    return _stage_chunks(migration, _unstaged_chunks(migration, document_ids), batch_size)
+
+
+def run_migration(migration, workers=None, batch_size=None, documents_per_task=None, max_documents=None):
+    """Walks documents in id order from the checkpoint, ``workers`` tasks at a time.
+
+    The checkpoint only advances once every task of a window finished, so an interrupted
+    run resumes without skipping documents; staged rows already written are not re-embedded.
+    """
+    workers = MIGRATION_WORKERS if workers is None else max(int(workers), 1)
+    batch_size = max(int(batch_size or MIGRATION_BATCH_SIZE), 1)
+    documents_per_task = max(int(documents_per_task or DOCUMENTS_PER_TASK), 1)
+    if migration.status != KnowledgeEmbeddingMigration.STATUS_RUNNING:
+        return migration
+
+    executor = None
+    if workers > 1:
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="knowledge-migration")
+    processed = 0
+    try:
+        while max_documents is None or processed < max_documents:
+            window = workers * documents_per_task
+            if max_documents is not None:
+                window = min(window, max_documents - processed)
+            document_ids = list(
+                KnowledgeDocument.objects.filter(id__gt=migration.last_document_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:window]
+            )
+            if not document_ids:
+                migration.status = (
+                    KnowledgeEmbeddingMigration.STATUS_READY
+                    if migration.kind == KnowledgeEmbeddingMigration.KIND_REEMBED
+                    else KnowledgeEmbeddingMigration.STATUS_COMPLETED
+                )
+                if migration.status == KnowledgeEmbeddingMigration.STATUS_COMPLETED:
+                    migration.finished_at = timezone.now()
+                migration.save(update_fields=["status", "finished_at", "updated_at"])
+                break
+
+            tasks = [
+                document_ids[start : start + documents_per_task]
+                for start in range(0, len(document_ids), documents_per_task)
+            ]
+            if executor is None:
+                chunks = sum(_process_documents(migration, task, batch_size) for task in tasks)
+            else:
+                futures = [
+                    executor.submit(_in_worker_thread, _process_documents, migration, task, batch_size)
+                    for task in tasks
+                ]
+                chunks = sum(future.result() for future in futures)
+
+            KnowledgeEmbeddingMigration.objects.filter(pk=migration.pk).update(
+                last_document_id=document_ids[-1],
+                processed_documents=F("processed_documents") + len(document_ids),
+                processed_chunks=F("processed_chunks") + chunks,
+                error="",
+                updated_at=timezone.now(),
+            )
+            migration.refresh_from_db()
+            processed += len(document_ids)
+    except Exception as exc:
+        KnowledgeEmbeddingMigration.objects.filter(pk=migration.pk).update(error=str(exc)[:2000])
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+    return migration
+
+
+def cut_over(migration, batch_size=None):
+    """Swaps the staged vectors onto the chunks and makes the migration's model the active one.
+
+    Chunks created or edited while the migration ran are embedded first, outside the transaction,
+    so searches keep serving the previous vectors until the single commit that flips everything.
+    Nothing is embedded under the lock: if chunks changed again meanwhile, or some could only be
+    embedded by the fallback model, the cut-over raises and can simply be re-run.
+    """
+    if migration.status != KnowledgeEmbeddingMigration.STATUS_READY:
+        raise ValueError(f"migration_not_ready:{migration.status}")
+    batch_size = max(int(batch_size or MIGRATION_BATCH_SIZE), 1)
+    caught_up = 0
+    for _ in range(CUTOVER_CATCH_UP_PASSES):
+        _drop_foreign_staged(migration)
+        _drop_stale_staged(migration)
+        pending = _unstaged_chunks(migration)
+        if not pending:
+            break
+        caught_up += _stage_chunks(migration, pending, batch_size)
+
+    with transaction.atomic():
+        foreign = (
+            KnowledgeStagedEmbedding.objects.filter(migration=migration)
+            .exclude(embedding_model=embedding_tag(migration.model_tag))
+            .count()
+        )
+        if foreign:
+            raise ValueError(f"migration_foreign_vectors:{foreign}")
+        _drop_stale_staged(migration)
+        unstaged = _unstaged_queryset(migration).count()
+        if unstaged:
+            raise ValueError(f"migration_not_caught_up:{unstaged}")
+        staged = KnowledgeStagedEmbedding.objects.filter(migration=migration).order_by("chunk_id")
+        swapped = 0
+        pending = []
+        for chunk_id, data, dtype, dimension, model_tag in staged.values_list(
+            "chunk_id", "embedding_vector", "embedding_dtype", "embedding_dimension", "embedding_model"
+        ).iterator(chunk_size=CUTOVER_BATCH_SIZE):
+            pending.append(
+                KnowledgeChunk(
+                    id=chunk_id,
+                    embedding_vector=data,
+                    embedding_dtype=dtype,
+                    embedding_dimension=dimension,
+                    embedding_model=model_tag,
+                )
+            )
+            if len(pending) >= CUTOVER_BATCH_SIZE:
+                swapped += _swap_vectors(pending)
+                pending = []
+        swapped += _swap_vectors(pending)
+        staged.delete()
+
+        KnowledgeCorpusStats.get_current()
+        KnowledgeCorpusStats.objects.filter(slug="current").update(embedding_model=migration.model_tag)
+        version = bump_corpus_version()
+        # Every vector changed, so index snapshots taken before this must replay every document.
+        KnowledgeDocument.objects.update(index_version=version)
+        migration.status = KnowledgeEmbeddingMigration.STATUS_COMPLETED
+        migration.finished_at = timezone.now()
+        migration.save(update_fields=["status", "finished_at", "updated_at"])
+        transaction.on_commit(_reload_vector_index)
+    return {"swapped_chunks": swapped, "caught_up_chunks": caught_up, "corpus_version": version}
+
+
+def _swap_vectors(chunks):
+    if chunks:
+        KnowledgeChunk.objects.bulk_update(
+            chunks, ["embedding_vector", "embedding_dtype", "embedding_dimension", "embedding_model"]
+        )
+    return len(chunks)
+
+
+def _reload_vector_index():
+    index = get_vector_index()
+    if index.shared_path:
+        index.publish()
+    else:
+        index.reset()
+    index.embedding_model = active_embedding_model()
@@ -0,0 +1,242 @@
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from django.db.models import F
+
+from apps.ai.models import KnowledgeCorpusStats, KnowledgeEntity, KnowledgeRelation
+
+
+DIRECTION_OUT = "out"
+DIRECTION_IN = "in"
+DIRECTION_BOTH = "both"
+DIRECTIONS = (DIRECTION_OUT, DIRECTION_IN, DIRECTION_BOTH)
+ORDER_SCORE = "score"
+ORDER_PAGERANK = "pagerank"
+ORDER_DEGREE = "degree"
+ORDERS = (ORDER_SCORE, ORDER_PAGERANK, ORDER_DEGREE)
+MAX_HOPS = 4
+MAX_TOP = 500
+BUILD_BATCH_SIZE = 5000
+
+
+def graph_version():
+    version = KnowledgeCorpusStats.objects.filter(slug="current").values_list("graph_version", flat=True).first()
+    return int(version or 0)
+
+
+def bump_graph_version():
+    # Stored next to the corpus version so every worker drops its adjacency once the write commits.
+    KnowledgeCorpusStats.get_current()
+    KnowledgeCorpusStats.objects.filter(slug="current").update(graph_version=F("graph_version") + 1)
+
+
+def _csr(rows, columns, weights, size):
+    order = np.lexsort((-weights, rows))
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+    return indptr, columns[order], weights[order]
+
+
+def _centrality(entity_ids):
+    # Scores precomputed by compute_graph_centrality, aligned with the adjacency positions.
+    pagerank = np.zeros(entity_ids.shape[0], dtype=np.float64)
+    degree = np.zeros(entity_ids.shape[0], dtype=np.float64)
+    rows = list(
+        KnowledgeEntity.objects.order_by()
+        .exclude(pagerank=0.0, degree_centrality=0.0)
+        .values_list("id", "pagerank", "degree_centrality")
+        .iterator(chunk_size=BUILD_BATCH_SIZE)
+    )
+    if not rows or not entity_ids.shape[0]:
+        return pagerank, degree
+    ids, scores, degrees = (np.asarray(column) for column in zip(*rows))
+    positions = np.minimum(np.searchsorted(entity_ids, ids), entity_ids.shape[0] - 1)
+    present = entity_ids[positions] == ids
+    pagerank[positions[present]] = scores[present]
+    degree[positions[present]] = degrees[present]
+    return pagerank, degree
+
+
+@dataclass(frozen=True)
+class GraphAdjacency:
+    """Relation weights in compressed sparse row form, both directions, over dense entity positions.
+
+    Each row's neighbours are stored heaviest first.
+    """
+
+    version: int
+    entity_ids: np.ndarray
+    out_indptr: np.ndarray
+    out_indices: np.ndarray
+    out_weights: np.ndarray
+    in_indptr: np.ndarray
+    in_indices: np.ndarray
+    in_weights: np.ndarray
+    pagerank: np.ndarray
+    degree_centrality: np.ndarray
+    max_weight: float
+    build_ms: float
+
+    @classmethod
+    def build(cls, version):
+        started = time.perf_counter()
+        sources, targets, weights = [], [], []
+        records = (
+            KnowledgeRelation.objects.order_by()
+            .values_list("source_entity_id", "target_entity_id", "weight")
+            .iterator(chunk_size=BUILD_BATCH_SIZE)
+        )
+        for source, target, weight in records:
+            sources.append(source)
+            targets.append(target)
+            weights.append(weight)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float32)
+
+        entity_ids = np.unique(np.concatenate([sources, targets]))
+        rows = np.searchsorted(entity_ids, sources)
+        columns = np.searchsorted(entity_ids, targets)
+        out_indptr, out_indices, out_weights = _csr(rows, columns, weights, entity_ids.shape[0])
+        in_indptr, in_indices, in_weights = _csr(columns, rows, weights, entity_ids.shape[0])
+        pagerank, degree_centrality = _centrality(entity_ids)
+        return cls(
+            version=version,
+            entity_ids=entity_ids,
+            out_indptr=out_indptr,
+            out_indices=out_indices,
+            out_weights=out_weights,
+            in_indptr=in_indptr,
+            in_indices=in_indices,
+            in_weights=in_weights,
+            pagerank=pagerank,
+            degree_centrality=degree_centrality,
+            max_weight=float(weights.max()) if weights.size else 1.0,
+            build_ms=round((time.perf_counter() - started) * 1000, 3),
+        )
+
+    @property
+    def relation_count(self) -> int:
+        return int(self.out_indices.shape[0])
+
+    def position(self, entity_id):
+        position = int(np.searchsorted(self.entity_ids, entity_id))
+        if position < self.entity_ids.shape[0] and self.entity_ids[position] == entity_id:
+            return position
+        return None
+
+    def _edges(self, frontier, direction):
+        parts = []
+        if direction in (DIRECTION_OUT, DIRECTION_BOTH):
+            parts.append((self.out_indptr, self.out_indices, self.out_weights))
+        if direction in (DIRECTION_IN, DIRECTION_BOTH):
+            parts.append((self.in_indptr, self.in_indices, self.in_weights))
+        origins, neighbours, weights = [], [], []
+        for indptr, indices, edge_weights in parts:
+            starts = indptr[frontier]
+            counts = indptr[frontier + 1] - starts
+            total = int(counts.sum())
+            if not total:
+                continue
+            # Flattened CSR slices: every edge index of every frontier row in one array.
+            offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+            origins.append(np.repeat(np.arange(frontier.shape[0]), counts))
+            neighbours.append(indices[offsets])
+            weights.append(edge_weights[offsets])
+        if not origins:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0, dtype=np.float32)
+        return np.concatenate(origins), np.concatenate(neighbours), np.concatenate(weights)
+
+    def importance(self, order):
+        return {ORDER_PAGERANK: self.pagerank, ORDER_DEGREE: self.degree_centrality}.get(order)
+
+    def neighbors(self, entity_id, hops=2, top=50, min_weight=0.0, direction=DIRECTION_BOTH, order=ORDER_SCORE):
+        """Best-scoring entities within ``hops`` of ``entity_id``.
+
+        A path scores the product of its edge weights over the heaviest weight in the graph.
+        Edges below ``min_weight`` are never followed, and each hop only expands the ``top``
+        best new entities, so the work per hop is bounded by their degrees. With ``order`` set
+        to a centrality, the entities kept per hop and returned are the most central ones.
+        """
+        start = self.position(entity_id)
+        if start is None:
+            return []
+        importance = self.importance(order)
+        best = {start: (1.0, 0, None)}
+        frontier = np.asarray([start], dtype=np.int64)
+        frontier_scores = np.ones(1, dtype=np.float64)
+        for hop in range(1, hops + 1):
+            origins, neighbours, weights = self._edges(frontier, direction)
+            keep = weights >= min_weight
+            origins, neighbours = origins[keep], neighbours[keep]
+            scores = frontier_scores[origins] * (weights[keep] / self.max_weight)
+            if not neighbours.shape[0]:
+                break
+
+            # Highest score per neighbour: sort by score, then keep each neighbour's first row.
+            by_score = np.lexsort((-scores, neighbours))
+            neighbours, scores, origins = neighbours[by_score], scores[by_score], origins[by_score]
+            first = np.ones(neighbours.shape[0], dtype=bool)
+            first[1:] = neighbours[1:] != neighbours[:-1]
+            neighbours, scores, origins = neighbours[first], scores[first], origins[first]
+
+            fresh = []
+            for neighbour, score, origin in zip(neighbours.tolist(), scores.tolist(), origins.tolist()):
+                known = best.get(neighbour)
+                if known is None or score > known[0]:
+                    # A better path to a known entity is recorded, but its neighbours are not re-expanded.
+                    best[neighbour] = (score, hop, int(frontier[origin]))
+                    if known is None:
+                        fresh.append((score, neighbour))
+            if not fresh:
+                break
+            if importance is None:
+                fresh.sort(reverse=True)
+            else:
+                fresh.sort(key=lambda item: (importance[item[1]], item[0]), reverse=True)
+            fresh = fresh[:top]
+            frontier = np.asarray([neighbour for _, neighbour in fresh], dtype=np.int64)
+            frontier_scores = np.asarray([score for score, _ in fresh], dtype=np.float64)
+
+        del best[start]
+        if importance is None:
+            ranked = sorted(best.items(), key=lambda item: (-item[1][0], item[1][1], item[0]))[:top]
+        else:
+            ranked = sorted(best.items(), key=lambda item: (-importance[item[0]], -item[1][0], item[0]))[:top]
+        return [
+            {
+                "entity_id": int(self.entity_ids[position]),
+                "score": round(score, 6),
+                "hops": hop,
+                "via_entity_id": int(self.entity_ids[parent]),
+                "pagerank": float(self.pagerank[position]),
+                "degree_centrality": float(self.degree_centrality[position]),
+            }
+            for position, (score, hop, parent) in ranked
+        ]
+
+
+_adjacency = None
+_adjacency_lock = threading.Lock()
+
+
+def get_graph_adjacency():
+    """Returns the cached adjacency, rebuilding it when the stored graph version moved."""
+    global _adjacency
+    version = graph_version()
+    current = _adjacency
+    if current is not None and current.version == version:
+        return current
+    with _adjacency_lock:
+        if _adjacency is None or _adjacency.version != version:
+            _adjacency = GraphAdjacency.build(version)
+        return _adjacency
+
+
+def reset_graph_adjacency():
+    global _adjacency
+    with _adjacency_lock:
+        _adjacency = None
@@ -0,0 +1,151 @@
+import os
+from dataclasses import dataclass
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from apps.ai.models import KnowledgeChunk, KnowledgeCorpusStats, KnowledgeDocument, KnowledgePosting, KnowledgeTermStat
+from apps.ai.services.keyword_index import POSTING_BATCH_SIZE, index_chunks
+from apps.ai.services.shared_index import map_arrays, mapped_segments, segment_table, write_arrays
+
+
+INDEX_SNAPSHOT_PATH = os.getenv("KNOWLEDGE_INDEX_SNAPSHOT_PATH", "").strip()
+SNAPSHOT_MAGIC = b"KSNP"
+SNAPSHOT_FORMAT_VERSION = 1
+EXPORT_BATCH_SIZE = 5000
+
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    # version is the corpus version read before any row was exported.
+    version: int
+    quantization: str
+    created_at: str
+    segments: dict[int, dict[str, np.ndarray | None]]
+    terms: list[str]
+    posting_terms: np.ndarray
+    posting_chunk_ids: np.ndarray
+    posting_frequencies: np.ndarray
+
+    @property
+    def rows(self) -> int:
+        return sum(int(arrays["chunk_ids"].shape[0]) for arrays in self.segments.values())
+
+    @property
+    def document_ids(self) -> np.ndarray:
+        ids = [arrays["document_ids"] for arrays in self.segments.values()]
+        return np.unique(np.concatenate(ids)) if ids else np.zeros(0, dtype=np.int64)
+
+
+def _export_postings():
+    term_ids: dict[str, int] = {}
+    posting_terms, chunk_ids, frequencies = [], [], []
+    records = (
+        KnowledgePosting.objects.order_by("id")
+        .values_list("term", "chunk_id", "term_frequency")
+        .iterator(chunk_size=EXPORT_BATCH_SIZE)
+    )
+    for term, chunk_id, frequency in records:
+        posting_terms.append(term_ids.setdefault(term, len(term_ids)))
+        chunk_ids.append(chunk_id)
+        frequencies.append(frequency)
+    # Terms only contain [a-z0-9_], so a newline-joined blob round-trips without escaping.
+    terms = "\n".join(term_ids).encode("ascii")
+    return {
+        "terms": np.frombuffer(terms, dtype=np.uint8),
+        "term_ids": np.asarray(posting_terms, dtype=np.int32),
+        "chunk_ids": np.asarray(chunk_ids, dtype=np.int64),
+        "term_frequency": np.asarray(frequencies, dtype=np.uint32),
+    }
+
+
+def write_snapshot(path, version, quantization, segments):
+    """Writes segments and postings to ``path``; ``version`` must be read before the segments were loaded."""
+    table, arrays = segment_table(segments)
+    postings = {}
+    for name, array in _export_postings().items():
+        spec = postings[name] = {}
+        arrays.append((spec, array))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    write_arrays(
+        path,
+        SNAPSHOT_MAGIC,
+        SNAPSHOT_FORMAT_VERSION,
+        version,
+        {
+            "corpus_version": int(version),
+            "quantization": quantization,
+            "created_at": timezone.now().isoformat(),
+            "segments": table,
+            "postings": postings,
+        },
+        arrays,
+    )
+
+
+def read_snapshot(path):
+    mapped = map_arrays(path, SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION)
+    if mapped is None:
+        return None
+    table = mapped.table
+    postings = {name: mapped.array(spec) for name, spec in table["postings"].items()}
+    terms = bytes(postings["terms"]).decode("ascii")
+    return IndexSnapshot(
+        version=mapped.version,
+        quantization=table["quantization"],
+        created_at=table["created_at"],
+        segments=mapped_segments(mapped, table["segments"]),
+        terms=terms.split("\n") if terms else [],
+        posting_terms=postings["term_ids"],
+        posting_chunk_ids=postings["chunk_ids"],
+        posting_frequencies=postings["term_frequency"],
+    )
+
+
+def changed_since(snapshot):
+    """Documents whose chunks changed after the snapshot, and snapshot documents that no longer exist."""
+    changed = set(KnowledgeDocument.objects.filter(index_version__gt=snapshot.version).values_list("id", flat=True))
+    exported = [int(document_id) for document_id in snapshot.document_ids]
+    live = set(KnowledgeDocument.objects.filter(id__in=exported).values_list("id", flat=True))
+    return changed, set(exported) - live
+
+
+def restore_postings(snapshot):
+    """Loads BM25 postings into empty tables; documents changed since the snapshot are re-tokenized."""
+    if KnowledgePosting.objects.exists():
+        raise ValueError("postings_not_empty")
+    changed = set(KnowledgeDocument.objects.filter(index_version__gt=snapshot.version).values_list("id", flat=True))
+    restored = KnowledgeChunk.objects.live().exclude(document_id__in=changed)
+    restored_ids = np.fromiter(restored.values_list("id", flat=True), dtype=np.int64)
+    keep = np.flatnonzero(np.isin(snapshot.posting_chunk_ids, restored_ids))
+
+    with transaction.atomic():
+        KnowledgeTermStat.objects.all().delete()
+        for start in range(0, keep.shape[0], POSTING_BATCH_SIZE):
+            batch = keep[start : start + POSTING_BATCH_SIZE]
+            KnowledgePosting.objects.bulk_create(
+                [
+                    KnowledgePosting(
+                        term=snapshot.terms[int(snapshot.posting_terms[position])],
+                        chunk_id=int(snapshot.posting_chunk_ids[position]),
+                        term_frequency=int(snapshot.posting_frequencies[position]),
+                    )
+                    for position in batch
+                ]
+            )
+        frequencies = KnowledgePosting.objects.values("term").annotate(chunks=Count("id")).values_list("term", "chunks")
+        KnowledgeTermStat.objects.bulk_create(
+            [KnowledgeTermStat(term=term, document_frequency=chunks) for term, chunks in frequencies],
+            batch_size=POSTING_BATCH_SIZE,
+        )
+        totals = restored.aggregate(chunks=Count("id"), tokens=Sum("token_count"))
+        KnowledgeCorpusStats.get_current()
+        KnowledgeCorpusStats.objects.filter(slug="current").update(
+            chunk_count=totals["chunks"], total_tokens=totals["tokens"] or 0
+        )
+        reindexed = index_chunks(
+            KnowledgeChunk.objects.live().filter(document_id__in=changed).only("id", "content", "token_count")
+        )
+    return {"restored_postings": int(keep.shape[0]), "reindexed_postings": reindexed, "changed_documents": len(changed)}
@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.ai.models import KnowledgeIngestItem, KnowledgeIngestJob
+from apps.ai.services.knowledge_ingest import ingest_knowledge_source
+
+
+# Zero runs jobs inline when the creating transaction commits (used by tests and single-process setups).
+INGEST_WORKERS = int(os.getenv("KNOWLEDGE_INGEST_WORKERS", "4"))
+ITEM_WRITE_BATCH_SIZE = 500
+MAX_ERROR_LENGTH = 2000
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _item_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(INGEST_WORKERS, 1), thread_name_prefix="knowledge-ingest")
+        return _executor
+
+
+def _in_worker_thread(func, *args):
+    try:
+        return func(*args)
+    finally:
+        # Worker threads own their DB connection; close it so it is not leaked per item.
+        connection.close()
+
+
+def create_ingest_job(payloads, user=None, options=None, start=True):
+    with transaction.atomic():
+        job = KnowledgeIngestJob.objects.create(total_items=len(payloads), options=options or {}, created_by=user)
+        KnowledgeIngestItem.objects.bulk_create(
+            [KnowledgeIngestItem(job=job, position=position, payload=payload) for position, payload in enumerate(payloads)],
+            batch_size=ITEM_WRITE_BATCH_SIZE,
+        )
+        if start:
+            transaction.on_commit(lambda: start_ingest_job(job.id))
+    return job
+
+
+def start_ingest_job(job_id):
+    if INGEST_WORKERS <= 0:
+        run_ingest_job(job_id)
+        return
+    threading.Thread(
+        target=_in_worker_thread,
+        args=(run_ingest_job, job_id),
+        name=f"knowledge-ingest-job-{job_id}",
+        daemon=True,
+    ).start()
+
+
+def run_ingest_job(job_id):
+    KnowledgeIngestJob.objects.filter(pk=job_id).update(
+        status=KnowledgeIngestJob.STATUS_RUNNING,
+        started_at=timezone.now(),
+    )
+    item_ids = list(
+        KnowledgeIngestItem.objects.filter(job_id=job_id, status=KnowledgeIngestItem.STATUS_PENDING)
+        .order_by("position")
+        .values_list("id", flat=True)
+    )
+    if INGEST_WORKERS <= 0:
+        for item_id in item_ids:
+            process_ingest_item(item_id)
+    else:
+        # Items from every job share one bounded pool, so concurrent jobs cannot oversubscribe it.
+        executor = _item_executor()
+        wait([executor.submit(_in_worker_thread, process_ingest_item, item_id) for item_id in item_ids])
+
+    job = KnowledgeIngestJob.objects.get(pk=job_id)
+    all_failed = job.total_items and job.failed_items >= job.total_items
+    job.status = KnowledgeIngestJob.STATUS_FAILED if all_failed else KnowledgeIngestJob.STATUS_COMPLETED
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "finished_at"])
+    return job
+
+
+def process_ingest_item(item_id):
+    item = KnowledgeIngestItem.objects.select_related("job__created_by").get(pk=item_id)
+    started = time.perf_counter()
+    item.status = KnowledgeIngestItem.STATUS_RUNNING
+    item.started_at = timezone.now()
+    item.save(update_fields=["status", "started_at"])
+
+    job_updates = {}
+    try:
+        # No transaction here: fetching and embedding would hold the SQLite write lock for the whole
+        # item. ingest_knowledge_source writes in short transactions and drops a half-built document.
+        document, chunking = ingest_knowledge_source(item.payload, user=item.job.created_by)
+    except Exception as exc:
+        # One bad source must not abort the rest of the job; the error is reported per item.
+        item.status = KnowledgeIngestItem.STATUS_FAILED
+        item.error = f"{exc.__class__.__name__}: {exc}"[:MAX_ERROR_LENGTH]
+        job_updates["failed_items"] = F("failed_items") + 1
+    else:
+        item.status = KnowledgeIngestItem.STATUS_SUCCEEDED
+        item.document = document
+        item.chunking = chunking
+        job_updates["succeeded_items"] = F("succeeded_items") + 1
+        job_updates["created_chunks"] = F("created_chunks") + int(chunking.get("created_chunks") or 0)
+
+    item.duration_ms = int((time.perf_counter() - started) * 1000)
+    item.finished_at = timezone.now()
+    item.save(update_fields=["status", "error", "document", "chunking", "duration_ms", "finished_at"])
+    KnowledgeIngestJob.objects.filter(pk=item.job_id).update(**job_updates)
+    return item
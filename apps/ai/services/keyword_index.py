@@ -0,0 +1,136 @@
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from apps.ai.models import KnowledgeChunk, KnowledgeCorpusStats, KnowledgePosting, KnowledgeTermStat
+
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+MAX_TERM_LENGTH = 128
+POSTING_BATCH_SIZE = 1000
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    return [match.group(0).lower() for match in TOKEN_PATTERN.finditer(text or "")]
+
+
+def term_frequencies(text):
+    return Counter(term for term in tokenize(text) if len(term) <= MAX_TERM_LENGTH)
+
+
+def _apply_document_frequency_deltas(deltas, sign):
+    # Group terms by delta so each distinct increment is a single UPDATE.
+    terms_by_delta = defaultdict(list)
+    for term, delta in deltas.items():
+        terms_by_delta[delta].append(term)
+    for delta, terms in terms_by_delta.items():
+        KnowledgeTermStat.objects.filter(term__in=terms).update(
+            document_frequency=F("document_frequency") + sign * delta
+        )
+
+
+def index_chunks(chunks):
+    chunks = [chunk for chunk in chunks if chunk.pk]
+    if not chunks:
+        return 0
+
+    postings = []
+    document_frequency = Counter()
+    total_tokens = 0
+    for chunk in chunks:
+        frequencies = term_frequencies(chunk.content)
+        document_frequency.update(frequencies.keys())
+        total_tokens += int(chunk.token_count or 0)
+        postings.extend(
+            KnowledgePosting(term=term, chunk_id=chunk.pk, term_frequency=count)
+            for term, count in frequencies.items()
+        )
+
+    with transaction.atomic():
+        KnowledgePosting.objects.bulk_create(postings, batch_size=POSTING_BATCH_SIZE)
+        KnowledgeTermStat.objects.bulk_create(
+            [KnowledgeTermStat(term=term, document_frequency=0) for term in document_frequency],
+            batch_size=POSTING_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        _apply_document_frequency_deltas(document_frequency, sign=1)
+        KnowledgeCorpusStats.get_current()
+        KnowledgeCorpusStats.objects.filter(slug="current").update(
+            chunk_count=F("chunk_count") + len(chunks),
+            total_tokens=F("total_tokens") + total_tokens,
+        )
+    return len(postings)
+
+
+def unindex_chunks(chunk_queryset):
+    chunk_totals = chunk_queryset.aggregate(chunks=Count("id"), tokens=Sum("token_count"))
+    if not chunk_totals["chunks"]:
+        return 0
+
+    postings = KnowledgePosting.objects.filter(chunk__in=chunk_queryset)
+    deltas = dict(postings.values("term").annotate(chunks=Count("id")).values_list("term", "chunks"))
+    with transaction.atomic():
+        _apply_document_frequency_deltas(deltas, sign=-1)
+        KnowledgeTermStat.objects.filter(term__in=list(deltas), document_frequency__lte=0).delete()
+        deleted, _ = postings.delete()
+        KnowledgeCorpusStats.get_current()
+        KnowledgeCorpusStats.objects.filter(slug="current").update(
+            chunk_count=F("chunk_count") - chunk_totals["chunks"],
+            total_tokens=F("total_tokens") - (chunk_totals["tokens"] or 0),
+        )
+    return deleted
+
+
+def unindex_document(document_id):
+    # Parked rows of an unfinished rebuild were never indexed, so they are not subtracted either.
+    return unindex_chunks(KnowledgeChunk.objects.live().filter(document_id=document_id))
+
+
+def reindex_document(document_id):
+    with transaction.atomic():
+        unindex_document(document_id)
+        return index_chunks(
+            KnowledgeChunk.objects.live().filter(document_id=document_id).only("id", "content", "token_count")
+        )
+
+
+def bm25_scores(query_terms, k1=BM25_K1, b=BM25_B, documents=None, chunk_ids=None):
+    query_counts = Counter(term for term in query_terms if len(term) <= MAX_TERM_LENGTH)
+    if not query_counts:
+        return {}
+
+    stats = KnowledgeCorpusStats.get_current()
+    chunk_count = max(int(stats.chunk_count), 1)
+    average_length = max(float(stats.total_tokens) / chunk_count, 1.0)
+    idf = {
+        term: math.log(1.0 + (chunk_count - df + 0.5) / (df + 0.5))
+        for term, df in KnowledgeTermStat.objects.filter(term__in=list(query_counts)).values_list(
+            "term", "document_frequency"
+        )
+    }
+    if not idf:
+        return {}
+
+    scores = defaultdict(float)
+    postings = KnowledgePosting.objects.filter(term__in=list(idf))
+    if documents is not None:
+        # Corpus statistics stay global; the filter only limits which postings are scored.
+        postings = postings.filter(chunk__document__in=documents)
+    if chunk_ids is not None:
+        postings = postings.filter(chunk_id__in=list(chunk_ids))
+    rows = postings.values_list("chunk_id", "term", "term_frequency", "chunk__token_count")
+    for chunk_id, term, tf, length in rows.iterator(chunk_size=POSTING_BATCH_SIZE):
+        norm = k1 * (1.0 - b + b * (float(length or 0) / average_length))
+        scores[chunk_id] += query_counts[term] * idf[term] * (tf * (k1 + 1.0)) / (tf + norm)
+    return {chunk_id: round(score, 6) for chunk_id, score in scores.items()}
+
+
+def bm25_top_k(query_terms, limit, k1=BM25_K1, b=BM25_B, documents=None):
+    scores = bm25_scores(query_terms, k1=k1, b=b, documents=documents)
+    return heapq.nlargest(max(int(limit), 1), scores.items(), key=lambda item: (item[1], -item[0])), scores
@@ -0,0 +1,257 @@
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.db.models import F
+from django.db.models.functions import Round
+
+from apps.ai.models import KnowledgeChunk, KnowledgeEntity, KnowledgeEntityPosting, KnowledgePosting, KnowledgeRelation
+from apps.ai.services.graph_index import ORDER_SCORE, bump_graph_version, get_graph_adjacency
+from apps.ai.services.keyword_index import tokenize
+
+
+TERM_ENTITY = "term"
+RELATED_TO = "related_to"
+TERMS_PER_NOTE = 14
+RELATION_WEIGHT = 1.0
+RELATION_WEIGHT_STEP = 0.1
+GRAPH_WRITE_BATCH_SIZE = 500
+GRAPH_MIN_WEIGHT = float(os.getenv("KNOWLEDGE_GRAPH_MIN_WEIGHT", "1.1"))
+GRAPH_EXPANSION_TOP = int(os.getenv("KNOWLEDGE_GRAPH_EXPANSION_TOP", "20"))
+NON_ALNUM_RE = re.compile(r"[^a-z0-9_+\-]+")
+STOPWORDS = {
+    "the",
+    "and",
+    "for",
+    "with",
+    "that",
+    "this",
+    "from",
+    "into",
+    "about",
+    "have",
+    "has",
+    "will",
+    "your",
+    "you",
+    "are",
+    "can",
+    "all",
+    "not",
+    "use",
+    "using",
+    "was",
+    "were",
+    "they",
+    "their",
+    "them",
+    "then",
+    "when",
+    "what",
+}
+
+
+def entity_tokens(text: str):
+    normalized = NON_ALNUM_RE.sub(" ", text.lower())
+    for token in normalized.split():
+        if len(token) < 4 or token in STOPWORDS:
+            continue
+        yield token
+
+
+def note_terms(tokens, limit=TERMS_PER_NOTE):
+    terms = []
+    for token in dict.fromkeys(tokens):
+        terms.append(token)
+        if len(terms) >= limit:
+            break
+    return terms
+
+
+def upsert_entities(names, entity_type=TERM_ENTITY):
+    """Inserts missing entities in one statement per batch and returns {name: id}."""
+    names = list(dict.fromkeys(names))
+    ids = {}
+    for start in range(0, len(names), GRAPH_WRITE_BATCH_SIZE):
+        batch = [
+            KnowledgeEntity(name=name, entity_type=entity_type, metadata={"source": "knowledge_graph_ingest"})
+            for name in names[start : start + GRAPH_WRITE_BATCH_SIZE]
+        ]
+        # Rewriting entity_type with its own value leaves existing rows untouched but returns their ids.
+        KnowledgeEntity.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=["name", "entity_type"],
+            update_fields=["entity_type"],
+        )
+        ids.update((entity.name, entity.pk) for entity in batch if entity.pk is not None)
+    missing = [name for name in names if name not in ids]
+    if missing:
+        # Backends that cannot return ids from an upsert are resolved with one lookup.
+        ids.update(
+            KnowledgeEntity.objects.filter(entity_type=entity_type, name__in=missing).values_list("name", "id")
+        )
+    return ids
+
+
+def _entity_ids(names, entity_type=TERM_ENTITY):
+    names = sorted(names)
+    ids = {}
+    for start in range(0, len(names), GRAPH_WRITE_BATCH_SIZE):
+        ids.update(
+            KnowledgeEntity.objects.filter(
+                entity_type=entity_type, name__in=names[start : start + GRAPH_WRITE_BATCH_SIZE]
+            ).values_list("name", "id")
+        )
+    return ids
+
+
+def link_chunk_entities(chunks, entity_ids=None):
+    """Records the term entities each chunk mentions; ``entity_ids`` ({name: id}) skips the lookup."""
+    mentions = [(chunk.pk, Counter(entity_tokens(chunk.content))) for chunk in chunks if chunk.pk]
+    if entity_ids is None:
+        entity_ids = _entity_ids({name for _, counts in mentions for name in counts})
+    postings = [
+        KnowledgeEntityPosting(entity_id=entity_ids[name], chunk_id=chunk_id, mentions=count)
+        for chunk_id, counts in mentions
+        for name, count in counts.items()
+        if name in entity_ids
+    ]
+    KnowledgeEntityPosting.objects.bulk_create(postings, batch_size=GRAPH_WRITE_BATCH_SIZE, ignore_conflicts=True)
+    return len(postings)
+
+
+def link_entity_mentions(entity_ids):
+    """Links the chunks already in the corpus to new entities ({name: id}); returns the postings written.
+
+    Each word of an entity name is a keyword term of every chunk that mentions it, so the keyword
+    postings of the longest word narrow the candidates before link_chunk_entities counts mentions.
+    """
+    terms = {max(words, key=len) for words in map(tokenize, entity_ids) if words}
+    if not terms:
+        return 0
+    candidates = (
+        KnowledgePosting.objects.filter(term__in=terms)
+        .order_by("chunk_id")
+        .values_list("chunk_id", flat=True)
+        .distinct()
+        .iterator(chunk_size=GRAPH_WRITE_BATCH_SIZE)
+    )
+    postings = 0
+    while batch := list(islice(candidates, GRAPH_WRITE_BATCH_SIZE)):
+        postings += link_chunk_entities(KnowledgeChunk.objects.filter(id__in=batch).only("id", "content"), entity_ids)
+    return postings
+
+
+def _existing_relations(pairs, relation_type):
+    existing = {}
+    sources = sorted({source for source, _ in pairs})
+    for start in range(0, len(sources), GRAPH_WRITE_BATCH_SIZE):
+        rows = KnowledgeRelation.objects.filter(
+            relation_type=relation_type, source_entity_id__in=sources[start : start + GRAPH_WRITE_BATCH_SIZE]
+        ).values_list("id", "source_entity_id", "target_entity_id")
+        for relation_id, source, target in rows:
+            if (source, target) in pairs:
+                existing[(source, target)] = relation_id
+    return existing
+
+
+def upsert_relations(edges, relation_type=RELATED_TO):
+    """Upserts (source_id, target_id, document_id) edges; every repeat adds RELATION_WEIGHT_STEP.
+
+    New edges are inserted at RELATION_WEIGHT plus a step for each repeat in the batch, and
+    existing edges are incremented with one UPDATE per distinct repeat count.
+    """
+    counts = Counter()
+    first_document = {}
+    for source, target, document_id in edges:
+        counts[(source, target)] += 1
+        first_document.setdefault((source, target), document_id)
+    if not counts:
+        return {"created": 0, "updated": 0}
+
+    existing = _existing_relations(counts, relation_type)
+    fresh = [
+        KnowledgeRelation(
+            source_entity_id=source,
+            target_entity_id=target,
+            relation_type=relation_type,
+            weight=round(RELATION_WEIGHT + RELATION_WEIGHT_STEP * (count - 1), 3),
+            metadata={"source_document_id": first_document[(source, target)]},
+        )
+        for (source, target), count in counts.items()
+        if (source, target) not in existing
+    ]
+    KnowledgeRelation.objects.bulk_create(fresh, batch_size=GRAPH_WRITE_BATCH_SIZE, ignore_conflicts=True)
+
+    ids_by_count = defaultdict(list)
+    for pair, relation_id in existing.items():
+        ids_by_count[counts[pair]].append(relation_id)
+    for count, relation_ids in ids_by_count.items():
+        for start in range(0, len(relation_ids), GRAPH_WRITE_BATCH_SIZE):
+            KnowledgeRelation.objects.filter(id__in=relation_ids[start : start + GRAPH_WRITE_BATCH_SIZE]).update(
+                weight=Round(F("weight") + RELATION_WEIGHT_STEP * count, 3)
+            )
+    return {"created": len(fresh), "updated": len(existing)}
+
+
+def write_note_graph(notes):
+    """Links each note's consecutive terms; ``notes`` is a list of (document_id, terms)."""
+    names = {term for _, terms in notes for term in terms}
+    known = _entity_ids(names)
+    entity_ids = upsert_entities(term for _, terms in notes for term in terms)
+    edges = [
+        (entity_ids[source], entity_ids[target], document_id)
+        for document_id, terms in notes
+        for source, target in zip(terms, terms[1:])
+    ]
+    relations = upsert_relations(edges)
+    # Chunks written earlier, the notes' own included, were linked only to the entities that existed then.
+    postings = link_entity_mentions({name: entity_id for name, entity_id in entity_ids.items() if name not in known})
+    if edges:
+        # Bulk writes skip model signals, so the adjacency cache is invalidated here.
+        bump_graph_version()
+    return {
+        "entities": len(entity_ids),
+        "relations": len(edges),
+        "created_relations": relations["created"],
+        "updated_relations": relations["updated"],
+        "entity_postings": postings,
+    }
+
+
+def match_query_entities(query_text):
+    """Term entities named in the query, as {id: name}."""
+    names = set(entity_tokens(query_text))
+    return {entity_id: name for name, entity_id in _entity_ids(names).items()} if names else {}
+
+
+def expand_entities(entity_ids, min_weight=GRAPH_MIN_WEIGHT, top=GRAPH_EXPANSION_TOP, order=ORDER_SCORE):
+    """Weights the entities and their ``top`` one-hop neighbours by ``order``, as {id: weight}.
+
+    The entities themselves weigh 1.0 and a neighbour weighs its edge over the heaviest edge in the graph.
+    """
+    weights = dict.fromkeys(entity_ids, 1.0)
+    if not weights:
+        return weights
+    adjacency = get_graph_adjacency()
+    for entity_id in entity_ids:
+        for row in adjacency.neighbors(entity_id, hops=1, top=top, min_weight=min_weight, order=order):
+            weights[row["entity_id"]] = max(weights.get(row["entity_id"], 0.0), row["score"])
+    return weights
+
+
+def graph_chunk_scores(entity_weights, documents=None):
+    """Sums, per chunk, the weights of the entities it mentions; repeated mentions add logarithmically."""
+    if not entity_weights:
+        return {}
+    postings = KnowledgeEntityPosting.objects.filter(entity_id__in=list(entity_weights))
+    if documents is not None:
+        postings = postings.filter(chunk__document__in=documents)
+    scores = defaultdict(float)
+    rows = postings.values_list("entity_id", "chunk_id", "mentions")
+    for entity_id, chunk_id, mentions in rows.iterator(chunk_size=GRAPH_WRITE_BATCH_SIZE):
+        scores[chunk_id] += entity_weights[entity_id] * (1.0 + math.log(max(mentions, 1)))
+    return {chunk_id: round(score, 6) for chunk_id, score in scores.items()}
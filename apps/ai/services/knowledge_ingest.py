@@ -0,0 +1,263 @@
+import itertools
+import os
+import tempfile
+
+from django.utils import timezone
+
+from apps.ai.models import KnowledgeDocument, KnowledgeSourceFetch
+from apps.ai.services.embedding_cache import text_digest
+from apps.ai.services.minhash import (
+    DEFAULT_DUPLICATE_POLICY,
+    DUPLICATE_KEEP,
+    DUPLICATE_MERGE,
+    DUPLICATE_SKIP,
+    find_near_duplicates,
+    signature_from_bytes,
+)
+from apps.ai.services.retrieval import rebuild_document_chunks
+from apps.ai.services.url_text import UrlTextStream
+
+
+URL_SPOOL_MEMORY_BYTES = int(os.getenv("KNOWLEDGE_URL_SPOOL_MEMORY_BYTES", "1048576"))
+
+
+class _UrlFetchFailed(Exception):
+    pass
+
+
+def _ingest_url_stream(document, stream, chunk_size, overlap, blocks=None, keep_on_error=False):
+    # The normalized text is spooled to disk past URL_SPOOL_MEMORY_BYTES rather than held as pieces;
+    # it is read back once at the end because the document content and its MinHash need the full text.
+    spool = tempfile.SpooledTemporaryFile(max_size=URL_SPOOL_MEMORY_BYTES, mode="w+", encoding="utf-8")
+
+    def tee():
+        written = False
+        mid_word = False
+        for piece in stream if blocks is None else blocks:
+            words = piece.split()
+            if words:
+                if mid_word and not piece[0].isspace():
+                    # The piece continues the word the previous one ended on.
+                    spool.write(words.pop(0))
+                if words:
+                    spool.write((" " if written else "") + " ".join(words))
+                written = True
+                mid_word = not piece[-1].isspace()
+            elif piece:
+                mid_word = False
+            yield piece
+        if stream.error and keep_on_error:
+            raise _UrlFetchFailed(stream.error)
+
+    with spool:
+        chunk_stats = rebuild_document_chunks(document=document, chunk_size=chunk_size, overlap=overlap, source=tee())
+        spool.seek(0)
+        document.content = spool.read()
+    metadata = dict(document.metadata or {})
+    metadata.pop("url_fetch_error", None)
+    if stream.error:
+        metadata["url_fetch_error"] = stream.error
+    document.metadata = metadata
+    if not document.content:
+        document.content = f"URL source registered for deferred retrieval: {stream.url}"
+        chunk_stats = rebuild_document_chunks(document=document, chunk_size=chunk_size, overlap=overlap)
+    document.save(update_fields=["content", "metadata", "updated_at"])
+    return chunk_stats
+
+
+def _unchanged_stats(document, chunk_size, overlap):
+    return {
+        "created_chunks": 0,
+        "updated_chunks": 0,
+        "unchanged_chunks": document.chunks.count(),
+        "deleted_chunks": 0,
+        "chunk_size": int(chunk_size),
+        "overlap": int(overlap),
+        "embedding_source": "none",
+        "embedding_cache": {"hits": 0, "misses": 0},
+        "embedding_batches": {"batches": 0, "failed": 0, "retries": 0},
+    }
+
+
+def _record_fetch(fetch, url, document, stream):
+    now = timezone.now()
+    if fetch is None:
+        # get_or_create absorbs the unique-key race when two items ingest the same new URL.
+        fetch = KnowledgeSourceFetch.objects.get_or_create(source_uri=url)[0]
+    fetch.document = document
+    fetch.status_code = stream.status
+    fetch.error = (stream.error or "")[:255]
+    fetch.fetch_count += 1
+    fetch.checked_at = now
+    if stream.not_modified:
+        fetch.not_modified_count += 1
+    elif not stream.error:
+        fetch.etag = stream.etag[:512]
+        fetch.last_modified = stream.last_modified[:128]
+        content_hash = text_digest(document.content)
+        if content_hash != fetch.content_hash:
+            fetch.content_hash = content_hash
+            fetch.changed_at = now
+    fetch.save()
+    return fetch
+
+
+def _keep_failed_fetch(fetch, url, document, stream, chunk_size, overlap, source_fetch):
+    # A failed refresh keeps the chunks of the last good fetch; only the error is recorded.
+    document.metadata = {**(document.metadata or {}), "url_fetch_error": stream.error}
+    document.save(update_fields=["metadata", "updated_at"])
+    _record_fetch(fetch, url, document, stream)
+    chunk_stats = _unchanged_stats(document, chunk_size, overlap)
+    return {**chunk_stats, "source_fetch": source_fetch}
+
+
+def _ingest_url_source(url, data, user, chunk_size, overlap):
+    fetch = KnowledgeSourceFetch.objects.select_related("document").filter(source_uri=url).first()
+    document = fetch.document if fetch else None
+    stream = UrlTextStream(
+        url,
+        data.get("timeout_seconds", 15),
+        etag=fetch.etag if document else "",
+        last_modified=fetch.last_modified if document else "",
+    )
+    # Pull the first block so the response status is known before any chunk is touched.
+    pieces = iter(stream)
+    first = next(pieces, None)
+    source_fetch = {"status": stream.status, "not_modified": stream.not_modified}
+
+    if document is not None and stream.not_modified:
+        _record_fetch(fetch, url, document, stream)
+        chunk_stats = _unchanged_stats(document, chunk_size, overlap)
+        return document, {**chunk_stats, "source_fetch": source_fetch}
+    if document is not None and stream.error:
+        return document, _keep_failed_fetch(fetch, url, document, stream, chunk_size, overlap, source_fetch)
+
+    title = (data.get("title") or "").strip()[:255]
+    tracked = document is not None
+    if document is None:
+        document = KnowledgeDocument.objects.create(
+            source_type=KnowledgeDocument.SOURCE_URL,
+            source_uri=url,
+            title=title or url[:255],
+            content="",
+            metadata=data.get("metadata") or {},
+            created_by=user,
+        )
+    else:
+        document.title = title or document.title
+        document.metadata = {**(document.metadata or {}), **(data.get("metadata") or {})}
+        document.save(update_fields=["title", "metadata", "updated_at"])
+
+    blocks = itertools.chain([] if first is None else [first], pieces)
+    try:
+        chunk_stats = _ingest_url_stream(document, stream, chunk_size, overlap, blocks=blocks, keep_on_error=tracked)
+    except _UrlFetchFailed:
+        # The body broke off mid-stream; the staged chunks are already discarded.
+        return document, _keep_failed_fetch(fetch, url, document, stream, chunk_size, overlap, source_fetch)
+    except Exception:
+        if not tracked:
+            document.delete()
+        raise
+    _record_fetch(fetch, url, document, stream)
+    chunk_stats = {**chunk_stats, "source_fetch": source_fetch}
+    if data.get("on_duplicate", DEFAULT_DUPLICATE_POLICY) != DUPLICATE_KEEP:
+        # The text is only known after streaming, so URL sources can be linked but not skipped or merged.
+        duplicate = _link_duplicate(document)
+        if duplicate is not None:
+            chunk_stats["duplicate"] = _duplicate_info(duplicate, "linked")
+    return document, chunk_stats
+
+
+def _duplicate_info(duplicate, action):
+    return {"document_id": duplicate.document_id, "similarity": duplicate.similarity, "action": action}
+
+
+def _link_duplicate(document):
+    matches = find_near_duplicates(
+        document.content,
+        exclude_document_id=document.id,
+        signature=signature_from_bytes(document.minhash),
+    )
+    duplicate = matches[0] if matches else None
+    metadata = dict(document.metadata or {})
+    if duplicate is None:
+        if metadata.pop("duplicate_of", None) is None:
+            return None
+    else:
+        metadata["duplicate_of"] = duplicate.document_id
+    document.metadata = metadata
+    document.save(update_fields=["metadata", "updated_at"])
+    return duplicate
+
+
+def _merge_source(document, data, source_type, duplicate):
+    metadata = dict(document.metadata or {})
+    for key, value in (data.get("metadata") or {}).items():
+        metadata.setdefault(key, value)
+    metadata["merged_sources"] = [
+        *metadata.get("merged_sources", []),
+        {
+            "title": (data.get("title") or "").strip()[:255],
+            "source_type": source_type,
+            "source_uri": (data.get("url") or "").strip(),
+            "similarity": duplicate.similarity,
+        },
+    ]
+    document.metadata = metadata
+    document.save(update_fields=["metadata", "updated_at"])
+
+
+def ingest_knowledge_source(data, user=None):
+    """Creates and chunks one document from validated KnowledgeDocumentIngestSerializer data.
+
+    URL sources without inline content are keyed by URL: a repeat ingest refreshes the same
+    document with a conditional request and leaves its chunks alone on 304 Not Modified.
+    Near-duplicates of an existing document are linked, skipped or merged per ``on_duplicate``.
+    """
+    content = (data.get("content") or "").strip()
+    url = (data.get("url") or "").strip()
+    metadata = data.get("metadata") or {}
+    chunk_size = data.get("chunk_size", 120)
+    overlap = data.get("overlap", 20)
+
+    if url and not content:
+        return _ingest_url_source(url, data, user, chunk_size, overlap)
+
+    source_type = KnowledgeDocument.SOURCE_URL if url else KnowledgeDocument.SOURCE_TEXT
+    policy = data.get("on_duplicate", DEFAULT_DUPLICATE_POLICY)
+    duplicate = None
+    if policy != DUPLICATE_KEEP:
+        matches = find_near_duplicates(content)
+        duplicate = matches[0] if matches else None
+    if duplicate is not None and policy in (DUPLICATE_SKIP, DUPLICATE_MERGE):
+        existing = KnowledgeDocument.objects.get(pk=duplicate.document_id)
+        if policy == DUPLICATE_MERGE:
+            _merge_source(existing, data, source_type, duplicate)
+        action = "merged" if policy == DUPLICATE_MERGE else "skipped"
+        chunk_stats = _unchanged_stats(existing, chunk_size, overlap)
+        return existing, {**chunk_stats, "duplicate": _duplicate_info(duplicate, action)}
+    if duplicate is not None:
+        metadata = {**metadata, "duplicate_of": duplicate.document_id}
+
+    title = (data.get("title") or "").strip()
+    if not title:
+        title = url or f"Knowledge document {KnowledgeDocument.objects.count() + 1}"
+    title = title[:255]
+
+    document = KnowledgeDocument.objects.create(
+        source_type=source_type,
+        source_uri=url,
+        title=title,
+        content=content,
+        metadata=metadata,
+        created_by=user,
+    )
+    try:
+        chunk_stats = rebuild_document_chunks(document=document, chunk_size=chunk_size, overlap=overlap)
+    except Exception:
+        # Chunking is not wrapped in a transaction, so a failed embedding must not leave an empty document.
+        document.delete()
+        raise
+    if duplicate is not None:
+        chunk_stats["duplicate"] = _duplicate_info(duplicate, "linked")
+    return document, chunk_stats
@@ -0,0 +1,369 @@
+import base64
+import json
+from collections import Counter
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.ai.models import KnowledgeChunk, KnowledgeCorpusStats, KnowledgeDocument, KnowledgeEntity, KnowledgeRelation
+from apps.ai.services.graph_index import bump_graph_version
+from apps.ai.services.keyword_index import index_chunks
+from apps.ai.services.knowledge_graph import link_chunk_entities
+from apps.ai.services.minhash import index_document_signature
+from apps.ai.services.retrieval import active_embedding_model
+from apps.ai.services.search_cache import bump_corpus_version
+from apps.ai.services.vector_codec import STORAGE_DTYPES
+from apps.ai.services.vector_index import get_vector_index
+
+
+TRANSFER_FORMAT = "knowledge-jsonl"
+TRANSFER_FORMAT_VERSION = 1
+EXPORT_BATCH_SIZE = 500
+EXPORT_DOCUMENT_BATCH_SIZE = 100
+IMPORT_BATCH_SIZE = 500
+
+
+def _encode(data):
+    return base64.b64encode(bytes(data or b"")).decode("ascii")
+
+
+def _decode(value):
+    return base64.b64decode(value or "", validate=True)
+
+
+def _line(record):
+    return json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+
+
+def export_lines(batch_size=EXPORT_BATCH_SIZE):
+    """Yields the knowledge base as JSONL: a header, entities, relations, then each document and its chunks.
+
+    Every table is read through ``iterator()`` and documents are paged, so memory stays flat. Vectors
+    and MinHash signatures are base64 of the stored bytes, so they round-trip without re-embedding.
+    Chunks parked by a rebuild still in progress are left out.
+    """
+    stats = KnowledgeCorpusStats.get_current()
+    yield _line(
+        {
+            "type": "header",
+            "format": TRANSFER_FORMAT,
+            "version": TRANSFER_FORMAT_VERSION,
+            "corpus_version": stats.version,
+            "embedding_model": active_embedding_model(),
+            "exported_at": timezone.now().isoformat(),
+        }
+    )
+
+    entities = KnowledgeEntity.objects.order_by("id").values_list(
+        "name", "entity_type", "metadata", "pagerank", "degree_centrality"
+    )
+    for name, entity_type, metadata, pagerank, degree in entities.iterator(chunk_size=batch_size):
+        yield _line(
+            {
+                "type": "entity",
+                "name": name,
+                "entity_type": entity_type,
+                "metadata": metadata,
+                "pagerank": pagerank,
+                "degree_centrality": degree,
+            }
+        )
+
+    # Entities are referenced by (name, entity_type) so relations survive the ids changing on import.
+    relations = KnowledgeRelation.objects.order_by("id").values_list(
+        "source_entity__name",
+        "source_entity__entity_type",
+        "target_entity__name",
+        "target_entity__entity_type",
+        "relation_type",
+        "weight",
+        "metadata",
+    )
+    for source, source_type, target, target_type, relation_type, weight, metadata in relations.iterator(
+        chunk_size=batch_size
+    ):
+        yield _line(
+            {
+                "type": "relation",
+                "source": [source, source_type],
+                "target": [target, target_type],
+                "relation_type": relation_type,
+                "weight": weight,
+                "metadata": metadata,
+            }
+        )
+
+    documents = (
+        KnowledgeDocument.objects.order_by("id")
+        .values_list("id", "source_type", "source_uri", "title", "content", "metadata", "created_at")
+        .iterator(chunk_size=EXPORT_DOCUMENT_BATCH_SIZE)
+    )
+    while batch := list(islice(documents, EXPORT_DOCUMENT_BATCH_SIZE)):
+        chunks = (
+            KnowledgeChunk.objects.live()
+            .filter(document_id__in=[row[0] for row in batch])
+            .order_by("document_id", "chunk_index")
+            .values_list(
+                "document_id",
+                "chunk_index",
+                "content",
+                "content_hash",
+                "token_count",
+                "minhash",
+                "embedding_vector",
+                "embedding_dtype",
+                "embedding_dimension",
+                "embedding_model",
+            )
+            .iterator(chunk_size=batch_size)
+        )
+        chunk = next(chunks, None)
+        for document_id, source_type, source_uri, title, content, metadata, created_at in batch:
+            yield _line(
+                {
+                    "type": "document",
+                    "id": document_id,
+                    "source_type": source_type,
+                    "source_uri": source_uri,
+                    "title": title,
+                    "content": content,
+                    "metadata": metadata,
+                    "created_at": created_at.isoformat(),
+                }
+            )
+            while chunk is not None and chunk[0] == document_id:
+                yield _line(
+                    {
+                        "type": "chunk",
+                        "document": document_id,
+                        "chunk_index": chunk[1],
+                        "content": chunk[2],
+                        "content_hash": chunk[3],
+                        "token_count": chunk[4],
+                        "minhash": _encode(chunk[5]),
+                        "embedding": _encode(chunk[6]),
+                        "embedding_dtype": chunk[7],
+                        "embedding_dimension": chunk[8],
+                        "embedding_model": chunk[9],
+                    }
+                )
+                chunk = next(chunks, None)
+
+
+class _Importer:
+    # Chunks must follow their document, so only documents since the last document flush are mapped.
+
+    def __init__(self, batch_size, user):
+        self.batch_size = batch_size
+        self.user = user
+        self.stats = Counter()
+        self.version = bump_corpus_version()
+        self.entities = []
+        self.relations = []
+        self.documents = []
+        self.chunks = []
+        self.document_ids = {}
+
+    def header(self, record):
+        if record.get("format") != TRANSFER_FORMAT or record.get("version") != TRANSFER_FORMAT_VERSION:
+            raise ValueError("unsupported_format")
+        model = record.get("embedding_model") or ""
+        current = active_embedding_model()
+        if model and model != current:
+            if KnowledgeChunk.objects.exists():
+                raise ValueError(f"embedding_model_mismatch:{model}:{current}")
+            # An empty corpus adopts the exported model so the imported vectors stay searchable.
+            KnowledgeCorpusStats.get_current()
+            KnowledgeCorpusStats.objects.filter(slug="current").update(embedding_model=model)
+
+    def add(self, record):
+        kind = record.get("type")
+        if kind == "entity":
+            self.entities.append(
+                KnowledgeEntity(
+                    name=record["name"],
+                    entity_type=record.get("entity_type") or "term",
+                    metadata=record.get("metadata") or {},
+                    pagerank=float(record.get("pagerank") or 0.0),
+                    degree_centrality=float(record.get("degree_centrality") or 0.0),
+                )
+            )
+            if len(self.entities) >= self.batch_size:
+                self.flush_entities()
+        elif kind == "relation":
+            self.relations.append(record)
+            if len(self.relations) >= self.batch_size:
+                self.flush_relations()
+        elif kind == "document":
+            # Every chunk of the mapped documents has been read once the next document starts.
+            if len(self.documents) + len(self.document_ids) >= self.batch_size:
+                self.flush_chunks()
+                self.document_ids.clear()
+            self.documents.append((record["id"], record))
+        elif kind == "chunk":
+            self.chunks.append(record)
+            if len(self.chunks) >= self.batch_size:
+                self.flush_chunks()
+        else:
+            raise ValueError(f"unknown_record_type:{kind}")
+
+    def flush_entities(self):
+        if self.entities:
+            KnowledgeEntity.objects.bulk_create(
+                self.entities,
+                update_conflicts=True,
+                unique_fields=["name", "entity_type"],
+                update_fields=["entity_type"],
+            )
+            self.stats["entities"] += len(self.entities)
+            self.entities = []
+
+    def flush_relations(self):
+        self.flush_entities()
+        if not self.relations:
+            return
+        keys = {tuple(record[side]) for record in self.relations for side in ("source", "target")}
+        entity_ids = {
+            (name, entity_type): entity_id
+            for name, entity_type, entity_id in KnowledgeEntity.objects.filter(
+                name__in={name for name, _ in keys}
+            ).values_list("name", "entity_type", "id")
+            if (name, entity_type) in keys
+        }
+        relations = []
+        for record in self.relations:
+            source, target = entity_ids.get(tuple(record["source"])), entity_ids.get(tuple(record["target"]))
+            if source is None or target is None:
+                self.stats["skipped_relations"] += 1
+                continue
+            relations.append(
+                KnowledgeRelation(
+                    source_entity_id=source,
+                    target_entity_id=target,
+                    relation_type=record["relation_type"],
+                    weight=float(record.get("weight", 1.0)),
+                    metadata=record.get("metadata") or {},
+                )
+            )
+        KnowledgeRelation.objects.bulk_create(
+            relations,
+            update_conflicts=True,
+            unique_fields=["source_entity", "target_entity", "relation_type"],
+            update_fields=["weight", "metadata"],
+        )
+        self.stats["relations"] += len(relations)
+        self.relations = []
+
+    def flush_documents(self):
+        self.flush_relations()
+        if not self.documents:
+            return
+        documents = [
+            KnowledgeDocument(
+                source_type=record.get("source_type") or KnowledgeDocument.SOURCE_TEXT,
+                source_uri=record.get("source_uri") or "",
+                title=record.get("title") or "",
+                content=record.get("content") or "",
+                metadata=record.get("metadata") or {},
+                index_version=self.version,
+                created_by=self.user,
+            )
+            for _, record in self.documents
+        ]
+        KnowledgeDocument.objects.bulk_create(documents)
+        for (exported_id, record), document in zip(self.documents, documents):
+            self.document_ids[exported_id] = document.id
+            document.created_at = parse_datetime(record.get("created_at") or "") or document.created_at
+            # bulk_create skips post_save, which is what normally writes the LSH bands.
+            index_document_signature(document)
+        KnowledgeDocument.objects.bulk_update(documents, ["created_at"])
+        self.stats["documents"] += len(documents)
+        self.documents = []
+
+    def flush_chunks(self):
+        self.flush_documents()
+        if not self.chunks:
+            return
+        chunks = []
+        for record in self.chunks:
+            document_id = self.document_ids.get(record["document"])
+            if document_id is None:
+                raise ValueError(f"chunk_before_document:{record['document']}")
+            chunk_index = int(record["chunk_index"])
+            if not 0 <= chunk_index < KnowledgeChunk.PARKED_INDEX_OFFSET:
+                raise ValueError(f"invalid_chunk_index:{chunk_index}")
+            dtype = record.get("embedding_dtype") or KnowledgeChunk.DTYPE_FLOAT32
+            if dtype not in STORAGE_DTYPES:
+                raise ValueError(f"unsupported_embedding_dtype:{dtype}")
+            chunks.append(
+                KnowledgeChunk(
+                    document_id=document_id,
+                    chunk_index=chunk_index,
+                    content=record["content"],
+                    content_hash=record.get("content_hash") or "",
+                    token_count=int(record.get("token_count") or 0),
+                    minhash=_decode(record.get("minhash")),
+                    embedding_vector=_decode(record.get("embedding")),
+                    embedding_dtype=dtype,
+                    embedding_dimension=int(record.get("embedding_dimension") or 0),
+                    embedding_model=record.get("embedding_model") or "",
+                )
+            )
+        KnowledgeChunk.objects.bulk_create(chunks)
+        index_chunks(chunks)
+        link_chunk_entities(chunks)
+        self.stats["chunks"] += len(chunks)
+        self.chunks = []
+
+
+def import_lines(lines, batch_size=IMPORT_BATCH_SIZE, user=None):
+    """Loads a JSONL export in one transaction, buffering at most ``batch_size`` rows per table.
+
+    Documents are always created anew; entities are matched by (name, entity_type) and relations
+    by their endpoints, with imported relation weights replacing existing ones.
+    """
+    batch_size = max(int(batch_size), 1)
+    with transaction.atomic():
+        importer = _Importer(batch_size, user)
+        seen_header = False
+        for line_number, line in enumerate(lines, start=1):
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                if not seen_header:
+                    if record.get("type") != "header":
+                        raise ValueError("missing_header")
+                    importer.header(record)
+                    seen_header = True
+                else:
+                    importer.add(record)
+            except (KeyError, TypeError, ValueError) as exc:
+                raise ValueError(f"Line {line_number}: {exc}") from exc
+        if not seen_header:
+            raise ValueError("missing_header")
+        importer.flush_chunks()
+        if importer.stats["relations"]:
+            bump_graph_version()
+        transaction.on_commit(_reload_vector_index)
+    return {
+        "documents": importer.stats["documents"],
+        "chunks": importer.stats["chunks"],
+        "entities": importer.stats["entities"],
+        "relations": importer.stats["relations"],
+        "skipped_relations": importer.stats["skipped_relations"],
+        "corpus_version": importer.version,
+    }
+
+
+def _reload_vector_index():
+    index = get_vector_index()
+    if index.shared_path:
+        index.publish()
+    else:
+        index.reset()
@@ -8,6 +8,7 @@ from langchain_openai import ChatOpenAI
 from langgraph.graph import END, START, StateGraph
 
 from apps.ai.models import McpAdapter, ModelEndpoint
+from apps.ai.services.reranker import DEFAULT_RERANKER
 from apps.ai.services.retrieval import search_knowledge_chunks
 
 
@@ -407,7 +408,7 @@ def _retrieve_node(state: AgentState) -> AgentState:
     if not query:
         return {"snippets": [], "agent_trace": _trace(state, agent="retrieve", status="skip", detail="No query provided.")}
     limit = max(int(state.get("retrieval_limit", 6)), 1)
-    snippets = search_knowledge_chunks(query, limit=limit)
+    snippets = search_knowledge_chunks(query, limit=limit, rerank=DEFAULT_RERANKER)
     return {
         "snippets": snippets,
         "agent_trace": _trace(
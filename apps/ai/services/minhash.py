@@ -0,0 +1,152 @@
+import hashlib
+import os
+import re
+import zlib
+from dataclasses import dataclass
+
+import numpy as np
+from django.db.models import Q
+
+from apps.ai.models import KnowledgeChunk, KnowledgeDocument, KnowledgeMinHashBand
+
+
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+ROWS_PER_BAND = NUM_PERMUTATIONS // LSH_BANDS
+SHINGLE_SIZE = 3
+SHINGLE_BLOCK_SIZE = 4096
+DUPLICATE_THRESHOLD = float(os.getenv("KNOWLEDGE_DUPLICATE_THRESHOLD", "0.85"))
+DUPLICATE_KEEP = "keep"
+DUPLICATE_LINK = "link"
+DUPLICATE_SKIP = "skip"
+DUPLICATE_MERGE = "merge"
+DUPLICATE_POLICIES = (DUPLICATE_KEEP, DUPLICATE_LINK, DUPLICATE_SKIP, DUPLICATE_MERGE)
+DEFAULT_DUPLICATE_POLICY = os.getenv("KNOWLEDGE_DUPLICATE_POLICY", DUPLICATE_LINK).strip().lower()
+SHINGLE_WORD_RE = re.compile(r"\w+")
+
+# Universal hashing (a * x + b) mod p with p = 2^31 - 1 keeps every product below 2^63 in uint64.
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(0x6D696E68)
+_A = _rng.integers(1, int(_PRIME), size=NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, int(_PRIME), size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+@dataclass(frozen=True)
+class NearDuplicate:
+    document_id: int
+    similarity: float
+
+
+def shingle_hashes(text):
+    words = [word.lower() for word in SHINGLE_WORD_RE.findall(text or "")]
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    size = min(SHINGLE_SIZE, len(words))
+    shingles = {" ".join(words[start : start + size]) for start in range(len(words) - size + 1)}
+    return np.fromiter(
+        (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles)
+    )
+
+
+def minhash_signature(text):
+    hashes = shingle_hashes(text)
+    if not hashes.size:
+        return None
+    signature = np.full(NUM_PERMUTATIONS, _PRIME, dtype=np.uint64)
+    for start in range(0, hashes.size, SHINGLE_BLOCK_SIZE):
+        block = hashes[start : start + SHINGLE_BLOCK_SIZE]
+        permuted = (_A[:, None] * block[None, :] + _B[:, None]) % _PRIME
+        np.minimum(signature, permuted.min(axis=1), out=signature)
+    return signature.astype(np.uint32)
+
+
+def signature_bytes(signature):
+    return b"" if signature is None else signature.astype("<u4").tobytes()
+
+
+def signature_from_bytes(raw):
+    raw = bytes(raw or b"")
+    if len(raw) != NUM_PERMUTATIONS * 4:
+        return None
+    return np.frombuffer(raw, dtype="<u4")
+
+
+def estimated_similarity(left, right):
+    return float(np.count_nonzero(left == right)) / NUM_PERMUTATIONS
+
+
+def band_buckets(signature):
+    buckets = []
+    for band, rows in enumerate(signature.astype("<u4").reshape(LSH_BANDS, ROWS_PER_BAND)):
+        digest = hashlib.blake2b(rows.tobytes(), digest_size=8, person=b"kb-lsh").digest()
+        buckets.append((band, int.from_bytes(digest, "little", signed=True)))
+    return buckets
+
+
+def index_document_signature(document):
+    signature = minhash_signature(document.content)
+    document.minhash = signature_bytes(signature)
+    KnowledgeDocument.objects.filter(pk=document.pk).update(minhash=document.minhash)
+    KnowledgeMinHashBand.objects.filter(document_id=document.pk).delete()
+    if signature is not None:
+        KnowledgeMinHashBand.objects.bulk_create(
+            [
+                KnowledgeMinHashBand(document_id=document.pk, band=band, bucket=bucket)
+                for band, bucket in band_buckets(signature)
+            ]
+        )
+    return signature
+
+
+def find_near_duplicates(text, exclude_document_id=None, threshold=None, signature=None):
+    """Documents whose estimated Jaccard similarity to ``text`` reaches ``threshold``, best first."""
+    threshold = DUPLICATE_THRESHOLD if threshold is None else threshold
+    signature = minhash_signature(text) if signature is None else signature
+    if signature is None:
+        return []
+
+    # A document is a candidate when any one band hashes to the same bucket.
+    matches = Q()
+    for band, bucket in band_buckets(signature):
+        matches |= Q(band=band, bucket=bucket)
+    candidates = KnowledgeMinHashBand.objects.filter(matches)
+    if exclude_document_id is not None:
+        candidates = candidates.exclude(document_id=exclude_document_id)
+    candidate_ids = set(candidates.values_list("document_id", flat=True))
+
+    duplicates = []
+    for document_id, raw in KnowledgeDocument.objects.filter(id__in=candidate_ids).values_list("id", "minhash"):
+        stored = signature_from_bytes(raw)
+        if stored is None:
+            continue
+        similarity = estimated_similarity(signature, stored)
+        if similarity >= threshold:
+            duplicates.append(NearDuplicate(document_id=document_id, similarity=round(similarity, 4)))
+    duplicates.sort(key=lambda item: (-item.similarity, item.document_id))
+    return duplicates
+
+
+def collapse_near_duplicates(rows, limit, threshold=None):
+    """Keeps the best-ranked row of each near-duplicate group until ``limit`` rows are kept."""
+    threshold = DUPLICATE_THRESHOLD if threshold is None else threshold
+    stored = dict(KnowledgeChunk.objects.filter(id__in=[row["chunk_id"] for row in rows]).values_list("id", "minhash"))
+    kept, signed_rows, signatures = [], [], []
+    collapsed = 0
+    for row in rows:
+        if len(kept) >= limit:
+            break
+        signature = signature_from_bytes(stored.get(row["chunk_id"]))
+        if signature is None:
+            signature = minhash_signature(row["content"])
+        if signature is not None and signatures:
+            similarity = (np.stack(signatures) == signature).mean(axis=1)
+            best = int(np.argmax(similarity))
+            if similarity[best] >= threshold:
+                signed_rows[best].setdefault("collapsed_chunk_ids", []).append(row["chunk_id"])
+                collapsed += 1
+                continue
+        kept.append(row)
+        if signature is not None:
+            signed_rows.append(row)
+            signatures.append(signature)
+    return kept, collapsed
@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+
+
+QUANTIZATION_NONE = "none"
+QUANTIZATION_INT8 = "int8"
+QUANTIZATION_MODES = (QUANTIZATION_NONE, QUANTIZATION_INT8)
+DEFAULT_QUANTIZATION = os.getenv("KNOWLEDGE_VECTOR_QUANTIZATION", QUANTIZATION_NONE).strip().lower()
+if DEFAULT_QUANTIZATION not in QUANTIZATION_MODES:
+    DEFAULT_QUANTIZATION = QUANTIZATION_NONE
+DEFAULT_RESCORE_CANDIDATES = int(os.getenv("KNOWLEDGE_RESCORE_CANDIDATES", "256"))
+INT8_LEVELS = 127.0
+BLOCK_ROWS = 16384
+
+
+def quantize_rows(matrix) -> tuple[np.ndarray, np.ndarray]:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    codes = np.empty(matrix.shape, dtype=np.int8)
+    scales = np.empty(matrix.shape[0], dtype=np.float32)
+    for start in range(0, matrix.shape[0], BLOCK_ROWS):
+        block = matrix[start : start + BLOCK_ROWS]
+        block_scales = np.abs(block).max(axis=1) / INT8_LEVELS
+        block_scales[block_scales == 0] = 1.0
+        codes[start : start + block.shape[0]] = np.clip(
+            np.rint(block / block_scales[:, None]), -INT8_LEVELS, INT8_LEVELS
+        )
+        scales[start : start + block.shape[0]] = block_scales
+    return codes, scales
+
+
+def dequantize_rows(codes, scales) -> np.ndarray:
+    return codes.astype(np.float32) * scales[:, None]
+
+
+def quantized_scores(codes, scales, query, positions=None) -> np.ndarray:
+    # Codes are widened one block at a time so a scan never materializes a float copy of the matrix.
+    rows = codes.shape[0] if positions is None else positions.shape[0]
+    scores = np.empty(rows, dtype=np.float32)
+    for start in range(0, rows, BLOCK_ROWS):
+        stop = min(start + BLOCK_ROWS, rows)
+        if positions is None:
+            block, block_scales = codes[start:stop], scales[start:stop]
+        else:
+            selected = positions[start:stop]
+            block, block_scales = codes[selected], scales[selected]
+        scores[start:stop] = (block.astype(np.float32) @ query) * block_scales
+    return scores
@@ -0,0 +1,155 @@
+import http.client
+import json
+import os
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from apps.ai.services.keyword_index import tokenize
+
+
+RERANK_NONE = "none"
+RERANK_LEXICAL = "lexical"
+RERANK_REMOTE = "remote"
+RERANKERS = (RERANK_NONE, RERANK_LEXICAL, RERANK_REMOTE)
+# Used by the chat retrieval step; the search API only reranks when asked to.
+DEFAULT_RERANKER = os.getenv("KNOWLEDGE_RERANKER", RERANK_LEXICAL).strip().lower()
+if DEFAULT_RERANKER not in RERANKERS:
+    DEFAULT_RERANKER = RERANK_LEXICAL
+DEFAULT_RERANK_CANDIDATES = int(os.getenv("KNOWLEDGE_RERANK_CANDIDATES", "30"))
+MAX_RERANK_CANDIDATES = 200
+RERANK_URL = os.getenv("KNOWLEDGE_RERANK_URL", "").strip()
+RERANK_MODEL = os.getenv("KNOWLEDGE_RERANK_MODEL", "rerank-v1").strip()
+RERANK_TIMEOUT_SECONDS = float(os.getenv("KNOWLEDGE_RERANK_TIMEOUT_SECONDS", "5"))
+COVERAGE_WEIGHT = 0.6
+PROXIMITY_WEIGHT = 0.25
+PHRASE_WEIGHT = 0.15
+
+
+class RerankError(Exception):
+    pass
+
+
+def _smallest_window(positions, term_count):
+    # positions: (index, term) pairs in document order; smallest span containing every distinct term.
+    counts = {}
+    best = None
+    left = 0
+    for index, term in positions:
+        counts[term] = counts.get(term, 0) + 1
+        while len(counts) == term_count:
+            span = index - positions[left][0] + 1
+            best = span if best is None else min(best, span)
+            left_term = positions[left][1]
+            counts[left_term] -= 1
+            if not counts[left_term]:
+                del counts[left_term]
+            left += 1
+    return best
+
+
+def lexical_proximity_score(query_terms, text):
+    """Rewards chunks that contain more of the query, with the matched terms close together and in order."""
+    wanted = list(dict.fromkeys(query_terms))
+    if not wanted:
+        return 0.0
+    terms = tokenize(text)
+    wanted_set = set(wanted)
+    positions = [(index, term) for index, term in enumerate(terms) if term in wanted_set]
+    matched = {term for _, term in positions}
+    if not matched:
+        return 0.0
+
+    coverage = len(matched) / len(wanted)
+    window = _smallest_window(positions, len(matched)) if len(matched) > 1 else 1
+    proximity = len(matched) / window
+    bigrams = list(zip(query_terms, query_terms[1:]))
+    if bigrams:
+        present = set(zip(terms, terms[1:]))
+        phrase = sum(1 for bigram in bigrams if bigram in present) / len(bigrams)
+    else:
+        phrase = 1.0
+    return COVERAGE_WEIGHT * coverage + PROXIMITY_WEIGHT * proximity + PHRASE_WEIGHT * phrase
+
+
+class LexicalProximityReranker:
+    name = RERANK_LEXICAL
+
+    def score(self, query_text, query_terms, rows):
+        return [lexical_proximity_score(query_terms, row["content"]) for row in rows]
+
+
+class RemoteReranker:
+    """Client for rerank endpoints that take {model, query, documents} and return [{index, relevance_score}]."""
+
+    name = RERANK_REMOTE
+
+    def __init__(self, url, model, api_key="", timeout_seconds=RERANK_TIMEOUT_SECONDS):
+        self.url = url
+        self.model = model
+        self.api_key = api_key
+        self.timeout_seconds = timeout_seconds
+
+    def score(self, query_text, query_terms, rows):
+        if not self.url:
+            raise RerankError("rerank_url_not_configured")
+        body = json.dumps(
+            {
+                "model": self.model,
+                "query": query_text,
+                "documents": [row["content"] for row in rows],
+                "top_n": len(rows),
+            }
+        ).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        request = Request(self.url, data=body, headers=headers, method="POST")
+        try:
+            with urlopen(request, timeout=self.timeout_seconds) as response:
+                data = json.loads(response.read().decode("utf-8"))
+        except HTTPError as exc:
+            raise RerankError(f"http_{exc.code}")
+        except (OSError, http.client.HTTPException, ValueError) as exc:
+            # OSError covers URLError, timeouts and resets; HTTPException covers truncated or malformed responses.
+            raise RerankError(f"rerank_failed:{exc.__class__.__name__}")
+
+        results = data.get("results") if isinstance(data, dict) else None
+        if not isinstance(results, list):
+            raise RerankError("unexpected_response")
+        scores = [None] * len(rows)
+        for record in results:
+            try:
+                scores[int(record["index"])] = float(record["relevance_score"])
+            except (KeyError, IndexError, TypeError, ValueError):
+                raise RerankError("unexpected_response")
+        if any(score is None for score in scores):
+            raise RerankError("missing_scores")
+        return scores
+
+
+def get_reranker(name):
+    if name == RERANK_LEXICAL:
+        return LexicalProximityReranker()
+    if name == RERANK_REMOTE:
+        api_key = os.getenv("KNOWLEDGE_RERANK_API_KEY") or os.getenv("OPENAI_API_KEY") or ""
+        return RemoteReranker(url=RERANK_URL, model=RERANK_MODEL, api_key=api_key)
+    raise ValueError(f"unknown_reranker:{name}")
+
+
+def rerank_rows(rows, query_text, query_terms, reranker, limit):
+    """Rescores first-stage candidates and returns the top ``limit`` with a summary of what ran."""
+    info = {"reranker": reranker, "candidates": len(rows)}
+    if not rows:
+        return rows, info
+    try:
+        scores = get_reranker(reranker).score(query_text, query_terms, rows)
+    except RerankError as exc:
+        # A failing remote scorer degrades to the local one rather than failing the search.
+        info.update({"reranker": RERANK_LEXICAL, "fallback_from": reranker, "error": str(exc)})
+        scores = LexicalProximityReranker().score(query_text, query_terms, rows)
+
+    for rank, (row, score) in enumerate(zip(rows, scores), start=1):
+        row["first_stage_rank"] = rank
+        row["rerank_score"] = round(float(score), 6)
+    ordered = sorted(rows, key=lambda row: (-row["rerank_score"], row["first_stage_rank"]))
+    return ordered[:limit], info
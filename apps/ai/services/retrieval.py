@@ -1,45 +1,107 @@
 import hashlib
-import json
+import heapq
 import math
 import os
 import re
-from collections import Counter
-from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import chain, islice
 
+import numpy as np
 from django.db import transaction
+from django.db.models import F
+
+from apps.ai.models import KnowledgeChunk, KnowledgeDocument
+from apps.ai.services.embedding_client import OPENAI_EMBEDDINGS_URL, EmbeddingClient
+from apps.ai.services.embedding_cache import lookup_cached_embeddings, store_cached_embeddings, text_digest
+from apps.ai.services.graph_index import ORDER_SCORE
+from apps.ai.services.knowledge_graph import (
+    GRAPH_EXPANSION_TOP,
+    GRAPH_MIN_WEIGHT,
+    expand_entities,
+    graph_chunk_scores,
+    link_chunk_entities,
+    match_query_entities,
+)
+from apps.ai.services.keyword_index import bm25_scores, bm25_top_k, index_chunks, tokenize, unindex_chunks
+from apps.ai.services.minhash import collapse_near_duplicates, minhash_signature, signature_bytes
+from apps.ai.services.reranker import DEFAULT_RERANK_CANDIDATES, MAX_RERANK_CANDIDATES, RERANK_NONE, rerank_rows
+from apps.ai.services.search_cache import (
+    bump_corpus_version,
+    corpus_state,
+    normalize_query,
+    query_embedding_cache,
+    search_result_cache,
+)
+from apps.ai.services.search_filters import SearchFilters
+from apps.ai.services.vector_codec import DEFAULT_STORAGE_DTYPE, pack_vector
+from apps.ai.services.vector_index import MODE_EXACT, get_vector_index
 
-from apps.ai.models import KnowledgeChunk
 
-
-TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_]+")
-OPENAI_EMBEDDINGS_URL = "https://api.openai.com/v1/embeddings"
 OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+WORD_PATTERN = re.compile(r"\S+")
+CHUNK_WRITE_BATCH_SIZE = int(os.getenv("KNOWLEDGE_CHUNK_WRITE_BATCH_SIZE", "128"))
+TEMP_CHUNK_INDEX_OFFSET = KnowledgeChunk.PARKED_INDEX_OFFSET
 FALLBACK_EMBEDDING_DIMENSION = 128
-
-
-def tokenize(text):
-    return [match.group(0).lower() for match in TOKEN_PATTERN.finditer(text or "")]
-
-
-def split_text_into_chunks(content, chunk_size=120, overlap=20):
-    words = (content or "").split()
-    if not words:
-        return []
-
+TOKEN_HASH_CACHE_SIZE = int(os.getenv("KNOWLEDGE_TOKEN_HASH_CACHE_SIZE", "65536"))
+DETERMINISTIC_EMBEDDING_MODEL = f"deterministic-{FALLBACK_EMBEDDING_DIMENSION}"
+RETRIEVAL_VECTOR = "vector"
+RETRIEVAL_HYBRID = "hybrid"
+RETRIEVAL_GRAPH = "graph"
+RETRIEVAL_MODES = (RETRIEVAL_VECTOR, RETRIEVAL_HYBRID, RETRIEVAL_GRAPH)
+HYBRID_CANDIDATES = int(os.getenv("KNOWLEDGE_HYBRID_CANDIDATES", "50"))
+DEFAULT_RRF_K = 60
+# Extra candidates fetched per requested row so collapsing near-duplicates can still fill `limit`.
+COLLAPSE_OVERFETCH = 3
+_EMBEDDING_CLIENTS = {}
+
+
+def iter_words(source):
+    if isinstance(source, str):
+        source = (source,)
+    carry = ""
+    for piece in source:
+        if not piece:
+            continue
+        # Words are yielded as they are matched; only the previous match is held back, since the
+        # last word of a piece may continue in the next one unless the piece ends on whitespace.
+        held = None
+        for match in WORD_PATTERN.finditer(carry + piece if carry else piece):
+            if held is not None:
+                yield held
+            held = match.group()
+        if held is not None and not piece[-1].isspace():
+            carry = held
+        else:
+            carry = ""
+            if held is not None:
+                yield held
+    if carry:
+        yield carry
+
+
+def iter_text_chunks(source, chunk_size=120, overlap=20):
     chunk_size = max(int(chunk_size), 1)
     overlap = max(min(int(overlap), chunk_size - 1), 0) if chunk_size > 1 else 0
     step = max(chunk_size - overlap, 1)
 
-    chunks = []
-    for start in range(0, len(words), step):
-        chunk_words = words[start : start + chunk_size]
-        if not chunk_words:
-            continue
-        chunks.append(" ".join(chunk_words))
-        if start + chunk_size >= len(words):
-            break
-    return chunks
+    window = deque()
+    covered = 0
+    for word in iter_words(source):
+        window.append(word)
+        if len(window) == chunk_size:
+            yield " ".join(window)
+            for _ in range(step):
+                window.popleft()
+            covered = len(window)
+    if len(window) > covered:
+        yield " ".join(window)
+
+
+def split_text_into_chunks(content, chunk_size=120, overlap=20):
+    return list(iter_text_chunks(content or "", chunk_size=chunk_size, overlap=overlap))
 
 
 def _normalize_vector(vector):
@@ -51,7 +113,8 @@ def _normalize_vector(vector):
     return [round(value / norm, 8) for value in vector]
 
 
-def deterministic_embedding(text, dimensions=FALLBACK_EMBEDDING_DIMENSION):
+def deterministic_embedding_scalar(text, dimensions=FALLBACK_EMBEDDING_DIMENSION):
+    # Reference implementation; deterministic_embedding must stay bit-for-bit equal to it.
     tokens = tokenize(text)
     if not tokens:
         tokens = [""]
@@ -69,151 +132,478 @@ def deterministic_embedding(text, dimensions=FALLBACK_EMBEDDING_DIMENSION):
     return _normalize_vector(vector)
 
 
-def _coerce_vector(candidate):
-    if not isinstance(candidate, list) or not candidate:
-        return []
-    vector = []
-    for value in candidate:
-        try:
-            vector.append(float(value))
-        except (TypeError, ValueError):
-            return []
-    return _normalize_vector(vector)
+@lru_cache(maxsize=TOKEN_HASH_CACHE_SIZE)
+def _token_contributions(token, dimensions):
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    buckets, weights = [], []
+    for offset in range(0, 24, 4):
+        b1, b2, b3, b4 = digest[offset : offset + 4]
+        buckets.append(((b1 << 8) | b2) % dimensions)
+        weights.append((1.0 if (b3 % 2 == 0) else -1.0) * ((float(b4) / 255.0) + 0.5))
+    return tuple(buckets), tuple(weights)
+
 
+def deterministic_embedding(text, dimensions=FALLBACK_EMBEDDING_DIMENSION):
+    tokens = tokenize(text)
+    if not tokens:
+        tokens = [""]
+    dimensions = int(dimensions)
+
+    contributions = [_token_contributions(token, dimensions) for token in tokens]
+    count = len(contributions) * 6
+    # bincount adds the weights in input order, which is the token order of the scalar loop, so
+    # every bucket sees the same sequence of float64 additions and the result is identical.
+    vector = np.bincount(
+        np.fromiter(chain.from_iterable(buckets for buckets, _ in contributions), dtype=np.intp, count=count),
+        weights=np.fromiter(chain.from_iterable(weights for _, weights in contributions), dtype=np.float64, count=count),
+        minlength=dimensions,
+    )
+    return _normalize_vector(vector.tolist())
 
-def _embed_with_openai(texts):
+
+def active_embedding_model():
+    return corpus_state()[1] or OPENAI_EMBEDDING_MODEL
+
+
+def _uses_openai(model):
+    return bool(os.getenv("OPENAI_API_KEY")) and model != DETERMINISTIC_EMBEDDING_MODEL
+
+
+def embedding_tag(model):
+    return model if _uses_openai(model) else DETERMINISTIC_EMBEDDING_MODEL
+
+
+def _embedding_client(model=OPENAI_EMBEDDING_MODEL):
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         return None
+    key = (api_key, model, OPENAI_EMBEDDINGS_URL)
+    client = _EMBEDDING_CLIENTS.get(key)
+    if client is None:
+        client = EmbeddingClient(api_key=api_key, model=model, url=OPENAI_EMBEDDINGS_URL)
+        _EMBEDDING_CLIENTS[key] = client
+    return client
 
-    payload = {
-        "model": OPENAI_EMBEDDING_MODEL,
-        "input": [text or "" for text in texts],
-    }
-    request = Request(
-        OPENAI_EMBEDDINGS_URL,
-        data=json.dumps(payload).encode("utf-8"),
-        method="POST",
-        headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        },
-    )
-    try:
-        with urlopen(request, timeout=20) as response:
-            data = json.loads(response.read().decode("utf-8"))
-    except (HTTPError, URLError, json.JSONDecodeError, TimeoutError, ValueError):
-        return None
 
-    records = data.get("data", [])
-    if not isinstance(records, list) or len(records) != len(texts):
+def _embed_with_openai(texts, model=OPENAI_EMBEDDING_MODEL):
+    client = _embedding_client(model)
+    if client is None:
         return None
-    records = sorted(
-        records,
-        key=lambda row: row.get("index", 0) if isinstance(row, dict) else 0,
-    )
-
-    vectors = []
-    for record in records:
-        vector = _coerce_vector(record.get("embedding") if isinstance(record, dict) else None)
-        if not vector:
-            return None
-        vectors.append(vector)
-    return vectors
+    result = client.embed(texts)
+    result.vectors = [_normalize_vector(vector) if vector else None for vector in result.vectors]
+    return result
+
+
+@dataclass
+class EmbeddingOutcome:
+    vectors: list
+    model_tags: list
+    source: str = "none"
+    cache: dict = field(default_factory=lambda: {"hits": 0, "misses": 0})
+    batches: dict = field(default_factory=lambda: {"batches": 0, "failed": 0, "retries": 0})
+
+
+def _embed_with_cache(texts, outcome, model):
+    digests = [text_digest(text) for text in texts]
+    cached = lookup_cached_embeddings(model, digests)
+
+    pending = {}
+    for digest, text in zip(digests, texts):
+        if digest not in cached:
+            pending.setdefault(digest, text)
+    if pending:
+        result = _embed_with_openai(list(pending.values()), model)
+        if result is None:
+            return [None] * len(texts)
+        fresh = {digest: vector for digest, vector in zip(pending.keys(), result.vectors) if vector}
+        store_cached_embeddings(model, fresh)
+        cached.update(fresh)
+        outcome.batches = {"batches": result.batches, "failed": result.failed_batches, "retries": result.retries}
+
+    outcome.cache = {
+        "hits": len(texts) - sum(1 for digest in digests if digest in pending),
+        "misses": len(pending),
+    }
+    return [cached.get(digest) for digest in digests]
 
 
-def build_embeddings(texts):
+def embed_texts(texts, model=OPENAI_EMBEDDING_MODEL):
     normalized_texts = [text or "" for text in texts]
+    outcome = EmbeddingOutcome(vectors=[], model_tags=[])
     if not normalized_texts:
-        return [], "none"
+        return outcome
 
-    openai_vectors = _embed_with_openai(normalized_texts)
-    if openai_vectors:
-        return openai_vectors, "openai"
+    vectors = [None] * len(normalized_texts)
+    if _uses_openai(model):
+        vectors = _embed_with_cache(normalized_texts, outcome, model)
 
-    return [deterministic_embedding(text) for text in normalized_texts], "deterministic"
+    # Only texts whose batch failed fall back to the deterministic embedding.
+    fallback_count = 0
+    for position, vector in enumerate(vectors):
+        if vector:
+            outcome.model_tags.append(model)
+            continue
+        vectors[position] = deterministic_embedding(normalized_texts[position])
+        outcome.model_tags.append(DETERMINISTIC_EMBEDDING_MODEL)
+        fallback_count += 1
+
+    outcome.vectors = vectors
+    if fallback_count == 0:
+        outcome.source = "openai"
+    elif fallback_count == len(vectors):
+        outcome.source = "deterministic"
+    else:
+        outcome.source = "mixed"
+    return outcome
+
+
+def embed_query(query_text, model=OPENAI_EMBEDDING_MODEL):
+    cache_model = embedding_tag(model)
+    normalized = normalize_query(query_text)
+    cached = query_embedding_cache.get((cache_model, normalized))
+    if cached is not None:
+        return cached[0], cached[1], True
+
+    outcome = embed_texts([query_text], model=model)
+    vector = outcome.vectors[0] if outcome.vectors else []
+    if vector:
+        # A failed OpenAI call is cached under the fallback model, so the next lookup retries the API.
+        query_embedding_cache.set((outcome.model_tags[0], normalized), (vector, outcome.source))
+    return vector, outcome.source, False
+
+
+def build_embeddings(texts, return_stats=False):
+    outcome = embed_texts(texts)
+    if return_stats:
+        return outcome.vectors, outcome.source, outcome.cache
+    return outcome.vectors, outcome.source
+
+
+def apply_embedding(chunk, vector, model_tag, dtype=None):
+    dtype = dtype or DEFAULT_STORAGE_DTYPE
+    chunk.embedding = []
+    chunk.embedding_vector = pack_vector(vector, dtype) if vector else b""
+    chunk.embedding_dtype = dtype
+    chunk.embedding_dimension = len(vector) if vector else 0
+    chunk.embedding_model = model_tag if vector else ""
+    return chunk
+
+
+def schedule_index_refresh(document_id):
+    version = bump_corpus_version()
+    KnowledgeDocument.objects.filter(pk=document_id).update(index_version=version)
+    index = get_vector_index()
+    transaction.on_commit(lambda: index.refresh_document(document_id))
+
+
+def schedule_index_removal(document_id):
+    bump_corpus_version()
+    index = get_vector_index()
+    transaction.on_commit(lambda: index.remove_document(document_id))
+
+
+def _iter_batches(items, size):
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _merge_counts(total, counts):
+    for key, value in counts.items():
+        total[key] = total.get(key, 0) + value
+
+
+def _existing_chunks_by_hash(document, model_tag):
+    # Chunks embedded with another model are never reused, so they are returned as outdated.
+    existing = {}
+    outdated = []
+    rows = (
+        KnowledgeChunk.objects.filter(document=document)
+        .order_by("chunk_index")
+        .values_list("id", "chunk_index", "content_hash", "embedding_model")
+        .iterator(chunk_size=CHUNK_WRITE_BATCH_SIZE)
+    )
+    for chunk_id, chunk_index, content_hash, embedding_model in rows:
+        if embedding_model == model_tag:
+            existing.setdefault(content_hash, {})[chunk_index] = chunk_id
+        else:
+            outdated.append(chunk_id)
+    return existing, outdated
 
 
-def _cosine_similarity(left, right):
-    if not left or not right or len(left) != len(right):
+def _claim_existing_chunk(existing, content_hash, position):
+    candidates = existing.get(content_hash)
+    if not candidates:
         return None
-    similarity = sum(a * b for a, b in zip(left, right))
-    return float(round(similarity, 8))
-
-
-def rebuild_document_chunks(document, chunk_size=120, overlap=20):
-    chunk_texts = split_text_into_chunks(document.content, chunk_size=chunk_size, overlap=overlap)
-    embeddings, embedding_source = build_embeddings(chunk_texts)
-    chunk_models = [
-        KnowledgeChunk(
-            document=document,
-            chunk_index=index,
-            content=chunk_text,
-            token_count=len(tokenize(chunk_text)),
-            embedding=embeddings[index] if index < len(embeddings) else [],
-        )
-        for index, chunk_text in enumerate(chunk_texts)
-    ]
+    # Prefer the chunk already sitting at this position so it stays untouched.
+    chunk_index = position if position in candidates else next(iter(candidates))
+    chunk_id = candidates.pop(chunk_index)
+    if not candidates:
+        del existing[content_hash]
+    return chunk_id, chunk_index
+
+
+def _discard_parked_chunks(document):
+    # Parked rows have no keyword postings yet, so dropping them leaves the BM25 stats alone.
+    KnowledgeChunk.objects.parked().filter(document=document).delete()
+
+
+def rebuild_document_chunks(document, chunk_size=120, overlap=20, source=None):
+    source = document.content if source is None else source
+    stats = {"created": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+    sources = set()
+    cache_stats = {"hits": 0, "misses": 0}
+    batch_stats = {"batches": 0, "failed": 0, "retries": 0}
+    moved = []
+    fresh_ids = []
+    position = 0
+    embedding_model = active_embedding_model()
+
+    # New chunks are matched to existing ones by content hash and embedding model. Only unmatched
+    # texts are embedded and inserted, so an edit rewrites the chunks it touched rather than the
+    # whole document, and a model switch or a past fallback is re-embedded.
+    # Reading the source and embedding happen outside any transaction: each embedded batch is
+    # inserted in its own short transaction, parked at TEMP_CHUNK_INDEX_OFFSET + position and
+    # without postings, so searches keep serving the old chunks. One final transaction drops
+    # the stale rows, moves and unparks the rest and indexes the new ones.
+    _discard_parked_chunks(document)
+    existing, outdated = _existing_chunks_by_hash(document, embedding_tag(embedding_model))
+    try:
+        chunk_texts = iter_text_chunks(source, chunk_size=chunk_size, overlap=overlap)
+        for batch in _iter_batches(chunk_texts, CHUNK_WRITE_BATCH_SIZE):
+            fresh = []
+            for chunk_text in batch:
+                content_hash = text_digest(chunk_text)
+                claimed = _claim_existing_chunk(existing, content_hash, position)
+                if claimed is None:
+                    fresh.append((position, chunk_text, content_hash))
+                elif claimed[1] == position:
+                    stats["unchanged"] += 1
+                else:
+                    moved.append(KnowledgeChunk(id=claimed[0], chunk_index=TEMP_CHUNK_INDEX_OFFSET + position))
+                position += 1
+            if not fresh:
+                continue
+
+            embedded = embed_texts([chunk_text for _, chunk_text, _ in fresh], model=embedding_model)
+            chunk_models = [
+                apply_embedding(
+                    KnowledgeChunk(
+                        document=document,
+                        chunk_index=TEMP_CHUNK_INDEX_OFFSET + chunk_position,
+                        content=chunk_text,
+                        content_hash=content_hash,
+                        minhash=signature_bytes(minhash_signature(chunk_text)),
+                        token_count=len(tokenize(chunk_text)),
+                    ),
+                    embedded.vectors[offset],
+                    embedded.model_tags[offset],
+                )
+                for offset, (chunk_position, chunk_text, content_hash) in enumerate(fresh)
+            ]
+            with transaction.atomic():
+                KnowledgeChunk.objects.bulk_create(chunk_models)
+            if any(chunk.pk is None for chunk in chunk_models):
+                fresh_ids.extend(
+                    KnowledgeChunk.objects.filter(
+                        document=document,
+                        chunk_index__in=[chunk.chunk_index for chunk in chunk_models],
+                    ).values_list("id", flat=True)
+                )
+            else:
+                fresh_ids.extend(chunk.pk for chunk in chunk_models)
+            stats["created"] += len(chunk_models)
+            sources.add(embedded.source)
+            _merge_counts(cache_stats, embedded.cache)
+            _merge_counts(batch_stats, embedded.batches)
+    except Exception:
+        # A failing source or embedding call leaves the document as it was.
+        _discard_parked_chunks(document)
+        raise
 
     with transaction.atomic():
-        deleted_chunks, _ = KnowledgeChunk.objects.filter(document=document).delete()
-        KnowledgeChunk.objects.bulk_create(chunk_models)
+        stale_ids = outdated + [chunk_id for candidates in existing.values() for chunk_id in candidates.values()]
+        for stale_batch in _iter_batches(stale_ids, CHUNK_WRITE_BATCH_SIZE):
+            stale = KnowledgeChunk.objects.filter(id__in=stale_batch)
+            unindex_chunks(stale)
+            deleted, _ = stale.delete()
+            stats["deleted"] += deleted
+        KnowledgeChunk.objects.bulk_update(moved, ["chunk_index"], batch_size=CHUNK_WRITE_BATCH_SIZE)
+        stats["updated"] = len(moved)
+        for fresh_batch in _iter_batches(fresh_ids, CHUNK_WRITE_BATCH_SIZE):
+            created = list(KnowledgeChunk.objects.filter(id__in=fresh_batch).only("id", "content", "token_count"))
+            index_chunks(created)
+            link_chunk_entities(created)
+        KnowledgeChunk.objects.parked().filter(document=document).update(
+            chunk_index=F("chunk_index") - TEMP_CHUNK_INDEX_OFFSET
+        )
+        if stats["created"] or stats["updated"] or stats["deleted"]:
+            schedule_index_refresh(document.id)
+
+    if not sources:
+        embedding_source = "none"
+    elif len(sources) == 1:
+        embedding_source = sources.pop()
+    else:
+        embedding_source = "mixed"
 
     return {
-        "deleted_chunks": deleted_chunks,
-        "created_chunks": len(chunk_models),
+        "created_chunks": stats["created"],
+        "updated_chunks": stats["updated"],
+        "unchanged_chunks": stats["unchanged"],
+        "deleted_chunks": stats["deleted"],
         "chunk_size": int(chunk_size),
         "overlap": int(overlap),
         "embedding_source": embedding_source,
+        "embedding_cache": cache_stats,
+        "embedding_batches": batch_stats,
     }
 
 
-def keyword_score(text, query_terms, query_text):
-    if not query_terms:
-        return 0.0
-    token_counts = Counter(tokenize(text))
-    score = float(sum(token_counts.get(term, 0) for term in query_terms))
-    if query_text and query_text.lower() in (text or "").lower():
-        score += float(len(query_terms))
-    return score
+def _result_row(chunk, cosine, kw_score):
+    return {
+        "chunk_id": chunk.id,
+        "document_id": chunk.document_id,
+        "document_title": chunk.document.title,
+        "document_source_uri": chunk.document.source_uri,
+        "chunk_index": chunk.chunk_index,
+        "token_count": chunk.token_count,
+        "score": cosine if cosine is not None else kw_score,
+        "cosine_similarity": cosine,
+        "keyword_score": kw_score,
+        "match_type": "embedding" if cosine is not None else "keyword",
+        "content": chunk.content,
+    }
 
 
-def search_knowledge_chunks(query, limit=20, return_meta=False):
-    query_text = (query or "").strip()
-    query_terms = tokenize(query_text)
-    if not query_terms:
-        return {"results": [], "mode": "none", "embedding_source": "none"} if return_meta else []
+def default_fusion(vector_weight=1.0, keyword_weight=1.0, rrf_k=DEFAULT_RRF_K):
+    return {"vector_weight": float(vector_weight), "keyword_weight": float(keyword_weight), "rrf_k": int(rrf_k)}
 
-    limit = max(int(limit), 1)
-    query_vectors, embedding_source = build_embeddings([query_text])
-    query_vector = query_vectors[0] if query_vectors else []
 
-    rows = []
-    chunks = KnowledgeChunk.objects.select_related("document").all()
-    for chunk in chunks:
-        chunk_vector = _coerce_vector(chunk.embedding)
-        cosine = _cosine_similarity(query_vector, chunk_vector) if query_vector else None
-        kw_score = keyword_score(chunk.content, query_terms, query_text)
+def default_graph_expansion(weight=1.0, min_weight=GRAPH_MIN_WEIGHT, top=GRAPH_EXPANSION_TOP, order=ORDER_SCORE):
+    return {"weight": float(weight), "min_weight": float(min_weight), "top": int(top), "order": order}
 
-        if cosine is None and kw_score <= 0:
-            continue
 
-        rows.append(
-            {
-                "chunk_id": chunk.id,
-                "document_id": chunk.document_id,
-                "document_title": chunk.document.title,
-                "document_source_uri": chunk.document.source_uri,
-                "chunk_index": chunk.chunk_index,
-                "token_count": chunk.token_count,
-                "score": cosine if cosine is not None else kw_score,
-                "cosine_similarity": cosine,
-                "keyword_score": kw_score,
-                "match_type": "embedding" if cosine is not None else "keyword",
-                "content": chunk.content,
-            }
+def reciprocal_rank_fusion(ranked_lists, weights, rrf_k=DEFAULT_RRF_K):
+    fused = {}
+    for ranked, weight in zip(ranked_lists, weights):
+        for rank, chunk_id in enumerate(ranked, start=1):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + weight / (rrf_k + rank)
+    return fused
+
+
+@dataclass(frozen=True)
+class _Scope:
+    # Allowed document ids for the vector mask and the same set as a subquery for postings.
+    ids: object = None
+    documents: object = None
+
+
+def _graph_hits(query_text, limit, graph, scope, timings):
+    stage_started = time.perf_counter()
+    entities = match_query_entities(query_text)
+    timings["entity_match_ms"] = _elapsed_ms(stage_started)
+    stage_started = time.perf_counter()
+    weights = expand_entities(entities, min_weight=graph["min_weight"], top=graph["top"], order=graph["order"])
+    timings["graph_expand_ms"] = _elapsed_ms(stage_started)
+    stage_started = time.perf_counter()
+    scores = graph_chunk_scores(weights, documents=scope.documents)
+    hits = heapq.nlargest(max(HYBRID_CANDIDATES, limit), scores.items(), key=lambda item: (item[1], -item[0]))
+    timings["graph_postings_ms"] = _elapsed_ms(stage_started)
+    return hits, {
+        **graph,
+        "entities": sorted(entities.values()),
+        "expanded_entities": len(weights) - len(entities),
+        "candidates": len(scores),
+    }
+
+
+def _hybrid_rows(index, query_vector, query_terms, limit, mode, fusion, scope, graph_hits=None, graph_weight=0.0):
+    # Each signal ranks only its own top candidates; nothing is scored by both indexes.
+    candidates = max(HYBRID_CANDIDATES, limit)
+    vector_hits = index.search(query_vector, candidates, mode=mode, document_ids=scope.ids) if query_vector else []
+    keyword_hits, keyword_scores = bm25_top_k(query_terms, candidates, documents=scope.documents)
+    vector_ranked = [chunk_id for chunk_id, _ in vector_hits]
+    keyword_ranked = [chunk_id for chunk_id, _ in keyword_hits]
+    graph_ranked = [chunk_id for chunk_id, _ in graph_hits or []]
+    fused = reciprocal_rank_fusion(
+        [vector_ranked, keyword_ranked, graph_ranked],
+        [fusion["vector_weight"], fusion["keyword_weight"], graph_weight],
+        rrf_k=fusion["rrf_k"],
+    )
+    cosine_by_id = dict(vector_hits)
+    graph_scores = dict(graph_hits or [])
+    vector_rank = {chunk_id: rank for rank, chunk_id in enumerate(vector_ranked, start=1)}
+    keyword_rank = {chunk_id: rank for rank, chunk_id in enumerate(keyword_ranked, start=1)}
+    graph_rank = {chunk_id: rank for rank, chunk_id in enumerate(graph_ranked, start=1)}
+    top = heapq.nlargest(
+        limit,
+        (chunk_id for chunk_id, score in fused.items() if score > 0),
+        key=lambda chunk_id: (fused[chunk_id], cosine_by_id.get(chunk_id, float("-inf")), -chunk_id),
+    )
+
+    chunks = KnowledgeChunk.objects.select_related("document").in_bulk(top)
+    rows = []
+    for chunk_id in top:
+        chunk = chunks.get(chunk_id)
+        if chunk is None:
+            continue
+        cosine = cosine_by_id.get(chunk_id)
+        row = _result_row(
+            chunk,
+            float(round(cosine, 8)) if cosine is not None else None,
+            keyword_scores.get(chunk_id, 0.0),
+        )
+        row["score"] = round(fused[chunk_id], 8)
+        row["vector_rank"] = vector_rank.get(chunk_id)
+        row["keyword_rank"] = keyword_rank.get(chunk_id)
+        if row["vector_rank"] and row["keyword_rank"]:
+            row["match_type"] = RETRIEVAL_HYBRID
+        if graph_hits is not None:
+            row["graph_rank"] = graph_rank.get(chunk_id)
+            row["graph_score"] = graph_scores.get(chunk_id, 0.0)
+            if row["graph_rank"] and not (row["vector_rank"] or row["keyword_rank"]):
+                row["match_type"] = RETRIEVAL_GRAPH
+        rows.append(row)
+    return rows
+
+
+def _vector_rows(index, query_vector, query_terms, limit, mode, scope):
+    hits = index.search(query_vector, limit, mode=mode, document_ids=scope.ids) if query_vector else []
+    keyword_hits = []
+    if len(hits) >= limit:
+        # A full page of vector hits only needs keyword scores for its own chunks.
+        keyword_scores = bm25_scores(query_terms, documents=scope.documents, chunk_ids=[hit[0] for hit in hits])
+    else:
+        keyword_scores = bm25_scores(query_terms, documents=scope.documents)
+        # Chunks without a vector of the query's dimension can still match on keywords.
+        candidate_ids = list(keyword_scores)
+        if query_vector and candidate_ids:
+            indexed = index.indexed(len(query_vector), candidate_ids)
+            candidate_ids = [chunk_id for chunk_id, skip in zip(candidate_ids, indexed.tolist()) if not skip]
+        hit_ids = {chunk_id for chunk_id, _ in hits}
+        keyword_hits = heapq.nlargest(
+            limit - len(hits),
+            ((chunk_id, keyword_scores[chunk_id]) for chunk_id in candidate_ids if chunk_id not in hit_ids),
+            key=lambda item: item[1],
         )
 
+    chunks = KnowledgeChunk.objects.select_related("document").in_bulk(
+        [chunk_id for chunk_id, _ in hits] + [chunk_id for chunk_id, _ in keyword_hits]
+    )
+    rows = []
+    for chunk_id, cosine in hits:
+        chunk = chunks.get(chunk_id)
+        if chunk is not None:
+            rows.append(_result_row(chunk, float(round(cosine, 8)), keyword_scores.get(chunk_id, 0.0)))
+    for chunk_id, kw_score in keyword_hits:
+        chunk = chunks.get(chunk_id)
+        if chunk is not None:
+            rows.append(_result_row(chunk, None, kw_score))
+
     has_embedding_hits = any(row["cosine_similarity"] is not None for row in rows)
     if has_embedding_hits:
         rows.sort(
@@ -225,17 +615,177 @@ def search_knowledge_chunks(query, limit=20, return_meta=False):
             ),
             reverse=True,
         )
-        mode = "embedding"
+        match_mode = "embedding"
     else:
         rows = [row for row in rows if row["keyword_score"] > 0]
         rows.sort(key=lambda row: (-row["keyword_score"], row["chunk_index"]))
-        mode = "keyword"
+        match_mode = "keyword"
+    return rows[:limit], match_mode
+
+
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+def _run_search(
+    query_text,
+    query_terms,
+    limit,
+    mode,
+    retrieval,
+    fusion,
+    filters,
+    collapse,
+    rerank,
+    rerank_candidates,
+    embedding_model,
+    graph,
+):
+    meta = {}
+    timings = {}
+    started = time.perf_counter()
+    # The first stage only has to surface `candidates` rows; the reranker picks the final `limit`.
+    candidates = max(limit, rerank_candidates) if rerank != RERANK_NONE else limit
+    fetch_limit = candidates * COLLAPSE_OVERFETCH if collapse else candidates
+    scope = _Scope()
+    if not filters.is_empty:
+        scope = _Scope(ids=filters.document_id_array(), documents=filters.documents())
+        meta["filters"] = {**filters.as_dict(), "matched_documents": int(scope.ids.shape[0])}
+
+    stage_started = time.perf_counter()
+    query_vector, embedding_source, embedding_hit = embed_query(query_text, model=embedding_model)
+    timings["embed_ms"] = _elapsed_ms(stage_started)
+    graph_hits = None
+    if retrieval == RETRIEVAL_GRAPH and (scope.ids is None or scope.ids.shape[0]):
+        graph_hits, meta["graph"] = _graph_hits(query_text, fetch_limit, graph, scope, timings)
+    stage_started = time.perf_counter()
+    index = get_vector_index()
+    index.ensure_model(embedding_model)
+    if scope.ids is not None and not scope.ids.shape[0]:
+        rows, match_mode = [], "none"
+    elif retrieval in (RETRIEVAL_HYBRID, RETRIEVAL_GRAPH):
+        rows = _hybrid_rows(
+            index,
+            query_vector,
+            query_terms,
+            fetch_limit,
+            mode,
+            fusion,
+            scope,
+            graph_hits=graph_hits,
+            graph_weight=graph["weight"] if graph_hits is not None else 0.0,
+        )
+        match_mode = retrieval
+        meta["fusion"] = fusion
+    else:
+        rows, match_mode = _vector_rows(index, query_vector, query_terms, fetch_limit, mode, scope)
+    timings["first_stage_ms"] = _elapsed_ms(stage_started)
+    if collapse:
+        stage_started = time.perf_counter()
+        rows, meta["collapsed"] = collapse_near_duplicates(rows, candidates)
+        timings["collapse_ms"] = _elapsed_ms(stage_started)
+    if rerank != RERANK_NONE:
+        stage_started = time.perf_counter()
+        rows, meta["rerank"] = rerank_rows(rows, query_text, query_terms, rerank, limit)
+        timings["rerank_ms"] = _elapsed_ms(stage_started)
+    timings["total_ms"] = _elapsed_ms(started)
+    degraded = "fallback_from" in meta.get("rerank", {}) or (
+        embedding_source != "openai" and _uses_openai(embedding_model)
+    )
+
+    return {
+        "results": rows,
+        "mode": match_mode,
+        "vector_index": index.resolve_mode(len(query_vector), mode, document_ids=scope.ids),
+        "vector_quantization": index.quantization,
+        "embedding_source": embedding_source,
+        "timings": timings,
+        **meta,
+    }, embedding_hit, degraded
+
+
+def search_knowledge_chunks(
+    query,
+    limit=20,
+    return_meta=False,
+    mode=MODE_EXACT,
+    retrieval=RETRIEVAL_VECTOR,
+    fusion=None,
+    filters=None,
+    collapse=True,
+    rerank=RERANK_NONE,
+    rerank_candidates=None,
+    graph=None,
+):
+    started = time.perf_counter()
+    query_text = (query or "").strip()
+    query_terms = tokenize(query_text)
+    if not query_terms:
+        return {"results": [], "mode": "none", "embedding_source": "none"} if return_meta else []
+
+    limit = max(int(limit), 1)
+    version, embedding_model, graph_version = corpus_state()
+    embedding_model = embedding_model or OPENAI_EMBEDDING_MODEL
+    fusion = default_fusion(**(fusion or {}))
+    fusion_key = tuple(sorted(fusion.items())) if retrieval in (RETRIEVAL_HYBRID, RETRIEVAL_GRAPH) else None
+    graph = default_graph_expansion(**(graph or {}))
+    # Relation writes do not bump the corpus version, so graph results are also keyed by the graph version.
+    graph_key = (tuple(sorted(graph.items())), graph_version) if retrieval == RETRIEVAL_GRAPH else None
+    filters = filters or SearchFilters()
+    collapse = bool(collapse)
+    rerank_candidates = DEFAULT_RERANK_CANDIDATES if rerank_candidates is None else int(rerank_candidates)
+    rerank_candidates = min(max(rerank_candidates, 1), MAX_RERANK_CANDIDATES) if rerank != RERANK_NONE else 0
+    result_key = (
+        normalize_query(query_text),
+        limit,
+        mode,
+        retrieval,
+        fusion_key,
+        graph_key,
+        filters,
+        collapse,
+        rerank,
+        rerank_candidates,
+        version,
+    )
+    search = search_result_cache.get(result_key)
+    result_hit = search is not None
+    embedding_hit = None
+    if search is None:
+        search, embedding_hit, degraded = _run_search(
+            query_text,
+            query_terms,
+            limit,
+            mode,
+            retrieval,
+            fusion,
+            filters,
+            collapse,
+            rerank,
+            rerank_candidates,
+            embedding_model,
+            graph,
+        )
+        # A run that fell back (reranker or embedding call failed) is not cached, so the next request retries.
+        if not degraded:
+            search_result_cache.set(result_key, search)
+        timings = search["timings"]
+    else:
+        # The stored timings describe the run that filled the cache; a hit reports its own cost.
+        elapsed = _elapsed_ms(started)
+        timings = {"result_cache_ms": elapsed, "total_ms": elapsed}
 
-    results = rows[:limit]
+    # Rows are copied so callers cannot mutate cached results.
+    results = [dict(row) for row in search["results"]]
     if return_meta:
         return {
+            **search,
             "results": results,
-            "mode": mode,
-            "embedding_source": embedding_source,
+            "timings": timings,
+            "corpus_version": version,
+            "cache": {
+                "results": {"hit": result_hit, **search_result_cache.stats()},
+                "query_embedding": {"hit": embedding_hit, **query_embedding_cache.stats()},
+            },
         }
     return results
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.db.models import F
+
+from apps.ai.models import KnowledgeCorpusStats
+
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("KNOWLEDGE_QUERY_CACHE_SIZE", "1024"))
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("KNOWLEDGE_QUERY_CACHE_TTL_SECONDS", "3600"))
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv("KNOWLEDGE_RESULT_CACHE_SIZE", "256"))
+SEARCH_RESULT_CACHE_TTL_SECONDS = float(os.getenv("KNOWLEDGE_RESULT_CACHE_TTL_SECONDS", "300"))
+_MISSING = object()
+
+
+def normalize_query(text):
+    return " ".join((text or "").casefold().split())
+
+
+class LRUCache:
+    """Thread-safe LRU cache whose entries also expire after a fixed TTL."""
+
+    def __init__(self, max_entries, ttl_seconds, clock=time.monotonic):
+        self.max_entries = max(int(max_entries), 0)
+        self.ttl_seconds = float(ttl_seconds)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not _MISSING:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self._entries),
+        }
+
+
+query_embedding_cache = LRUCache(QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL_SECONDS)
+search_result_cache = LRUCache(SEARCH_RESULT_CACHE_SIZE, SEARCH_RESULT_CACHE_TTL_SECONDS)
+
+
+def clear_search_caches():
+    query_embedding_cache.clear()
+    search_result_cache.clear()
+
+
+def corpus_state():
+    # One read for the result-cache versions and the embedding model searches must use.
+    state = (
+        KnowledgeCorpusStats.objects.filter(slug="current")
+        .values_list("version", "embedding_model", "graph_version")
+        .first()
+    )
+    return (int(state[0]), state[1], int(state[2])) if state else (0, "", 0)
+
+
+def corpus_version():
+    version = KnowledgeCorpusStats.objects.filter(slug="current").values_list("version", flat=True).first()
+    return int(version or 0)
+
+
+def bump_corpus_version():
+    # Stored in the database so every worker process sees the bump once the writing transaction commits.
+    KnowledgeCorpusStats.get_current()
+    KnowledgeCorpusStats.objects.filter(slug="current").update(version=F("version") + 1)
+    return corpus_version()
@@ -0,0 +1,127 @@
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime, time
+
+import numpy as np
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from apps.ai.models import KnowledgeDocument
+
+
+METADATA_KEY_RE = re.compile(r"^[A-Za-z0-9_\-]+$")
+SCALAR_TYPES = (str, int, float, bool)
+
+
+def _as_list(value):
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        return [part.strip() for part in value.split(",") if part.strip()]
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def _parse_moment(value, name, end_of_day=False):
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        text = str(value).strip()
+        moment = parse_datetime(text)
+        if moment is None:
+            day = parse_date(text)
+            if day is None:
+                raise ValueError(f"{name} must be an ISO date or datetime.")
+            moment = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _parse_metadata(value):
+    if value is None or value == "":
+        return ()
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            raise ValueError("metadata must be a JSON object.")
+    if not isinstance(value, dict):
+        raise ValueError("metadata must be a JSON object.")
+
+    constraints = []
+    for key, allowed in sorted(value.items()):
+        if not METADATA_KEY_RE.match(str(key)) or "__" in str(key):
+            raise ValueError(f"Invalid metadata key: {key}.")
+        allowed = allowed if isinstance(allowed, list) else [allowed]
+        if not allowed or not all(isinstance(item, SCALAR_TYPES) for item in allowed):
+            raise ValueError(f"metadata.{key} must be a scalar or a list of scalars.")
+        constraints.append((str(key), tuple(allowed)))
+    return tuple(constraints)
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    """Document-level constraints applied to both indexes before any chunk is scored."""
+
+    source_types: tuple[str, ...] = ()
+    metadata: tuple[tuple[str, tuple], ...] = ()
+    created_after: datetime | None = None
+    created_before: datetime | None = None
+    document_ids: tuple[int, ...] = ()
+
+    @classmethod
+    def from_params(cls, source_type=None, metadata=None, created_after=None, created_before=None, document_ids=None):
+        source_types = tuple(sorted({str(item).strip().lower() for item in _as_list(source_type)}))
+        valid_types = {choice for choice, _ in KnowledgeDocument.SOURCE_TYPE_CHOICES}
+        unknown = [item for item in source_types if item not in valid_types]
+        if unknown:
+            raise ValueError(f"source_type must be one of: {', '.join(sorted(valid_types))}.")
+        try:
+            ids = tuple(sorted({int(item) for item in _as_list(document_ids)}))
+        except (TypeError, ValueError):
+            raise ValueError("document_ids must be a list of integers.")
+        filters = cls(
+            source_types=source_types,
+            metadata=_parse_metadata(metadata),
+            created_after=_parse_moment(created_after, "created_after"),
+            created_before=_parse_moment(created_before, "created_before", end_of_day=True),
+            document_ids=ids,
+        )
+        if filters.created_after and filters.created_before and filters.created_after > filters.created_before:
+            raise ValueError("created_after must not be later than created_before.")
+        return filters
+
+    @property
+    def is_empty(self):
+        return not (self.source_types or self.metadata or self.created_after or self.created_before or self.document_ids)
+
+    def documents(self):
+        queryset = KnowledgeDocument.objects.all()
+        if self.source_types:
+            queryset = queryset.filter(source_type__in=self.source_types)
+        for key, allowed in self.metadata:
+            queryset = queryset.filter(**{f"metadata__{key}__in": list(allowed)})
+        if self.created_after:
+            queryset = queryset.filter(created_at__gte=self.created_after)
+        if self.created_before:
+            queryset = queryset.filter(created_at__lte=self.created_before)
+        if self.document_ids:
+            queryset = queryset.filter(id__in=self.document_ids)
+        return queryset.order_by().values("id")
+
+    def document_id_array(self):
+        return np.fromiter(self.documents().values_list("id", flat=True), dtype=np.int64)
+
+    def as_dict(self):
+        return {
+            "source_type": list(self.source_types),
+            "metadata": {key: list(allowed) for key, allowed in self.metadata},
+            "created_after": self.created_after.isoformat() if self.created_after else None,
+            "created_before": self.created_before.isoformat() if self.created_before else None,
+            "document_ids": list(self.document_ids),
+        }
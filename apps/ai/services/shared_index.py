@@ -0,0 +1,159 @@
+import fcntl
+import json
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import numpy as np
+
+
+SHARED_INDEX_PATH = os.getenv("KNOWLEDGE_SHARED_INDEX_PATH", "").strip()
+SHARED_INDEX_CHECK_SECONDS = float(os.getenv("KNOWLEDGE_SHARED_INDEX_CHECK_SECONDS", "1.0"))
+MAGIC = b"KVIX"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIQI")
+ALIGNMENT = 64
+SEGMENT_ARRAYS = ("matrix", "chunk_ids", "document_ids", "scales")
+
+
+@dataclass(frozen=True)
+class MappedIndex:
+    version: int
+    stamp: tuple
+    segments: dict[int, dict[str, np.ndarray | None]]
+
+
+def file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+@contextmanager
+def publish_lock(path):
+    # Serializes publishers across worker processes; readers never take it.
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.lock", "a+b") as handle:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def write_arrays(path, magic, format_version, version, table, arrays):
+    """Writes header, JSON table and 64-byte aligned arrays, then swaps the file in atomically.
+
+    ``arrays`` is a list of (spec, array) pairs; each spec dict referenced from ``table`` gets
+    its dtype, shape and offset filled in before the table is serialized.
+    """
+    offset = 0
+    placed = []
+    for spec, array in arrays:
+        array = np.ascontiguousarray(array)
+        spec.update({"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset})
+        placed.append((offset, array))
+        offset = _aligned(offset + array.nbytes)
+
+    table_bytes = json.dumps(table).encode("utf-8")
+    data_start = _aligned(HEADER.size + len(table_bytes))
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as handle:
+        handle.write(HEADER.pack(magic, format_version, int(version), len(table_bytes)))
+        handle.write(table_bytes)
+        for array_offset, array in placed:
+            if not array.nbytes:
+                continue
+            handle.seek(data_start + array_offset)
+            handle.write(memoryview(array).cast("B"))
+        handle.truncate(data_start + offset)
+        handle.flush()
+        os.fsync(handle.fileno())
+    # Readers holding the old mapping keep the old inode alive until they remap.
+    os.replace(temp_path, path)
+
+
+@dataclass(frozen=True)
+class MappedFile:
+    version: int
+    stamp: tuple
+    table: object
+    buffer: mmap.mmap
+    data_start: int
+
+    def array(self, spec):
+        dtype = np.dtype(spec["dtype"])
+        shape = tuple(spec["shape"])
+        count = int(np.prod(shape)) if shape else 0
+        # np.frombuffer keeps the mmap alive for as long as any array references it.
+        return np.frombuffer(self.buffer, dtype=dtype, count=count, offset=self.data_start + spec["offset"]).reshape(
+            shape
+        )
+
+
+def map_arrays(path, magic, format_version):
+    try:
+        handle = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with handle:
+        stat = os.fstat(handle.fileno())
+        if stat.st_size < HEADER.size:
+            return None
+        buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+    file_magic, file_format, version, table_length = HEADER.unpack_from(buffer, 0)
+    if file_magic != magic or file_format != format_version:
+        raise ValueError(f"unsupported_index_file:{path}")
+    table = json.loads(bytes(buffer[HEADER.size : HEADER.size + table_length]).decode("utf-8"))
+    return MappedFile(
+        version=int(version),
+        stamp=(stat.st_ino, stat.st_size, stat.st_mtime_ns),
+        table=table,
+        buffer=buffer,
+        data_start=_aligned(HEADER.size + table_length),
+    )
+
+
+def segment_table(segments):
+    table, arrays = [], []
+    for dimension, segment in sorted(segments.items()):
+        entry = {"dimension": int(dimension), "rows": len(segment), "arrays": {}}
+        for name in SEGMENT_ARRAYS:
+            array = getattr(segment, name)
+            if array is None:
+                continue
+            spec = entry["arrays"][name] = {}
+            arrays.append((spec, array))
+        table.append(entry)
+    return table, arrays
+
+
+def mapped_segments(mapped, table):
+    segments = {}
+    for entry in table:
+        segment = dict.fromkeys(SEGMENT_ARRAYS)
+        for name, spec in entry["arrays"].items():
+            segment[name] = mapped.array(spec)
+        segments[int(entry["dimension"])] = segment
+    return segments
+
+
+def write_index(path, version, segments):
+    table, arrays = segment_table(segments)
+    write_arrays(path, MAGIC, FORMAT_VERSION, version, table, arrays)
+
+
+def read_index(path):
+    mapped = map_arrays(path, MAGIC, FORMAT_VERSION)
+    if mapped is None:
+        return None
+    return MappedIndex(version=mapped.version, stamp=mapped.stamp, segments=mapped_segments(mapped, mapped.table))
@@ -0,0 +1,103 @@
+import codecs
+import re
+from html.parser import HTMLParser
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+
+READ_BLOCK_SIZE = 64 * 1024
+WHITESPACE_RE = re.compile(r"\s+")
+SKIPPED_TAGS = {"script", "style", "noscript", "template"}
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+        self.pieces.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        self.pieces.append(" ")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.pieces.append(data)
+
+    def drain(self):
+        text = WHITESPACE_RE.sub(" ", "".join(self.pieces))
+        self.pieces = []
+        return text
+
+
+class UrlTextStream:
+    """Iterates the visible text of a URL block by block without buffering the whole body.
+
+    With an ``etag`` or ``last_modified`` from a previous fetch the request is conditional;
+    a 304 answer yields nothing and sets ``not_modified``.
+    """
+
+    def __init__(self, url, timeout_seconds, headers=None, etag="", last_modified=""):
+        self.url = url
+        self.timeout_seconds = timeout_seconds
+        self.headers = dict(
+            headers
+            or {
+                "User-Agent": "FixItFelixKnowledgeIngest/1.0",
+                "Accept": "text/plain,text/html,application/json,*/*",
+            }
+        )
+        if etag:
+            self.headers["If-None-Match"] = etag
+        if last_modified:
+            self.headers["If-Modified-Since"] = last_modified
+        self.error = None
+        self.content_type = ""
+        self.characters = 0
+        self.status = None
+        self.not_modified = False
+        self.etag = ""
+        self.last_modified = ""
+
+    def __iter__(self):
+        request = Request(self.url, headers=self.headers)
+        extractor = _TextExtractor()
+        try:
+            with urlopen(request, timeout=self.timeout_seconds) as response:
+                self.status = response.status
+                self.etag = response.headers.get("ETag", "")
+                self.last_modified = response.headers.get("Last-Modified", "")
+                self.content_type = response.headers.get("Content-Type", "")
+                charset = response.headers.get_content_charset() or "utf-8"
+                decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+                while True:
+                    block = response.read(READ_BLOCK_SIZE)
+                    final = not block
+                    extractor.feed(decoder.decode(block, final=final))
+                    if final:
+                        extractor.close()
+                    text = extractor.drain()
+                    if text.strip():
+                        self.characters += len(text)
+                        yield text
+                    if final:
+                        break
+        except HTTPError as exc:
+            self.status = exc.code
+            if exc.code == 304:
+                self.not_modified = True
+                return
+            self.error = f"url_fetch_failed:{exc.__class__.__name__}"
+            return
+        except (URLError, TimeoutError, ValueError, LookupError) as exc:
+            self.error = f"url_fetch_failed:{exc.__class__.__name__}"
+            return
+
+        if not self.characters:
+            self.error = f"url_fetch_empty:{self.content_type or 'unknown'}"
@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+
+
+DTYPE_FLOAT32 = "float32"
+DTYPE_FLOAT16 = "float16"
+STORAGE_DTYPES = {
+    DTYPE_FLOAT32: np.dtype("<f4"),
+    DTYPE_FLOAT16: np.dtype("<f2"),
+}
+DEFAULT_STORAGE_DTYPE = os.getenv("KNOWLEDGE_EMBEDDING_DTYPE", DTYPE_FLOAT32).strip().lower()
+if DEFAULT_STORAGE_DTYPE not in STORAGE_DTYPES:
+    DEFAULT_STORAGE_DTYPE = DTYPE_FLOAT32
+
+
+def pack_vector(vector, dtype=None) -> bytes:
+    dtype = dtype or DEFAULT_STORAGE_DTYPE
+    values = np.asarray(vector, dtype=np.float64).ravel()
+    if not values.size:
+        return b""
+    norm = float(np.linalg.norm(values))
+    if norm > 0:
+        values = values / norm
+    return values.astype(STORAGE_DTYPES[dtype]).tobytes()
+
+
+def unpack_vector(data, dtype=DTYPE_FLOAT32) -> np.ndarray:
+    if not data:
+        return np.zeros(0, dtype=np.float32)
+    values = np.frombuffer(data, dtype=STORAGE_DTYPES.get(dtype or DTYPE_FLOAT32, STORAGE_DTYPES[DTYPE_FLOAT32]))
+    return values if values.dtype == np.float32 else values.astype(np.float32)
+
+
+def vector_to_list(data, dtype=DTYPE_FLOAT32) -> list[float]:
+    return [round(float(value), 8) for value in unpack_vector(data, dtype)]
@@ -0,0 +1,475 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from apps.ai.models import KnowledgeChunk
+from apps.ai.services.ann_index import ANN_MIN_ROWS, DEFAULT_NPROBE, IVFIndex
+from apps.ai.services.index_snapshot import INDEX_SNAPSHOT_PATH, changed_since, read_snapshot, write_snapshot
+from apps.ai.services.quantization import (
+    DEFAULT_QUANTIZATION,
+    DEFAULT_RESCORE_CANDIDATES,
+    QUANTIZATION_NONE,
+    QUANTIZATION_INT8,
+    quantize_rows,
+    quantized_scores,
+)
+from apps.ai.services.search_cache import corpus_version
+from apps.ai.services.shared_index import (
+    SHARED_INDEX_CHECK_SECONDS,
+    SHARED_INDEX_PATH,
+    file_stamp,
+    publish_lock,
+    read_index,
+    write_index,
+)
+from apps.ai.services.vector_codec import unpack_vector
+
+
+BUILD_BATCH_SIZE = 2000
+MODE_EXACT = "exact"
+MODE_ANN = "ann"
+SEARCH_MODES = (MODE_EXACT, MODE_ANN)
+VECTOR_FIELDS = ("id", "document_id", "embedding_vector", "embedding_dtype", "embedding_dimension")
+RESCORE_FIELDS = ("id", "embedding_vector", "embedding_dtype")
+
+
+@dataclass(frozen=True)
+class _Segment:
+    # matrix holds float32 rows, or int8 codes when scales is set.
+    matrix: np.ndarray
+    chunk_ids: np.ndarray
+    document_ids: np.ndarray
+    scales: np.ndarray | None = None
+
+    @classmethod
+    def empty(cls, dimension: int, quantized: bool = False) -> "_Segment":
+        return cls(
+            matrix=np.zeros((0, dimension), dtype=np.int8 if quantized else np.float32),
+            chunk_ids=np.zeros(0, dtype=np.int64),
+            document_ids=np.zeros(0, dtype=np.int64),
+            scales=np.zeros(0, dtype=np.float32) if quantized else None,
+        )
+
+    def __len__(self) -> int:
+        return int(self.chunk_ids.shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        total = self.matrix.nbytes + self.chunk_ids.nbytes + self.document_ids.nbytes
+        return total + (self.scales.nbytes if self.scales is not None else 0)
+
+
+def _stack_rows(rows: list[np.ndarray], dimension: int, dtype=np.float32) -> np.ndarray:
+    # Stored vectors are already unit length, so stacking is the only copy.
+    if not rows:
+        return np.zeros((0, dimension), dtype=dtype)
+    return np.ascontiguousarray(np.vstack(rows), dtype=dtype)
+
+
+def _as_unit_vector(vector) -> np.ndarray | None:
+    query = np.asarray(vector, dtype=np.float32).ravel()
+    if not query.size:
+        return None
+    norm = float(np.linalg.norm(query))
+    if norm > 0:
+        query = query / norm
+    return query
+
+
+def top_k(scores: np.ndarray, limit: int) -> np.ndarray:
+    limit = max(int(limit), 1)
+    if limit < scores.shape[0]:
+        top = np.argpartition(-scores, limit - 1)[:limit]
+    else:
+        top = np.arange(scores.shape[0])
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def _group_by_dimension(records, quantized: bool = False) -> dict[int, _Segment]:
+    grouped: dict[int, tuple[list[int], list[int], list[np.ndarray], list[float]]] = {}
+    for chunk_id, document_id, data, dtype, dimension in records:
+        if not dimension or not data:
+            continue
+        row = unpack_vector(data, dtype)
+        if row.shape[0] != dimension:
+            continue
+        chunk_ids, document_ids, rows, scales = grouped.setdefault(int(dimension), ([], [], [], []))
+        chunk_ids.append(int(chunk_id))
+        document_ids.append(int(document_id))
+        if quantized:
+            # Quantize row by row so a full float32 matrix is never held while building.
+            codes, row_scales = quantize_rows(row)
+            rows.append(codes)
+            scales.append(float(row_scales[0]))
+        else:
+            rows.append(row)
+
+    return {
+        dimension: _Segment(
+            matrix=_stack_rows(rows, dimension, dtype=np.int8 if quantized else np.float32),
+            chunk_ids=np.asarray(chunk_ids, dtype=np.int64),
+            document_ids=np.asarray(document_ids, dtype=np.int64),
+            scales=np.asarray(scales, dtype=np.float32) if quantized else None,
+        )
+        for dimension, (chunk_ids, document_ids, rows, scales) in grouped.items()
+    }
+
+
+def _drop_rows(segments: dict[int, _Segment], document_ids: set[int], chunk_ids: set[int]) -> dict[int, _Segment]:
+    # Segments are replaced rather than mutated so concurrent searches keep a consistent view.
+    result = {}
+    drop_documents = np.asarray(sorted(document_ids), dtype=np.int64)
+    drop_chunks = np.asarray(sorted(chunk_ids), dtype=np.int64)
+    for dimension, segment in segments.items():
+        drop = np.isin(segment.document_ids, drop_documents) | np.isin(segment.chunk_ids, drop_chunks)
+        if not drop.any():
+            result[dimension] = segment
+            continue
+        keep = ~drop
+        result[dimension] = _Segment(
+            matrix=np.ascontiguousarray(segment.matrix[keep]),
+            chunk_ids=segment.chunk_ids[keep],
+            document_ids=segment.document_ids[keep],
+            scales=segment.scales[keep] if segment.scales is not None else None,
+        )
+    return result
+
+
+def _append_records(segments: dict[int, _Segment], records, quantized: bool) -> dict[int, _Segment]:
+    result = dict(segments)
+    for dimension, fresh in _group_by_dimension(records).items():
+        current = result.get(dimension) or _Segment.empty(dimension, quantized=quantized)
+        matrix, scales = fresh.matrix, None
+        if current.scales is not None:
+            matrix, scales = quantize_rows(fresh.matrix)
+        result[dimension] = _Segment(
+            matrix=np.ascontiguousarray(np.vstack([current.matrix, matrix])),
+            chunk_ids=np.concatenate([current.chunk_ids, fresh.chunk_ids]),
+            document_ids=np.concatenate([current.document_ids, fresh.document_ids]),
+            scales=np.concatenate([current.scales, scales]) if scales is not None else None,
+        )
+    return result
+
+
+def load_stored_vectors(chunk_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    vectors = {}
+    rows = KnowledgeChunk.objects.filter(id__in=[int(chunk_id) for chunk_id in chunk_ids]).values_list(*RESCORE_FIELDS)
+    for chunk_id, data, dtype in rows:
+        if data:
+            vectors[int(chunk_id)] = unpack_vector(data, dtype)
+    found = [int(chunk_id) for chunk_id in chunk_ids if int(chunk_id) in vectors]
+    if not found:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 0), dtype=np.float32)
+    return np.asarray(found, dtype=np.int64), np.vstack([vectors[chunk_id] for chunk_id in found])
+
+
+class VectorIndex:
+    """Cosine index over chunk embeddings, one float32 or int8 matrix per dimension.
+
+    With a shared_path the matrices live in a memory-mapped file that every worker
+    process attaches to read-only; writers publish a new file version atomically.
+    With a snapshot_path the first build maps an exported snapshot and only replays
+    documents whose chunks changed after it was taken.
+    """
+
+    def __init__(
+        self, quantization=None, rescore_candidates=None, vector_loader=None, shared_path=None, snapshot_path=None
+    ):
+        self.quantization = quantization or DEFAULT_QUANTIZATION
+        self.shared_path = SHARED_INDEX_PATH if shared_path is None else shared_path
+        self.snapshot_path = INDEX_SNAPSHOT_PATH if snapshot_path is None else snapshot_path
+        self.warm_start = None
+        self.embedding_model = None
+        self.version = 0
+        self._stamp = None
+        self._next_check = 0.0
+        self.rescore_candidates = int(rescore_candidates or DEFAULT_RESCORE_CANDIDATES)
+        # Full-precision vectors for rescoring quantized candidates; defaults to the stored blobs.
+        self._vector_loader = vector_loader or load_stored_vectors
+        self._lock = threading.RLock()
+        self._segments: dict[int, _Segment] = {}
+        self._ann: dict[int, tuple[_Segment, IVFIndex]] = {}
+        self._built = False
+
+    @property
+    def is_built(self) -> bool:
+        return self._built
+
+    @property
+    def quantized(self) -> bool:
+        return self.quantization == QUANTIZATION_INT8
+
+    def reset(self) -> None:
+        with self._lock:
+            self._segments = {}
+            self._ann = {}
+            self._built = False
+            self.version = 0
+            self._stamp = None
+            self._next_check = 0.0
+
+    def ensure_model(self, embedding_model: str) -> None:
+        # An embedding cut-over in another process replaces every vector, so rebuild on the next search.
+        if self.embedding_model == embedding_model:
+            return
+        with self._lock:
+            if self.embedding_model is not None and self.embedding_model != embedding_model:
+                self.reset()
+            self.embedding_model = embedding_model
+
+    def ensure_built(self) -> None:
+        if self.shared_path:
+            self._sync_shared()
+            return
+        if self._built:
+            return
+        with self._lock:
+            if not self._built:
+                self._segments = self._initial_segments()
+                self._built = True
+
+    def _load_segments(self) -> dict[int, _Segment]:
+        records = (
+            KnowledgeChunk.objects.live()
+            .order_by("id")
+            .values_list(*VECTOR_FIELDS)
+            .iterator(chunk_size=BUILD_BATCH_SIZE)
+        )
+        return _group_by_dimension(records, quantized=self.quantized)
+
+    def _initial_segments(self) -> dict[int, _Segment]:
+        segments = self._load_snapshot() if self.snapshot_path else None
+        return self._load_segments() if segments is None else segments
+
+    def _load_snapshot(self) -> dict[int, _Segment] | None:
+        try:
+            snapshot = read_snapshot(self.snapshot_path)
+        except (OSError, ValueError):
+            return None
+        if snapshot is None:
+            return None
+        # int8 codes cannot be widened back to float32, so that pairing rebuilds from the database.
+        if snapshot.quantization != self.quantization and snapshot.quantization != QUANTIZATION_NONE:
+            return None
+
+        segments = {}
+        for dimension, arrays in snapshot.segments.items():
+            segment = _Segment(**arrays)
+            if self.quantized and segment.scales is None:
+                codes, scales = quantize_rows(segment.matrix)
+                segment = _Segment(codes, segment.chunk_ids, segment.document_ids, scales)
+            segments[dimension] = segment
+
+        changed, removed = changed_since(snapshot)
+        records = list(
+            KnowledgeChunk.objects.live().filter(document_id__in=changed).order_by("id").values_list(*VECTOR_FIELDS)
+        )
+        segments = _append_records(
+            _drop_rows(segments, document_ids=changed | removed, chunk_ids=set()), records, quantized=self.quantized
+        )
+        self.warm_start = {
+            "snapshot_version": snapshot.version,
+            "snapshot_rows": snapshot.rows,
+            "replayed_documents": len(changed),
+            "replayed_rows": len(records),
+            "removed_documents": len(removed),
+        }
+        return segments
+
+    def _sync_shared(self) -> None:
+        now = time.monotonic()
+        if self._built and now < self._next_check:
+            return
+        with self._lock:
+            self._next_check = now + SHARED_INDEX_CHECK_SECONDS
+            if self._built and file_stamp(self.shared_path) == self._stamp:
+                return
+            mapped = read_index(self.shared_path)
+            if mapped is None:
+                mapped = self._publish(lambda segments: segments)
+            self._adopt(mapped)
+
+    def _adopt(self, mapped) -> None:
+        self._segments = {dimension: _Segment(**arrays) for dimension, arrays in mapped.segments.items()}
+        self.version = mapped.version
+        self._stamp = mapped.stamp
+        self._built = True
+
+    def _publish(self, change):
+        # Re-read under the lock so a change from another worker is never overwritten.
+        with publish_lock(self.shared_path):
+            mapped = read_index(self.shared_path)
+            if mapped is None:
+                segments, version = self._initial_segments(), 0
+            else:
+                segments = {dimension: _Segment(**arrays) for dimension, arrays in mapped.segments.items()}
+                version = mapped.version
+            write_index(self.shared_path, version + 1, change(segments))
+            return read_index(self.shared_path)
+
+    def _apply(self, change) -> None:
+        with self._lock:
+            if self.shared_path:
+                self._adopt(self._publish(change))
+                return
+            if not self._built:
+                return
+            self._segments = change(self._segments)
+
+    def publish(self) -> int:
+        """Rebuilds the shared index file from the database and returns its new version."""
+        with self._lock:
+            self._adopt(self._publish(lambda segments: self._load_segments()))
+            return self.version
+
+    def export_snapshot(self, path=None) -> dict:
+        """Writes the current database state to a snapshot file for warm starts."""
+        path = path or self.snapshot_path
+        # Read the version first: anything committed after this point is replayed on load.
+        version = corpus_version()
+        segments = self._load_segments()
+        write_snapshot(path, version, self.quantization, segments)
+        return {
+            "path": path,
+            "version": version,
+            "rows": sum(len(segment) for segment in segments.values()),
+            "bytes": os.path.getsize(path),
+        }
+
+    def size(self, dimension: int | None = None) -> int:
+        segments = self._segments
+        if dimension is not None:
+            segment = segments.get(int(dimension))
+            return len(segment) if segment is not None else 0
+        return sum(len(segment) for segment in segments.values())
+
+    def nbytes(self) -> int:
+        return sum(segment.nbytes for segment in self._segments.values())
+
+    def chunk_ids(self, dimension: int) -> np.ndarray:
+        segment = self._segments.get(int(dimension))
+        return segment.chunk_ids if segment is not None else np.zeros(0, dtype=np.int64)
+
+    def indexed(self, dimension: int, chunk_ids) -> np.ndarray:
+        """Mask over ``chunk_ids`` of those that have a vector in the segment of that dimension."""
+        return np.isin(np.asarray(chunk_ids, dtype=np.int64), self.chunk_ids(dimension))
+
+    def load_matrix(self, dimension: int, matrix: np.ndarray, chunk_ids, document_ids) -> None:
+        scales = None
+        if self.quantized:
+            matrix, scales = quantize_rows(matrix)
+        with self._lock:
+            segments = dict(self._segments)
+            segments[int(dimension)] = _Segment(
+                matrix=np.ascontiguousarray(matrix, dtype=np.int8 if self.quantized else np.float32),
+                chunk_ids=np.asarray(chunk_ids, dtype=np.int64),
+                document_ids=np.asarray(document_ids, dtype=np.int64),
+                scales=scales,
+            )
+            self._segments = segments
+            self._built = True
+
+    def resolve_mode(self, dimension: int, mode: str = MODE_EXACT, document_ids: np.ndarray | None = None) -> str:
+        """The mode search() takes; under a document filter only the rows it allows are counted."""
+        if mode != MODE_ANN:
+            return MODE_EXACT
+        segment = self._segments.get(int(dimension))
+        if segment is None:
+            return MODE_EXACT
+        rows = len(segment)
+        if document_ids is not None:
+            rows = int(np.count_nonzero(np.isin(segment.document_ids, document_ids)))
+        return MODE_ANN if rows >= ANN_MIN_ROWS else MODE_EXACT
+
+    def _ann_for(self, dimension: int, segment: _Segment) -> IVFIndex:
+        cached = self._ann.get(dimension)
+        if cached is not None and cached[0] is segment:
+            return cached[1]
+        with self._lock:
+            cached = self._ann.get(dimension)
+            if cached is not None and cached[0] is segment:
+                return cached[1]
+            if cached is None or cached[1].needs_retraining(len(segment)):
+                ivf = IVFIndex.build(segment.matrix)
+            else:
+                ivf = cached[1].reassigned(segment.matrix)
+            self._ann[dimension] = (segment, ivf)
+            return ivf
+
+    def search(
+        self,
+        query_vector,
+        limit: int,
+        mode: str = MODE_EXACT,
+        nprobe: int | None = None,
+        document_ids: np.ndarray | None = None,
+    ) -> list[tuple[int, float]]:
+        self.ensure_built()
+        query = _as_unit_vector(query_vector)
+        if query is None:
+            return []
+        dimension = int(query.shape[0])
+        segment = self._segments.get(dimension)
+        if segment is None or not len(segment):
+            return []
+
+        # A document filter becomes a row mask, so only the allowed rows are ever scored.
+        allowed = None
+        rows = len(segment)
+        if document_ids is not None:
+            allowed = np.isin(segment.document_ids, document_ids)
+            rows = int(np.count_nonzero(allowed))
+            if not rows:
+                return []
+
+        positions = None
+        if mode == MODE_ANN and rows >= ANN_MIN_ROWS:
+            positions = self._ann_for(dimension, segment).candidates(query, nprobe=nprobe or DEFAULT_NPROBE)
+            if allowed is not None:
+                positions = positions[allowed[positions]]
+        elif allowed is not None:
+            positions = np.flatnonzero(allowed)
+        chunk_ids = segment.chunk_ids if positions is None else segment.chunk_ids[positions]
+
+        if segment.scales is None:
+            scores = (segment.matrix if positions is None else segment.matrix[positions]) @ query
+            return [(int(chunk_ids[pos]), float(scores[pos])) for pos in top_k(scores, limit)]
+
+        scores = quantized_scores(segment.matrix, segment.scales, query, positions)
+        candidates = chunk_ids[top_k(scores, max(self.rescore_candidates, limit))]
+        return self._rescore(candidates, query, limit)
+
+    def _rescore(self, candidates: np.ndarray, query: np.ndarray, limit: int) -> list[tuple[int, float]]:
+        chunk_ids, vectors = self._vector_loader(candidates)
+        if not chunk_ids.shape[0] or vectors.shape[1] != query.shape[0]:
+            return []
+        scores = vectors @ query
+        return [(int(chunk_ids[pos]), float(scores[pos])) for pos in top_k(scores, limit)]
+
+    def remove_document(self, document_id: int) -> None:
+        self._apply(lambda segments: _drop_rows(segments, document_ids={int(document_id)}, chunk_ids=set()))
+
+    def refresh_document(self, document_id: int) -> None:
+        if not self.shared_path and not self._built:
+            return
+        records = list(
+            KnowledgeChunk.objects.live().filter(document_id=document_id).order_by("id").values_list(*VECTOR_FIELDS)
+        )
+        fresh_ids = {int(record[0]) for record in records}
+        self._apply(
+            lambda segments: _append_records(
+                _drop_rows(segments, document_ids={int(document_id)}, chunk_ids=fresh_ids),
+                records,
+                quantized=self.quantized,
+            )
+        )
+
+
+_vector_index = VectorIndex()
+
+
+def get_vector_index() -> VectorIndex:
+    return _vector_index
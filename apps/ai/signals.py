@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import KnowledgeDocument, KnowledgeRelation
+from .services.graph_index import bump_graph_version
+from .services.keyword_index import unindex_document
+from .services.minhash import index_document_signature
+from .services.retrieval import schedule_index_removal
+
+
+@receiver(pre_delete, sender=KnowledgeDocument)
+def drop_document_postings(sender, instance, **kwargs):
+    unindex_document(instance.id)
+
+
+@receiver(post_delete, sender=KnowledgeDocument)
+def drop_document_from_vector_index(sender, instance, **kwargs):
+    schedule_index_removal(instance.id)
+
+
+@receiver(post_save, sender=KnowledgeDocument)
+def refresh_document_signature(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and "content" not in update_fields):
+        return
+    index_document_signature(instance)
+
+
+@receiver(post_save, sender=KnowledgeRelation)
+@receiver(post_delete, sender=KnowledgeRelation)
+def invalidate_graph_adjacency(sender, raw=False, **kwargs):
+    if not raw:
+        bump_graph_version()
@@ -1,9 +1,54 @@
+import json
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
 from rest_framework.test import APIClient
 from unittest.mock import patch
 
-from apps.ai.models import AgentActionProposal, AgentPromptConfig, KnowledgeChunk, KnowledgeDocument, McpAdapter
+from apps.ai.models import (
+    AgentActionProposal,
+    AgentPromptConfig,
+    KnowledgeChunk,
+    KnowledgeCorpusStats,
+    KnowledgeDocument,
+    KnowledgeEmbeddingMigration,
+    KnowledgeEntity,
+    KnowledgeEntityPosting,
+    KnowledgeIngestJob,
+    KnowledgePosting,
+    KnowledgeRelation,
+    KnowledgeSourceFetch,
+    KnowledgeStagedEmbedding,
+    KnowledgeTermStat,
+    McpAdapter,
+)
+from apps.ai.services.embedding_client import EmbeddingClient, EmbeddingResult
+from apps.ai.services.embedding_migration import cut_over
+from apps.ai.services.graph_index import get_graph_adjacency, reset_graph_adjacency
+from apps.ai.services.keyword_index import bm25_scores
+from apps.ai.services.knowledge_ingest import ingest_knowledge_source
+from apps.ai.services.minhash import estimated_similarity, minhash_signature, signature_bytes
+from apps.ai.services.retrieval import (
+    DETERMINISTIC_EMBEDDING_MODEL,
+    OPENAI_EMBEDDING_MODEL,
+    deterministic_embedding,
+    deterministic_embedding_scalar,
+    embed_texts,
+    iter_words,
+    rebuild_document_chunks,
+    split_text_into_chunks,
+)
+from apps.ai.services.search_cache import LRUCache, clear_search_caches
+from apps.ai.services.quantization import QUANTIZATION_INT8, QUANTIZATION_NONE
+from apps.ai.services.vector_index import VectorIndex, get_vector_index
 from apps.tickets.models import Ticket
 
 
@@ -17,6 +62,9 @@ class AIApiTests(TestCase):
         )
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
+        get_vector_index().reset()
+        clear_search_caches()
+        reset_graph_adjacency()
 
     def test_agent_prompt_current_get_and_put(self):
         get_resp = self.client.get("/api/ai/agent_prompts/current/")
@@ -52,6 +100,84 @@ class AIApiTests(TestCase):
         document = KnowledgeDocument.objects.get(id=doc_id)
         self.assertGreater(KnowledgeChunk.objects.filter(document=document).count(), 0)
 
+    def test_ingest_stores_packed_embeddings(self):
+        resp = self.client.post(
+            "/api/ai/knowledge_documents/ingest/",
+            {"title": "Aftertreatment Notes", "content": "DPF regeneration soot load differential pressure."},
+            format="json",
+        )
+        chunk = KnowledgeChunk.objects.get(document_id=resp.data["id"])
+        self.assertEqual(chunk.embedding, [])
+        self.assertEqual(chunk.embedding_dtype, KnowledgeChunk.DTYPE_FLOAT32)
+        self.assertEqual(chunk.embedding_dimension, 128)
+        self.assertEqual(chunk.embedding_model, "deterministic-128")
+        self.assertEqual(len(bytes(chunk.embedding_vector)), 128 * 4)
+
+        detail = self.client.get(f"/api/ai/knowledge_chunks/{chunk.id}/")
+        self.assertEqual(len(detail.data["embedding"]), 128)
+        self.assertNotIn("embedding_vector", detail.data)
+
+    def test_chunk_crud_keeps_corpus_stats_in_step(self):
+        ingest = self.client.post(
+            "/api/ai/knowledge_documents/ingest/",
+            {"title": "Turbo Notes", "content": "Turbo actuator calibration and boost leak test."},
+            format="json",
+        )
+        document_id = ingest.data["id"]
+
+        def assert_stats_match_rows():
+            stats = KnowledgeCorpusStats.get_current()
+            self.assertEqual(stats.chunk_count, KnowledgeChunk.objects.count())
+            self.assertEqual(stats.total_tokens, sum(KnowledgeChunk.objects.values_list("token_count", flat=True)))
+
+        rattle = KnowledgeEntity.objects.create(name="rattle", entity_type="term")
+        created = self.client.post(
+            "/api/ai/knowledge_chunks/",
+            {"document": document_id, "chunk_index": 5, "content": "Wastegate rattle at idle.", "token_count": 4},
+            format="json",
+        )
+        self.assertEqual(created.status_code, 201)
+        assert_stats_match_rows()
+        self.assertTrue(KnowledgePosting.objects.filter(chunk_id=created.data["id"], term="wastegate").exists())
+        self.assertTrue(KnowledgeEntityPosting.objects.filter(chunk_id=created.data["id"], entity=rattle).exists())
+
+        updated = self.client.patch(
+            f"/api/ai/knowledge_chunks/{created.data['id']}/",
+            {"content": "Wastegate actuator rod seized.", "token_count": 9},
+            format="json",
+        )
+        self.assertEqual(updated.status_code, 200)
+        assert_stats_match_rows()
+        self.assertFalse(KnowledgePosting.objects.filter(chunk_id=created.data["id"], term="idle").exists())
+        self.assertFalse(KnowledgeEntityPosting.objects.filter(chunk_id=created.data["id"], entity=rattle).exists())
+
+        deleted = self.client.delete(f"/api/ai/knowledge_chunks/{created.data['id']}/")
+        self.assertEqual(deleted.status_code, 204)
+        assert_stats_match_rows()
+        remaining = KnowledgeChunk.objects.get(document_id=document_id)
+        self.assertTrue(KnowledgePosting.objects.filter(chunk=remaining, term="turbo").exists())
+
+    def test_chunk_embedding_must_be_a_list_of_numbers(self):
+        ingest = self.client.post(
+            "/api/ai/knowledge_documents/ingest/",
+            {"title": "Turbo Notes", "content": "Turbo actuator calibration and boost leak test."},
+            format="json",
+        )
+        chunk = KnowledgeChunk.objects.get(document_id=ingest.data["id"])
+        stored = bytes(chunk.embedding_vector)
+
+        for embedding in ({"x": 1.0}, "0.1,0.2", [0.1, "high"], [0.1, True]):
+            response = self.client.patch(f"/api/ai/knowledge_chunks/{chunk.id}/", {"embedding": embedding}, format="json")
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("embedding", response.data)
+        chunk.refresh_from_db()
+        self.assertEqual(bytes(chunk.embedding_vector), stored)
+
+        response = self.client.patch(f"/api/ai/knowledge_chunks/{chunk.id}/", {"embedding": [0, 1]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["embedding"], [0.0, 1.0])
+        self.assertEqual(response.data["embedding_dimension"], 2)
+
     def test_knowledge_search_returns_results(self):
         ingest = self.client.post(
             "/api/ai/knowledge_documents/ingest/",
@@ -68,6 +194,1119 @@ class AIApiTests(TestCase):
         self.assertIn("results", search.data)
         self.assertGreaterEqual(len(search.data["results"]), 1)
 
+    def test_dense_search_scores_keywords_only_for_its_hits(self):
+        for title, content in (
+            ("Fan Notes", "Fan clutch engagement temperature sensor."),
+            ("EGR Notes", "EGR valve position sensor fault code P0404."),
+            ("Brake Notes", "Brake pad wear indicator and rotor thickness."),
+        ):
+            self.client.post("/api/ai/knowledge_documents/ingest/", {"title": title, "content": content}, format="json")
+
+        with patch("apps.ai.services.retrieval.bm25_scores", wraps=bm25_scores) as scored:
+            full = self.client.get(
+                "/api/ai/knowledge_documents/search/", {"q": "sensor fault", "limit": 2, "collapse": "false"}
+            )
+        self.assertEqual(full.data["mode"], "embedding")
+        self.assertEqual(len(full.data["results"]), 2)
+        self.assertEqual(scored.call_args.kwargs["chunk_ids"], [row["chunk_id"] for row in full.data["results"]])
+
+        # A chunk with no vector of the query's dimension still surfaces through its keywords.
+        unembedded = KnowledgeChunk.objects.get(document__title="EGR Notes")
+        KnowledgeChunk.objects.filter(pk=unembedded.pk).update(embedding_vector=b"", embedding_dimension=0)
+        get_vector_index().reset()
+        clear_search_caches()
+        with patch("apps.ai.services.retrieval.bm25_scores", wraps=bm25_scores) as scored:
+            padded = self.client.get("/api/ai/knowledge_documents/search/", {"q": "P0404", "limit": 5})
+        self.assertNotIn("chunk_ids", scored.call_args.kwargs)
+        rows = {row["chunk_id"]: row for row in padded.data["results"]}
+        self.assertIsNone(rows[unembedded.id]["cosine_similarity"])
+        self.assertGreater(rows[unembedded.id]["keyword_score"], 0)
+
+    def test_vector_index_tracks_ingest_and_delete(self):
+        self.client.post(
+            "/api/ai/knowledge_documents/ingest/",
+            {"title": "Turbo Notes", "content": "Turbocharger wastegate actuator calibration steps."},
+            format="json",
+        )
+        first = self.client.get("/api/ai/knowledge_documents/search/", {"q": "wastegate actuator"})
+        self.assertEqual(first.data["mode"], "embedding")
+        index = get_vector_index()
+        self.assertTrue(index.is_built)
+        baseline = index.size()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest = self.client.post(
+                "/api/ai/knowledge_documents/ingest/",
+                {"title": "Coolant Notes", "content": "Coolant thermostat housing leak inspection."},
+                format="json",
+            )
+        self.assertGreater(index.size(), baseline)
+        search = self.client.get("/api/ai/knowledge_documents/search/", {"q": "coolant thermostat", "limit": 1})
+        self.assertEqual(search.data["results"][0]["document_id"], ingest.data["id"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/ai/knowledge_documents/{ingest.data['id']}/")
+        self.assertEqual(index.size(), baseline)
+
+    def test_keyword_postings_follow_rechunk_and_delete(self):
+        resp = self.client.post(
+            "/api/ai/knowledge_documents/ingest/",
+            {
+                "title": "Starter Notes",
+                "content": "starter relay starter solenoid crank circuit voltage drop",
+                "chunk_size": 4,
+                "overlap": 0,
+            },
+            format="json",
+        )
+        doc_id = resp.data["id"]
+        self.assertEqual(KnowledgeTermStat.objects.get(term="starter").document_frequency, 1)
+        self.assertEqual(KnowledgePosting.objects.get(term="starter").term_frequency, 2)
+        self.assertEqual(KnowledgeCorpusStats.get_current().chunk_count, 2)
+
+        scores = bm25_scores(["voltage", "drop"])
+        self.assertEqual(len(scores), 1)
+        voltage_chunk = KnowledgeChunk.objects.get(document_id=doc_id, chunk_index=1)
+        self.assertIn(voltage_chunk.id, scores)
+
+        self.client.post(f"/api/ai/knowledge_documents/{doc_id}/rechunk/", {"chunk_size": 20}, format="json")
+        self.assertEqual(KnowledgeCorpusStats.get_current().chunk_count, 1)
+        self.assertEqual(KnowledgeTermStat.objects.get(term="voltage").document_frequency, 1)
+
+        self.client.delete(f"/api/ai/knowledge_documents/{doc_id}/")
+        self.assertFalse(KnowledgePosting.objects.exists())
+        self.assertFalse(KnowledgeTermStat.objects.exists())
+        self.assertEqual(KnowledgeCorpusStats.get_current().total_tokens, 0)
+
+    @patch("apps.ai.services.retrieval._embed_with_openai")
+    def test_reingest_reuses_cached_embeddings(self, mocked_embed):
+        mocked_embed.side_effect = lambda texts, model: EmbeddingResult(vectors=[[1.0, float(len(text))] for text in texts])
+        payload = {"title": "Brake Notes", "content": "air brake compressor governor cut-out pressure"}
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            resp = self.client.post("/api/ai/knowledge_documents/ingest/", payload, format="json")
+            self.assertEqual(resp.data["chunking"]["embedding_source"], "openai")
+            self.assertEqual(resp.data["chunking"]["embedding_cache"], {"hits": 0, "misses": 1})
+
+            again = self.client.post("/api/ai/knowledge_documents/ingest/", payload, format="json")
+        self.assertEqual(again.data["chunking"]["embedding_cache"], {"hits": 1, "misses": 0})
+        self.assertEqual(mocked_embed.call_count, 1)
+        chunk = KnowledgeChunk.objects.get(document_id=again.data["id"])
+        self.assertEqual(chunk.embedding_dimension, 2)
+
+    def test_rechunk_diffs_chunks_by_content_hash(self):
+        words = [f"w{i}" for i in range(40)]
+        resp = self.client.post(
+            "/api/ai/knowledge_documents/ingest/",
+            {"title": "Torque Specs", "content": " ".join(words), "chunk_size": 10, "overlap": 0},
+            format="json",
+        )
+        doc_id = resp.data["id"]
+        original = dict(KnowledgeChunk.objects.filter(document_id=doc_id).values_list("content", "id"))
+        self.assertEqual(len(original), 4)
+
+        unchanged = self.client.post(
+            f"/api/ai/knowledge_documents/{doc_id}/rechunk/", {"chunk_size": 10, "overlap": 0}, format="json"
+        )
+        self.assertEqual(
+            [unchanged.data["chunking"][key] for key in ("created_chunks", "updated_chunks", "unchanged_chunks", "deleted_chunks")],
+            [0, 0, 4, 0],
+        )
+
+        # Drop the first window and append a new one: three chunks shift down, one is new, one goes away.
+        get_vector_index().ensure_built()
+        document = KnowledgeDocument.objects.get(pk=doc_id)
+        document.content = " ".join(words[10:] + [f"x{i}" for i in range(10)])
+        document.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            edited = self.client.post(
+                f"/api/ai/knowledge_documents/{doc_id}/rechunk/", {"chunk_size": 10, "overlap": 0}, format="json"
+            )
+        self.assertEqual(
+            [edited.data["chunking"][key] for key in ("created_chunks", "updated_chunks", "unchanged_chunks", "deleted_chunks")],
+            [1, 3, 0, 1],
+        )
+        chunks = list(KnowledgeChunk.objects.filter(document_id=doc_id).order_by("chunk_index"))
+        self.assertEqual([chunk.chunk_index for chunk in chunks], [0, 1, 2, 3])
+        self.assertEqual([chunk.id for chunk in chunks[:3]], [original[chunk.content] for chunk in chunks[:3]])
+        self.assertEqual(chunks[3].content, " ".join(f"x{i}" for i in range(10)))
+        self.assertEqual(KnowledgeCorpusStats.get_current().chunk_count, 4)
+        self.assertEqual(KnowledgePosting.objects.filter(term="w0").count(), 0)
+        self.assertEqual(get_vector_index().size(), 4)
+
+    def test_rechunk_reembeds_chunks_from_another_model(self):
+        resp = self.client.post(
+            "/api/ai/knowledge_documents/ingest/",
+            {"title": "Torque Specs", "content": " ".join(f"w{i}" for i in range(30)), "chunk_size": 10, "overlap": 0},
+            format="json",
+        )
+        doc_id = resp.data["id"]
+        chunks = list(KnowledgeChunk.objects.filter(document_id=doc_id).order_by("chunk_index"))
+        self.assertEqual({chunk.embedding_model for chunk in chunks}, {DETERMINISTIC_EMBEDDING_MODEL})
+        KnowledgeChunk.objects.filter(pk=chunks[1].pk).update(embedding_model="text-embedding-ada-002")
+
+        rechunked = self.client.post(
+            f"/api/ai/knowledge_documents/{doc_id}/rechunk/", {"chunk_size": 10, "overlap": 0}, format="json"
+        )
+        self.assertEqual(
+            [rechunked.data["chunking"][key] for key in ("created_chunks", "unchanged_chunks", "deleted_chunks")],
+            [1, 2, 1],
+        )
+        refreshed = list(KnowledgeChunk.objects.filter(document_id=doc_id).order_by("chunk_index"))
+        self.assertEqual([chunk.content for chunk in refreshed], [chunk.content for chunk in chunks])
+        self.assertNotEqual(refreshed[1].pk, chunks[1].pk)
+        self.assertEqual(refreshed[1].embedding_model, DETERMINISTIC_EMBEDDING_MODEL)
+        self.assertEqual(KnowledgeCorpusStats.get_current().chunk_count, 3)
+
+    @patch("apps.ai.services.retrieval.CHUNK_WRITE_BATCH_SIZE", 2)
+    def test_rechunk_embeds_outside_the_write_transaction_and_discards_staged_rows_on_failure(self):
+        resp = self.client.post(
+            "/api/ai/knowledge_documents/ingest/",
+            {"title": "Torque Specs", "content": " ".join(f"w{i}" for i in range(40)), "chunk_size": 10, "overlap": 0},
+            format="json",
+        )
+        document = KnowledgeDocument.objects.get(pk=resp.data["id"])
+        original = list(KnowledgeChunk.objects.filter(document=document).values_list("id", "chunk_index"))
+        stats = KnowledgeCorpusStats.get_current()
+
+        baseline = len(connection.atomic_blocks)
+        depths = []
+
+        def recording_embed(texts, model):
+            depths.append(len(connection.atomic_blocks) - baseline)
+            return embed_texts(texts, model)
+
+        def failing_source():
+            yield " ".join(f"x{i}" for i in range(50))
+            raise OSError("connection reset")
+
+        with patch("apps.ai.services.retrieval.embed_texts", side_effect=recording_embed):
+            with self.assertRaises(OSError):
+                rebuild_document_chunks(document, chunk_size=10, overlap=0, source=failing_source())
+        self.assertEqual(depths, [0, 0])
+        self.assertEqual(
+            list(KnowledgeChunk.objects.filter(document=document).values_list("id", "chunk_index")), original
+        )
+        refreshed = KnowledgeCorpusStats.get_current()
+        self.assertEqual((refreshed.chunk_count, refreshed.total_tokens), (stats.chunk_count, stats.total_tokens))
+
+    def test_iter_words_yields_before_a_piece_is_exhausted(self):
+        words = iter_words(iter(["alpha beta gam", "ma delta"]))
+        self.assertEqual(next(words), "alpha")
+        self.assertEqual(list(words), ["beta", "gamma", "delta"])
+
+    def test_ingest_detects_near_duplicates_and_search_collapses_them(self):
+        words = [f"step{i}" for i in range(100)]
+        bulletin = "Coolant bulletin " + " ".join(words)
+        original = self.client.post("/api/ai/knowledge_documents/ingest/", {"content": bulletin}, format="json")
+        self.assertEqual(original.status_code, 201)
+        self.assertNotIn("duplicate", original.data["chunking"])
+
+        pasted = bulletin.replace("step50", "stepfifty")
+        linked = self.client.post("/api/ai/knowledge_documents/ingest/", {"content": pasted}, format="json")
+        self.assertEqual(linked.status_code, 201)
+        self.assertEqual(linked.data["chunking"]["duplicate"]["document_id"], original.data["id"])
+        self.assertEqual(linked.data["document"]["metadata"]["duplicate_of"], original.data["id"])
+
+        skipped = self.client.post(
+            "/api/ai/knowledge_documents/ingest/", {"content": pasted, "on_duplicate": "skip"}, format="json"
+        )
+        self.assertEqual(skipped.status_code, 200)
+        self.assertEqual(skipped.data["chunking"]["duplicate"]["action"], "skipped")
+        merged = self.client.post(
+            "/api/ai/knowledge_documents/ingest/",
+            {"content": pasted, "title": "Chat paste", "on_duplicate": "merge", "metadata": {"channel": "chat"}},
+            format="json",
+        )
+        self.assertEqual(merged.data["chunking"]["duplicate"]["action"], "merged")
+        merged_document = KnowledgeDocument.objects.get(pk=merged.data["id"])
+        self.assertEqual(merged_document.metadata["merged_sources"][0]["title"], "Chat paste")
+        self.assertEqual(merged_document.metadata["channel"], "chat")
+        self.assertEqual(KnowledgeDocument.objects.count(), 2)
+
+        unrelated = self.client.post(
+            "/api/ai/knowledge_documents/ingest/",
+            {"content": "Coolant bulletin " + " ".join(reversed(words)), "on_duplicate": "skip"},
+            format="json",
+        )
+        self.assertEqual(unrelated.status_code, 201)
+
+        search = self.client.get("/api/ai/knowledge_documents/search/", {"q": "coolant bulletin step50", "limit": 5})
+        self.assertEqual(search.data["collapsed"], 1)
+        self.assertEqual(len(search.data["results"]), 2)
+        collapsed = [row for row in search.data["results"] if row.get("collapsed_chunk_ids")]
+        self.assertEqual(len(collapsed), 1)
+        everything = self.client.get(
+            "/api/ai/knowledge_documents/search/", {"q": "coolant bulletin step50", "limit": 5, "collapse": "false"}
+        )
+        self.assertEqual(len(everything.data["results"]), 3)
+
+    @patch("apps.ai.services.ingest_jobs.INGEST_WORKERS", 0)
+    def test_bulk_ingest_runs_job_with_per_item_status(self):
+        items = [
+            {"title": "Coolant", "content": "coolant reservoir level check"},
+            {"title": "Wipers", "content": "wiper blade replacement interval"},
+            {"title": "Lights", "content": "marker lamp circuit fuse"},
+        ]
+        def flaky_ingest(data, user=None):
+            if data["title"] == "Wipers":
+                raise RuntimeError("source unavailable")
+            return ingest_knowledge_source(data, user=user)
+
+        with patch("apps.ai.services.ingest_jobs.ingest_knowledge_source", side_effect=flaky_ingest):
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = self.client.post(
+                    "/api/ai/knowledge_documents/bulk_ingest/", {"items": items, "chunk_size": 3}, format="json"
+                )
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.data["total_items"], 3)
+
+        job = self.client.get(f"/api/ai/knowledge_ingest_jobs/{resp.data['id']}/")
+        self.assertEqual(job.status_code, 200)
+        self.assertEqual(job.data["status"], KnowledgeIngestJob.STATUS_COMPLETED)
+        self.assertEqual((job.data["succeeded_items"], job.data["failed_items"]), (2, 1))
+        self.assertNotIn("items", job.data)
+        self.assertEqual(job.data["created_chunks"], KnowledgeChunk.objects.count())
+        self.assertIn("items_per_second", job.data["throughput"])
+
+        items = self.client.get(f"/api/ai/knowledge_ingest_jobs/{resp.data['id']}/items/")
+        self.assertEqual(items.data["count"], 3)
+        self.assertEqual([item["status"] for item in items.data["results"]], ["succeeded", "failed", "succeeded"])
+        self.assertIn("source unavailable", items.data["results"][1]["error"])
+        self.assertEqual(items.data["results"][0]["chunking"]["chunk_size"], 3)
+        page = self.client.get(f"/api/ai/knowledge_ingest_jobs/{resp.data['id']}/items/", {"limit": 1, "offset": 2})
+        self.assertEqual([item["source"] for item in page.data["results"]], ["Lights"])
+        failed = self.client.get(f"/api/ai/knowledge_ingest_jobs/{resp.data['id']}/items/", {"status": "failed"})
+        self.assertEqual([item["position"] for item in failed.data["results"]], [1])
+
+        listed = self.client.get("/api/ai/knowledge_ingest_jobs/", {"limit": 10})
+        self.assertEqual(listed.data["count"], 1)
+        self.assertNotIn("items", listed.data["results"][0])
+
+    @patch("apps.ai.services.ingest_jobs.INGEST_WORKERS", 0)
+    def test_failed_ingest_item_leaves_no_partial_document(self):
+        with patch("apps.ai.services.retrieval.embed_texts", side_effect=OSError("embedding service down")):
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = self.client.post(
+                    "/api/ai/knowledge_documents/bulk_ingest/",
+                    [{"title": "Brakes", "content": "brake pad wear sensor"}],
+                    format="json",
+                )
+        job = KnowledgeIngestJob.objects.get(pk=resp.data["id"])
+        self.assertEqual((job.status, job.failed_items), (KnowledgeIngestJob.STATUS_FAILED, 1))
+        self.assertFalse(KnowledgeDocument.objects.filter(title="Brakes").exists())
+        self.assertEqual(KnowledgeCorpusStats.get_current().chunk_count, 0)
+
+    @patch("apps.ai.services.ingest_jobs.INGEST_WORKERS", 0)
+    def test_bulk_ingest_accepts_jsonl_upload(self):
+        lines = b'{"title": "Tires", "content": "tread depth gauge"}\n\n{"content": "lug nut torque"}\n'
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(
+                "/api/ai/knowledge_documents/bulk_ingest/",
+                {"file": SimpleUploadedFile("docs.jsonl", lines, content_type="application/jsonl")},
+                format="multipart",
+            )
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(KnowledgeIngestJob.objects.get(pk=resp.data["id"]).succeeded_items, 2)
+
+        invalid = self.client.post(
+            "/api/ai/knowledge_documents/bulk_ingest/",
+            data=b'{"content": "ok"}\n{"title": "no source"}\nnot json\n',
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(invalid.status_code, 400)
+        self.assertIn("line 3", invalid.data["error"])
+
+        missing_source = self.client.post(
+            "/api/ai/knowledge_documents/bulk_ingest/", [{"content": "ok"}, {"title": "no source"}], format="json"
+        )
+        self.assertEqual(missing_source.status_code, 400)
+        self.assertEqual([item["position"] for item in missing_source.data["items"]], [1])
+        self.assertEqual(KnowledgeIngestJob.objects.count(), 1)
+
+    @patch("apps.ai.services.vector_index.ANN_MIN_ROWS", 1)
+    def test_knowledge_search_ann_mode(self):
+        for title, content in (
+            ("Fan Notes", "Fan clutch engagement temperature sensor."),
+            ("EGR Notes", "EGR valve position sensor fault code."),
+        ):
+            self.client.post("/api/ai/knowledge_documents/ingest/", {"title": title, "content": content}, format="json")
+
+        search = self.client.get("/api/ai/knowledge_documents/search/", {"q": "EGR valve", "mode": "ann", "limit": 1})
+        self.assertEqual(search.status_code, 200)
+        self.assertEqual(search.data["vector_index"], "ann")
+        self.assertEqual(search.data["results"][0]["document_title"], "EGR Notes")
+
+        # A filter that leaves one row is scanned exactly, and the response says so.
+        egr = KnowledgeDocument.objects.get(title="EGR Notes")
+        with patch("apps.ai.services.vector_index.ANN_MIN_ROWS", 2):
+            scoped = self.client.get(
+                "/api/ai/knowledge_documents/search/", {"q": "EGR valve", "mode": "ann", "document_ids": f"{egr.id}"}
+            )
+        self.assertEqual(scoped.data["vector_index"], "exact")
+
+        invalid = self.client.get("/api/ai/knowledge_documents/search/", {"q": "EGR valve", "mode": "fuzzy"})
+        self.assertEqual(invalid.status_code, 400)
+
+    def test_document_update_invalidates_cached_search_results(self):
+        ingest = self.client.post(
+            "/api/ai/knowledge_documents/ingest/",
+            {"title": "Fan Notes", "content": "Fan clutch engagement temperature sensor."},
+            format="json",
+        )
+        params = {"q": "fan clutch", "source_type": "manual"}
+        before = self.client.get("/api/ai/knowledge_documents/search/", params)
+        self.assertEqual(before.data["results"], [])
+
+        self.client.patch(f"/api/ai/knowledge_documents/{ingest.data['id']}/", {"source_type": "manual"}, format="json")
+        after = self.client.get("/api/ai/knowledge_documents/search/", params)
+        self.assertFalse(after.data["cache"]["results"]["hit"])
+        self.assertEqual([row["document_title"] for row in after.data["results"]], ["Fan Notes"])
+
+    def test_int8_index_rescores_with_stored_vectors(self):
+        for title, content in (
+            ("Fan Notes", "Fan clutch engagement temperature sensor."),
+            ("EGR Notes", "EGR valve position sensor fault code."),
+            ("Brake Notes", "Brake pad wear indicator and rotor thickness."),
+        ):
+            self.client.post("/api/ai/knowledge_documents/ingest/", {"title": title, "content": content}, format="json")
+        query = embed_texts(["EGR valve sensor"]).vectors[0]
+
+        exact = VectorIndex(quantization=QUANTIZATION_NONE)
+        quantized = VectorIndex(quantization=QUANTIZATION_INT8, rescore_candidates=2)
+        exact.ensure_built()
+        quantized.ensure_built()
+        self.assertEqual(quantized.size(), 3)
+        self.assertLess(quantized.nbytes(), exact.nbytes())
+
+        expected = exact.search(query, 2)
+        found = quantized.search(query, 2)
+        self.assertEqual([chunk_id for chunk_id, _ in found], [chunk_id for chunk_id, _ in expected])
+        for (_, full_score), (_, rescored) in zip(expected, found):
+            self.assertAlmostEqual(full_score, rescored, places=5)
+
+    @patch("apps.ai.services.vector_index.SHARED_INDEX_CHECK_SECONDS", 0)
+    def test_shared_index_file_is_mapped_and_remapped(self):
+        ingest = self.client.post(
+            "/api/ai/knowledge_documents/ingest/",
+            {"title": "Fan Notes", "content": "Fan clutch engagement temperature sensor."},
+            format="json",
+        )
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), "vectors.idx")
+        writer = VectorIndex(quantization=QUANTIZATION_NONE, shared_path=path)
+        reader = VectorIndex(quantization=QUANTIZATION_NONE, shared_path=path)
+        self.assertEqual(writer.publish(), 1)
+        reader.ensure_built()
+        self.assertEqual((reader.version, reader.size()), (1, 1))
+        matrix = reader._segments[128].matrix
+        self.assertFalse(matrix.flags.writeable)
+        self.assertFalse(matrix.flags.owndata)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.client.post(
+                "/api/ai/knowledge_documents/ingest/",
+                {"title": "EGR Notes", "content": "EGR valve position sensor fault code."},
+                format="json",
+            )
+        writer.refresh_document(second.data["id"])
+        query = embed_texts(["EGR valve"]).vectors[0]
+        egr_chunk = KnowledgeChunk.objects.get(document_id=second.data["id"])
+        self.assertEqual(reader.search(query, 1)[0][0], egr_chunk.id)
+        self.assertEqual((reader.version, reader.size()), (2, 2))
+
+        writer.remove_document(ingest.data["id"])
+        reader.ensure_built()
+        self.assertEqual((reader.version, reader.size()), (3, 1))
+
+    def test_index_snapshot_warm_start_replays_later_changes(self):
+        ids = {}
+        for title, content in (
+            ("Fan Notes", "Fan clutch engagement temperature sensor."),
+            ("EGR Notes", "EGR valve position sensor fault code P0404."),
+            ("Brake Notes", "Brake pad wear indicator and rotor thickness."),
+        ):
+            response = self.client.post(
+                "/api/ai/knowledge_documents/ingest/", {"title": title, "content": content}, format="json"
+            )
+            ids[title] = response.data["id"]
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), "index.snapshot")
+        out = StringIO()
+        call_command("export_index_snapshot", path=path, quantization=QUANTIZATION_NONE, stdout=out)
+        snapshot_version = KnowledgeCorpusStats.get_current().version
+        self.assertIn(f"version={snapshot_version} rows=3", out.getvalue())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            turbo = self.client.post(
+                "/api/ai/knowledge_documents/ingest/",
+                {"title": "Turbo Notes", "content": "Turbocharger wastegate actuator boost pressure."},
+                format="json",
+            )
+            self.client.delete(f"/api/ai/knowledge_documents/{ids['Brake Notes']}/")
+        self.assertGreater(KnowledgeDocument.objects.get(pk=turbo.data["id"]).index_version, snapshot_version)
+
+        index = VectorIndex(quantization=QUANTIZATION_NONE, shared_path="", snapshot_path=path)
+        index.ensure_built()
+        self.assertEqual(
+            index.warm_start,
+            {
+                "snapshot_version": snapshot_version,
+                "snapshot_rows": 3,
+                "replayed_documents": 1,
+                "replayed_rows": 1,
+                "removed_documents": 1,
+            },
+        )
+        self.assertEqual(index.size(), 3)
+        turbo_chunk = KnowledgeChunk.objects.get(document_id=turbo.data["id"])
+        self.assertEqual(index.search(embed_texts(["wastegate boost"]).vectors[0], 1)[0][0], turbo_chunk.id)
+
+        quantized = VectorIndex(quantization=QUANTIZATION_INT8, shared_path="", snapshot_path=path)
+        quantized.ensure_built()
+        self.assertEqual((quantized.size(), quantized._segments[128].matrix.dtype.name), (3, "int8"))
+
+        postings = sorted(KnowledgePosting.objects.values_list("term", "chunk_id", "term_frequency"))
+        term_stats = sorted(KnowledgeTermStat.objects.values_list("term", "document_frequency"))
+        KnowledgePosting.objects.all().delete()
+        KnowledgeTermStat.objects.all().delete()
+        # Left behind by a rebuild that crashed before moving its rows into place.
+        KnowledgeChunk.objects.create(
+            document_id=ids["Fan Notes"],
+            chunk_index=KnowledgeChunk.PARKED_INDEX_OFFSET,
+            content="Fan shroud clearance check.",
+            token_count=6,
+        )
+        out = StringIO()
+        call_command("load_index_snapshot", path=path, restore_postings=True, stdout=out)
+        self.assertIn("changed_documents=1", out.getvalue())
+        self.assertIn("replayed_rows=1", out.getvalue())
+        self.assertEqual(sorted(KnowledgePosting.objects.values_list("term", "chunk_id", "term_frequency")), postings)
+        self.assertEqual(sorted(KnowledgeTermStat.objects.values_list("term", "document_frequency")), term_stats)
+        stats = KnowledgeCorpusStats.get_current()
+        self.assertEqual(stats.chunk_count, KnowledgeChunk.objects.live().count())
+        self.assertEqual(
+            stats.total_tokens, sum(KnowledgeChunk.objects.live().values_list("token_count", flat=True))
+        )
+
+    @patch("apps.ai.services.retrieval._embed_with_openai")
+    def test_embedding_migration_stages_vectors_and_cuts_over(self, mocked_embed):
+        topics = ("coolant", "brake", "turbo")
+        mocked_embed.side_effect = lambda texts, model: EmbeddingResult(
+            vectors=[[1.0 if topic in text.lower() else 0.0 for topic in topics] for text in texts]
+        )
+        for title, content in (
+            ("Coolant Notes", "Coolant thermostat housing leak inspection."),
+            ("Brake Notes", "Brake pad wear indicator and rotor thickness."),
+            ("Turbo Notes", "Turbo wastegate actuator boost pressure."),
+        ):
+            self.client.post("/api/ai/knowledge_documents/ingest/", {"title": title, "content": content}, format="json")
+        first_ids = list(KnowledgeDocument.objects.order_by("id").values_list("id", flat=True))
+
+        out = StringIO()
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            call_command("migrate_embeddings", model="stand-in-large", workers=1, max_documents=2, stdout=out)
+        self.assertIn(f"status=running documents=2 chunks=2 checkpoint={first_ids[1]}", out.getvalue())
+        self.assertEqual(set(KnowledgeChunk.objects.values_list("embedding_dimension", flat=True)), {128})
+
+        # Written mid-migration with the still-active model; the cut-over embeds it for the new one.
+        late = self.client.post(
+            "/api/ai/knowledge_documents/ingest/",
+            {"title": "Coolant Pump", "content": "Coolant pump impeller and seal replacement."},
+            format="json",
+        )
+        search = self.client.get("/api/ai/knowledge_documents/search/", {"q": "coolant", "limit": 1})
+        self.assertEqual(search.data["embedding_source"], "deterministic")
+        # Edited after it was staged, so its staged vector is stale and the cut-over re-stages it.
+        edited = KnowledgeChunk.objects.get(document_id=first_ids[0])
+        self.client.patch(
+            f"/api/ai/knowledge_chunks/{edited.id}/", {"content": "Turbo intercooler hose."}, format="json"
+        )
+        # A rebuild running during the cut-over must neither be staged nor hold the cut-over back.
+        parked = KnowledgeChunk.objects.create(
+            document_id=late.data["id"],
+            chunk_index=KnowledgeChunk.PARKED_INDEX_OFFSET,
+            content="Coolant pump bearing noise.",
+        )
+
+        with patch("apps.ai.services.embedding_migration.CUTOVER_CATCH_UP_PASSES", 0):
+            with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}), self.assertRaises(CommandError):
+                call_command("migrate_embeddings", model="stand-in-large", workers=1, cut_over=True, stdout=StringIO())
+        self.assertEqual(KnowledgeCorpusStats.get_current().embedding_model, "")
+
+        out = StringIO()
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}), self.captureOnCommitCallbacks(execute=True):
+            call_command("migrate_embeddings", model="stand-in-large", workers=1, cut_over=True, stdout=out)
+        self.assertIn("status=ready documents=4 chunks=4", out.getvalue())
+        self.assertIn("swapped_chunks=4 caught_up_chunks=1", out.getvalue())
+        self.assertEqual(self.client.get(f"/api/ai/knowledge_chunks/{edited.id}/").data["embedding"], [0.0, 0.0, 1.0])
+        parked.refresh_from_db()
+        self.assertEqual(parked.embedding_model, "")
+        parked.delete()
+        self.assertEqual(KnowledgeCorpusStats.get_current().embedding_model, "stand-in-large")
+        self.assertEqual(set(KnowledgeChunk.objects.values_list("embedding_model", flat=True)), {"stand-in-large"})
+        self.assertEqual(set(KnowledgeChunk.objects.values_list("embedding_dimension", flat=True)), {3})
+
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            search = self.client.get("/api/ai/knowledge_documents/search/", {"q": "brake", "limit": 1})
+        self.assertEqual(search.data["results"][0]["document_title"], "Brake Notes")
+        self.assertAlmostEqual(search.data["results"][0]["cosine_similarity"], 1.0, places=5)
+        self.assertGreater(KnowledgeDocument.objects.get(pk=late.data["id"]).index_version, 0)
+
+        out = StringIO()
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            call_command("migrate_embeddings", chunk_size=3, overlap=0, workers=1, stdout=out)
+        self.assertIn("status=completed documents=4", out.getvalue())
+        self.assertEqual(KnowledgeChunk.objects.filter(document_id=late.data["id"]).count(), 2)
+        self.assertEqual(set(KnowledgeChunk.objects.values_list("embedding_model", flat=True)), {"stand-in-large"})
+
+    @patch("apps.ai.services.retrieval._embed_with_openai")
+    def test_embedding_migration_never_cuts_over_to_fallback_vectors(self, mocked_embed):
+        mocked_embed.side_effect = lambda texts, model: EmbeddingResult(vectors=[None] * len(texts), failed_batches=1)
+        for title, content in (
+            ("Coolant Notes", "Coolant thermostat housing leak inspection."),
+            ("Brake Notes", "Brake pad wear indicator and rotor thickness."),
+        ):
+            self.client.post("/api/ai/knowledge_documents/ingest/", {"title": title, "content": content}, format="json")
+
+        out = StringIO()
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            call_command("migrate_embeddings", model="stand-in-large", workers=1, stdout=out)
+        self.assertIn("status=ready documents=2 chunks=0", out.getvalue())
+        self.assertFalse(KnowledgeStagedEmbedding.objects.exists())
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            with self.assertRaisesMessage(CommandError, "migration_not_caught_up:2"):
+                call_command("migrate_embeddings", model="stand-in-large", workers=1, cut_over=True, stdout=out)
+        self.assertEqual(KnowledgeCorpusStats.get_current().embedding_model, "")
+
+        # A fallback vector staged before the filter existed blocks the flip until it is re-embedded.
+        migration = KnowledgeEmbeddingMigration.objects.get(model_tag="stand-in-large")
+        chunk = KnowledgeChunk.objects.order_by("id").first()
+        KnowledgeStagedEmbedding.objects.create(
+            migration=migration,
+            chunk=chunk,
+            content_hash=chunk.content_hash,
+            embedding_vector=chunk.embedding_vector,
+            embedding_dtype=chunk.embedding_dtype,
+            embedding_dimension=chunk.embedding_dimension,
+            embedding_model=DETERMINISTIC_EMBEDDING_MODEL,
+        )
+        with patch("apps.ai.services.embedding_migration.CUTOVER_CATCH_UP_PASSES", 0):
+            with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+                with self.assertRaisesMessage(ValueError, "migration_foreign_vectors:1"):
+                    cut_over(migration)
+
+        mocked_embed.side_effect = lambda texts, model: EmbeddingResult(vectors=[[1.0, 0.0] for _ in texts])
+        out = StringIO()
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}), self.captureOnCommitCallbacks(execute=True):
+            call_command("migrate_embeddings", model="stand-in-large", workers=1, cut_over=True, stdout=out)
+        self.assertIn("swapped_chunks=2 caught_up_chunks=2", out.getvalue())
+        self.assertEqual(set(KnowledgeChunk.objects.values_list("embedding_model", flat=True)), {"stand-in-large"})
+        self.assertEqual(KnowledgeCorpusStats.get_current().embedding_model, "stand-in-large")
+
+    def test_knowledge_graph_bulk_upserts_entities_and_relation_weights(self):
+        single = self.client.post(
+            "/api/ai/knowledge_graph/ingest/", {"content": "Coolant thermostat housing leak"}, format="json"
+        )
+        self.assertEqual(single.status_code, 201)
+        self.assertEqual((single.data["entities_upserted"], single.data["relations_upserted"]), (4, 3))
+
+        invalid = self.client.post(
+            "/api/ai/knowledge_graph/bulk/",
+            {"notes": [{"content": "Coolant thermostat gasket"}, {"text": "  "}]},
+            format="json",
+        )
+        self.assertEqual(invalid.status_code, 400)
+        self.assertEqual(invalid.data["notes"], [{"position": 1, "error": "content is required."}])
+
+        bulk = self.client.post(
+            "/api/ai/knowledge_graph/bulk/",
+            {"notes": [{"content": "Coolant thermostat gasket"}, {"text": "Coolant thermostat housing crack"}]},
+            format="json",
+        )
+        self.assertEqual(bulk.status_code, 201)
+        self.assertEqual(len(bulk.data["document_ids"]), 2)
+        self.assertEqual(
+            (bulk.data["entities_upserted"], bulk.data["relations_upserted"], bulk.data["relations_created"]),
+            (5, 5, 2),
+        )
+
+        weights = {
+            (source, target): weight
+            for source, target, weight in KnowledgeRelation.objects.values_list(
+                "source_entity__name", "target_entity__name", "weight"
+            )
+        }
+        self.assertEqual(weights[("coolant", "thermostat")], 1.2)
+        self.assertEqual(weights[("thermostat", "housing")], 1.1)
+        self.assertEqual(weights[("housing", "leak")], 1.0)
+        self.assertEqual(weights[("thermostat", "gasket")], 1.0)
+        self.assertEqual(KnowledgeEntity.objects.filter(name="coolant").count(), 1)
+        self.assertEqual(KnowledgeEntity.objects.count(), 6)
+
+    def test_knowledge_graph_bulk_embeds_outside_a_transaction_and_removes_notes_on_failure(self):
+        baseline = len(connection.atomic_blocks)
+        depths = []
+
+        def flaky_embed(texts, model):
+            depths.append(len(connection.atomic_blocks) - baseline)
+            if len(depths) > 1:
+                raise OSError("embedding service unavailable")
+            return embed_texts(texts, model)
+
+        with patch("apps.ai.services.retrieval.embed_texts", side_effect=flaky_embed):
+            with self.assertRaises(OSError):
+                self.client.post(
+                    "/api/ai/knowledge_graph/bulk/",
+                    {"notes": [{"content": "Coolant thermostat gasket"}, {"content": "Fuel rail pressure"}]},
+                    format="json",
+                )
+        self.assertEqual(depths, [0, 0])
+        self.assertFalse(KnowledgeDocument.objects.exists())
+        self.assertFalse(KnowledgeChunk.objects.exists())
+        self.assertFalse(KnowledgeRelation.objects.exists())
+
+    def test_knowledge_graph_neighbors_walks_cached_adjacency(self):
+        notes = ["Coolant thermostat housing leak", "Coolant thermostat housing leak", "Coolant pump impeller"]
+        self.client.post(
+            "/api/ai/knowledge_graph/bulk/", {"notes": [{"content": note} for note in notes]}, format="json"
+        )
+
+        one_hop = self.client.get("/api/ai/knowledge_graph/neighbors/", {"entity": "Coolant", "hops": 1})
+        self.assertEqual(one_hop.status_code, 200)
+        self.assertEqual(
+            [(row["name"], row["hops"]) for row in one_hop.data["neighbors"]], [("thermostat", 1), ("pump", 1)]
+        )
+        self.assertEqual(one_hop.data["neighbors"][0]["score"], 1.0)
+        self.assertEqual(one_hop.data["graph"]["relations"], 5)
+
+        two_hops = self.client.get("/api/ai/knowledge_graph/neighbors/", {"entity": "coolant", "hops": 2})
+        rows = {row["name"]: row for row in two_hops.data["neighbors"]}
+        self.assertEqual(set(rows), {"thermostat", "pump", "housing", "impeller"})
+        self.assertEqual((rows["housing"]["hops"], rows["housing"]["via"]), (2, "thermostat"))
+        self.assertLess(rows["impeller"]["score"], rows["housing"]["score"])
+
+        pruned = self.client.get(
+            "/api/ai/knowledge_graph/neighbors/", {"entity": "coolant", "hops": 3, "min_weight": 1.05}
+        )
+        self.assertEqual([row["name"] for row in pruned.data["neighbors"]], ["thermostat", "housing", "leak"])
+        top = self.client.get("/api/ai/knowledge_graph/neighbors/", {"entity": "coolant", "hops": 2, "top": 2})
+        self.assertEqual(len(top.data["neighbors"]), 2)
+        housing = KnowledgeEntity.objects.get(name="housing")
+        outgoing = self.client.get(
+            "/api/ai/knowledge_graph/neighbors/", {"entity_id": housing.id, "hops": 1, "direction": "out"}
+        )
+        self.assertEqual([row["name"] for row in outgoing.data["neighbors"]], ["leak"])
+        numeric = KnowledgeEntity.objects.create(name=str(housing.id), entity_type="term")
+        by_name = self.client.get("/api/ai/knowledge_graph/neighbors/", {"entity": str(housing.id), "hops": 1})
+        self.assertEqual(by_name.data["entity"]["id"], numeric.id)
+        ambiguous = self.client.get("/api/ai/knowledge_graph/neighbors/", {"entity": "housing", "entity_id": housing.id})
+        self.assertEqual(ambiguous.status_code, 400)
+
+        cached = get_graph_adjacency()
+        self.assertIs(get_graph_adjacency(), cached)
+        impeller = KnowledgeEntity.objects.get(name="impeller")
+        self.client.post(
+            "/api/ai/knowledge_relations/",
+            {"source_entity": impeller.id, "target_entity": housing.id, "relation_type": "fits", "weight": 2.2},
+            format="json",
+        )
+        self.assertIsNot(get_graph_adjacency(), cached)
+        outgoing = self.client.get("/api/ai/knowledge_graph/neighbors/", {"entity": "impeller", "hops": 1})
+        self.assertEqual([row["name"] for row in outgoing.data["neighbors"]], ["housing", "pump"])
+
+        missing = self.client.get("/api/ai/knowledge_graph/neighbors/", {"entity": "flux-capacitor"})
+        self.assertEqual(missing.status_code, 404)
+
+    def test_graph_centrality_command_stores_pagerank_and_degree(self):
+        notes = ["Sensor relay", "Fuse relay", "Wiring relay", "Relay harness"]
+        self.client.post(
+            "/api/ai/knowledge_graph/bulk/", {"notes": [{"content": note} for note in notes]}, format="json"
+        )
+        stale = get_graph_adjacency()
+        output = StringIO()
+        call_command("compute_graph_centrality", stdout=output)
+        self.assertIn("entities=5 relations=4", output.getvalue())
+
+        entities = {entity.name: entity for entity in KnowledgeEntity.objects.all()}
+        self.assertAlmostEqual(sum(entity.pagerank for entity in entities.values()), 1.0, places=6)
+        self.assertAlmostEqual(entities["sensor"].pagerank, entities["fuse"].pagerank)
+        self.assertGreater(entities["relay"].pagerank, entities["sensor"].pagerank)
+        # relay touches every other entity; harness only relay.
+        self.assertEqual(entities["relay"].degree_centrality, 1.0)
+        self.assertEqual(entities["harness"].degree_centrality, 0.25)
+
+        adjacency = get_graph_adjacency()
+        self.assertIsNot(adjacency, stale)
+        self.assertAlmostEqual(float(adjacency.pagerank.sum()), 1.0, places=6)
+        ranked = self.client.get(
+            "/api/ai/knowledge_graph/neighbors/", {"entity": "relay", "hops": 1, "order": "pagerank"}
+        )
+        self.assertEqual(ranked.data["order"], "pagerank")
+        self.assertEqual(ranked.data["neighbors"][0]["name"], "harness")
+        scores = [row["pagerank"] for row in ranked.data["neighbors"]]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        invalid = self.client.get("/api/ai/knowledge_graph/neighbors/", {"entity": "relay", "order": "age"})
+        self.assertEqual(invalid.status_code, 400)
+
+        listed = self.client.get("/api/ai/knowledge_entities/", {"order": "degree"})
+        self.assertEqual(listed.data[0]["name"], "relay")
+
+    def test_graph_search_boosts_chunks_of_strongly_related_entities(self):
+        for title, content in (
+            ("Thermostat Notes", "Thermostat replacement procedure and torque values."),
+            ("Pump Notes", "Pump bearing noise at idle."),
+        ):
+            self.client.post("/api/ai/knowledge_documents/ingest/", {"title": title, "content": content}, format="json")
+        notes = ["Coolant thermostat housing leak", "Coolant thermostat housing leak", "Coolant pump impeller"]
+        self.client.post(
+            "/api/ai/knowledge_graph/bulk/", {"notes": [{"content": note} for note in notes]}, format="json"
+        )
+        # New entities are linked to the chunks that already mention them, not only to the notes.
+        thermostat = KnowledgeEntity.objects.get(name="thermostat")
+        self.assertEqual(KnowledgeEntityPosting.objects.filter(entity=thermostat).count(), 3)
+        created = self.client.post(
+            "/api/ai/knowledge_entities/", {"name": "bearing", "entity_type": "term"}, format="json"
+        )
+        linked = KnowledgeEntityPosting.objects.filter(entity_id=created.data["id"])
+        self.assertEqual(list(linked.values_list("chunk__document__title", flat=True)), ["Pump Notes"])
+
+        output = StringIO()
+        call_command("index_entity_postings", stdout=output)
+        self.assertIn("chunks=5", output.getvalue())
+        self.assertEqual(KnowledgeEntityPosting.objects.filter(entity=thermostat).count(), 3)
+        self.client.post(
+            "/api/ai/knowledge_documents/ingest/",
+            {"title": "Gasket Notes", "content": "Thermostat gasket seating."},
+            format="json",
+        )
+        self.assertEqual(KnowledgeEntityPosting.objects.filter(entity=thermostat).count(), 4)
+
+        search = self.client.get(
+            "/api/ai/knowledge_documents/search/", {"q": "coolant", "retrieval": "graph", "limit": 10}
+        )
+        self.assertEqual(search.status_code, 200)
+        self.assertEqual(search.data["mode"], "graph")
+        self.assertEqual(search.data["graph"]["entities"], ["coolant"])
+        self.assertEqual(search.data["graph"]["expanded_entities"], 1)
+        self.assertTrue({"entity_match_ms", "graph_expand_ms", "graph_postings_ms"} <= set(search.data["timings"]))
+        rows = {row["document_title"]: row for row in search.data["results"]}
+        self.assertIsNotNone(rows["Thermostat Notes"]["graph_rank"])
+        self.assertIsNone(rows["Thermostat Notes"]["keyword_rank"])
+        self.assertGreater(rows["Gasket Notes"]["graph_score"], 0)
+        # The coolant-pump edge was seen once, below the default strength threshold.
+        self.assertEqual(rows["Pump Notes"]["graph_score"], 0.0)
+
+        loose = self.client.get(
+            "/api/ai/knowledge_documents/search/",
+            {"q": "coolant", "retrieval": "graph", "limit": 10, "graph_min_weight": 1.0},
+        )
+        self.assertEqual(loose.data["graph"]["expanded_entities"], 2)
+        loose_rows = {row["document_title"]: row for row in loose.data["results"]}
+        self.assertGreater(loose_rows["Pump Notes"]["graph_score"], 0)
+
+    def test_knowledge_transfer_round_trips_jsonl_with_vectors(self):
+        for title, content in (
+            ("Fan Notes", "Fan clutch engagement temperature sensor."),
+            ("EGR Notes", "EGR valve position sensor fault code P0404."),
+        ):
+            self.client.post("/api/ai/knowledge_documents/ingest/", {"title": title, "content": content}, format="json")
+        notes = ["Coolant thermostat housing leak", "Coolant pump impeller"]
+        self.client.post(
+            "/api/ai/knowledge_graph/bulk/", {"notes": [{"content": note} for note in notes]}, format="json"
+        )
+        KnowledgeRelation.objects.filter(source_entity__name="coolant", target_entity__name="pump").update(weight=3.5)
+        vectors = {
+            (chunk.document.title, chunk.chunk_index): bytes(chunk.embedding_vector)
+            for chunk in KnowledgeChunk.objects.select_related("document")
+        }
+        relation_count = KnowledgeRelation.objects.count()
+        # A rebuild in flight has parked rows that must not travel as real chunks.
+        KnowledgeChunk.objects.create(
+            document=KnowledgeDocument.objects.get(title="Fan Notes"),
+            chunk_index=KnowledgeChunk.PARKED_INDEX_OFFSET,
+            content="Fan shroud clearance check.",
+        )
+
+        export = self.client.get("/api/ai/knowledge_transfer/export/")
+        self.assertEqual(export.status_code, 200)
+        self.assertEqual(export["Content-Type"], "application/x-ndjson")
+        body = b"".join(export.streaming_content)
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(records[0]["type"], "header")
+        self.assertEqual([record["type"] for record in records[1:]][-2:], ["document", "chunk"])
+        self.assertEqual(sum(record["type"] == "chunk" for record in records), len(vectors))
+
+        KnowledgeDocument.objects.all().delete()
+        KnowledgeEntity.objects.all().delete()
+        imported = self.client.post("/api/ai/knowledge_transfer/import/", body, content_type="application/x-ndjson")
+        self.assertEqual(imported.status_code, 201)
+        self.assertEqual((imported.data["documents"], imported.data["chunks"]), (4, len(vectors)))
+        self.assertEqual(imported.data["relations"], relation_count)
+        restored = {
+            (chunk.document.title, chunk.chunk_index): bytes(chunk.embedding_vector)
+            for chunk in KnowledgeChunk.objects.select_related("document")
+        }
+        self.assertEqual(restored, vectors)
+        self.assertEqual(
+            KnowledgeRelation.objects.get(source_entity__name="coolant", target_entity__name="pump").weight, 3.5
+        )
+        self.assertTrue(KnowledgeEntityPosting.objects.filter(entity__name="thermostat").exists())
+        search = self.client.get("/api/ai/knowledge_documents/search/", {"q": "P0404", "limit": 1})
+        self.assertEqual(search.data["results"][0]["document_title"], "EGR Notes")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "knowledge.jsonl")
+            call_command("export_knowledge", path, stderr=StringIO())
+            output = StringIO()
+            call_command("import_knowledge", path, "--batch-size", "1", stdout=output)
+        self.assertIn(f"documents=4 chunks={len(vectors)}", output.getvalue())
+        self.assertEqual(KnowledgeDocument.objects.count(), 8)
+        self.assertEqual(KnowledgeRelation.objects.count(), relation_count)
+
+        orphan = self.client.post(
+            "/api/ai/knowledge_transfer/import/",
+            body.splitlines()[0] + b'\n{"type":"chunk","document":1,"chunk_index":0,"content":"x"}\n',
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(orphan.status_code, 400)
+        parked = self.client.post(
+            "/api/ai/knowledge_transfer/import/",
+            body.splitlines()[0]
+            + b'\n{"type":"document","id":1,"title":"Parked"}\n'
+            + f'{{"type":"chunk","document":1,"chunk_index":{KnowledgeChunk.PARKED_INDEX_OFFSET},"content":"x"}}\n'.encode(),
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(parked.status_code, 400)
+        self.assertEqual(KnowledgeDocument.objects.count(), 8)
+
+    def test_hybrid_search_fuses_vector_and_keyword_ranks(self):
+        for title, content in (
+            ("Fan Notes", "Fan clutch engagement temperature sensor."),
+            ("EGR Notes", "EGR valve position sensor fault code P0404."),
+            ("Brake Notes", "Brake pad wear indicator and rotor thickness."),
+        ):
+            self.client.post("/api/ai/knowledge_documents/ingest/", {"title": title, "content": content}, format="json")
+
+        search = self.client.get(
+            "/api/ai/knowledge_documents/search/",
+            {"q": "P0404 EGR", "retrieval": "hybrid", "keyword_weight": 2, "limit": 3},
+        )
+        self.assertEqual(search.status_code, 200)
+        self.assertEqual(search.data["mode"], "hybrid")
+        self.assertEqual(search.data["fusion"], {"vector_weight": 1.0, "keyword_weight": 2.0, "rrf_k": 60})
+        top = search.data["results"][0]
+        self.assertEqual(top["document_title"], "EGR Notes")
+        self.assertEqual((top["match_type"], top["vector_rank"], top["keyword_rank"]), ("hybrid", 1, 1))
+        self.assertAlmostEqual(top["score"], 1 / 61 + 2 / 61, places=6)
+        scores = [row["score"] for row in search.data["results"]]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+        keyword_only = self.client.get(
+            "/api/ai/knowledge_documents/search/",
+            {"q": "P0404 EGR", "retrieval": "hybrid", "vector_weight": 0},
+        )
+        self.assertEqual([row["document_title"] for row in keyword_only.data["results"]], ["EGR Notes"])
+
+        invalid = self.client.get("/api/ai/knowledge_documents/search/", {"q": "EGR", "retrieval": "fuzzy"})
+        self.assertEqual(invalid.status_code, 400)
+
+    def test_search_reranks_first_stage_candidates(self):
+        for title, content in (
+            (
+                "Scattered",
+                "Sensor wiring: sensor harness, injector harness, pressure relief, sensor ground, injector ground, "
+                "pressure test, valve seat.",
+            ),
+            ("Adjacent", "Procedure for the injector pressure sensor replacement on X15 engines."),
+            ("Unrelated", "Cab heater blend door calibration."),
+        ):
+            self.client.post("/api/ai/knowledge_documents/ingest/", {"title": title, "content": content}, format="json")
+
+        first_stage = self.client.get("/api/ai/knowledge_documents/search/", {"q": "injector pressure sensor", "limit": 1})
+        self.assertEqual([row["document_title"] for row in first_stage.data["results"]], ["Scattered"])
+        search = self.client.get(
+            "/api/ai/knowledge_documents/search/",
+            {"q": "injector pressure sensor", "limit": 1, "rerank": "lexical", "rerank_candidates": 3},
+        )
+        self.assertEqual(search.status_code, 200)
+        self.assertEqual(search.data["rerank"], {"reranker": "lexical", "candidates": 3})
+        self.assertEqual([row["document_title"] for row in search.data["results"]], ["Adjacent"])
+        self.assertIn("first_stage_rank", search.data["results"][0])
+        self.assertTrue({"embed_ms", "first_stage_ms", "rerank_ms", "total_ms"} <= set(search.data["timings"]))
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _RerankStandInHandler)
+        server.truncate = False
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        with patch("apps.ai.services.reranker.RERANK_URL", f"http://127.0.0.1:{server.server_address[1]}/rerank"):
+            remote = self.client.get(
+                "/api/ai/knowledge_documents/search/",
+                {"q": "cab heater", "limit": 3, "rerank": "remote", "rerank_candidates": 3, "collapse": "false"},
+            )
+        self.assertEqual(remote.data["rerank"]["reranker"], "remote")
+        # The stand-in scores shorter snippets higher.
+        lengths = [len(row["content"]) for row in remote.data["results"]]
+        self.assertEqual(lengths, sorted(lengths))
+
+        with patch("apps.ai.services.reranker.RERANK_URL", ""):
+            fallback = self.client.get("/api/ai/knowledge_documents/search/", {"q": "valve seat", "rerank": "remote"})
+        self.assertEqual(fallback.data["rerank"]["fallback_from"], "remote")
+
+        # A broken response degrades to lexical, and the degraded result is not cached.
+        server.truncate = True
+        params = {"q": "cab heater", "limit": 3, "rerank": "remote", "rerank_candidates": 3, "collapse": "true"}
+        with patch("apps.ai.services.reranker.RERANK_URL", f"http://127.0.0.1:{server.server_address[1]}/rerank"):
+            truncated = self.client.get("/api/ai/knowledge_documents/search/", params)
+            self.assertEqual(truncated.data["rerank"]["error"], "rerank_failed:IncompleteRead")
+            server.truncate = False
+            retried = self.client.get("/api/ai/knowledge_documents/search/", params)
+            self.assertFalse(retried.data["cache"]["results"]["hit"])
+            self.assertEqual(retried.data["rerank"]["reranker"], "remote")
+            cached = self.client.get("/api/ai/knowledge_documents/search/", params)
+        self.assertTrue(cached.data["cache"]["results"]["hit"])
+        self.assertEqual(set(cached.data["timings"]), {"result_cache_ms", "total_ms"})
+
+        invalid = self.client.get("/api/ai/knowledge_documents/search/", {"q": "valve", "rerank": "magic"})
+        self.assertEqual(invalid.status_code, 400)
+
+    def test_search_prefilters_by_document_metadata(self):
+        ids = {}
+        for title, family in (("ISX Turbo", "ISX15"), ("DD15 Turbo", "DD15"), ("X15 Turbo", "X15")):
+            response = self.client.post(
+                "/api/ai/knowledge_documents/ingest/",
+                {"title": title, "content": "Turbo actuator calibration steps.", "metadata": {"engine_family": family}},
+                format="json",
+            )
+            ids[title] = response.data["id"]
+
+        for retrieval in ("vector", "hybrid"):
+            search = self.client.get(
+                "/api/ai/knowledge_documents/search/",
+                {
+                    "q": "turbo actuator",
+                    "retrieval": retrieval,
+                    "metadata": json.dumps({"engine_family": ["ISX15", "X15"]}),
+                    "collapse": "false",
+                },
+            )
+            self.assertEqual(search.status_code, 200)
+            self.assertEqual(search.data["filters"]["matched_documents"], 2)
+            self.assertEqual({row["document_title"] for row in search.data["results"]}, {"ISX Turbo", "X15 Turbo"})
+
+        by_id = self.client.get(
+            "/api/ai/knowledge_documents/search/",
+            {"q": "turbo actuator", "document_ids": f"{ids['DD15 Turbo']}", "source_type": "text"},
+        )
+        self.assertEqual([row["document_title"] for row in by_id.data["results"]], ["DD15 Turbo"])
+
+        none = self.client.get(
+            "/api/ai/knowledge_documents/search/",
+            {"q": "turbo actuator", "created_before": "2000-01-01"},
+        )
+        self.assertEqual((none.data["results"], none.data["mode"]), ([], "none"))
+
+        invalid = self.client.get("/api/ai/knowledge_documents/search/", {"q": "turbo", "metadata": "{\"a__b\": 1}"})
+        self.assertEqual(invalid.status_code, 400)
+
+    def test_search_caches_follow_corpus_version(self):
+        self.client.post(
+            "/api/ai/knowledge_documents/ingest/",
+            {"title": "Coolant Notes", "content": "P0128 coolant thermostat below regulating temperature."},
+            format="json",
+        )
+        first = self.client.get("/api/ai/knowledge_documents/search/", {"q": "P0128 thermostat"})
+        repeat = self.client.get("/api/ai/knowledge_documents/search/", {"q": "  p0128   THERMOSTAT "})
+        self.assertFalse(first.data["cache"]["results"]["hit"])
+        self.assertTrue(repeat.data["cache"]["results"]["hit"])
+        self.assertEqual(repeat.data["cache"]["results"]["hit_ratio"], 0.5)
+        self.assertEqual(repeat.data["results"], first.data["results"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/api/ai/knowledge_documents/ingest/",
+                {"title": "Thermostat Bulletin", "content": "P0128 thermostat stuck open replacement bulletin."},
+                format="json",
+            )
+        fresh = self.client.get("/api/ai/knowledge_documents/search/", {"q": "P0128 thermostat"})
+        self.assertGreater(fresh.data["corpus_version"], first.data["corpus_version"])
+        self.assertFalse(fresh.data["cache"]["results"]["hit"])
+        self.assertTrue(fresh.data["cache"]["query_embedding"]["hit"])
+        self.assertEqual(len(fresh.data["results"]), 2)
+
+    def test_url_ingest_streams_full_page(self):
+        words = [f"w{i}" for i in range(20000)]
+        page = f"<html><script>var x = 1;</script><body><p>{' '.join(words)}</p><p>tail&amp;end</p></body></html>"
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _PageStandInHandler)
+        server.page = page.encode("utf-8")
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        response = self.client.post(
+            "/api/ai/knowledge_documents/ingest/",
+            {"url": f"http://127.0.0.1:{server.server_address[1]}/manual", "chunk_size": 100, "overlap": 10},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        document = KnowledgeDocument.objects.get(pk=response.data["id"])
+        self.assertGreater(len(document.content), 60000)
+        self.assertTrue(document.content.endswith("w19999 tail&end"))
+        self.assertNotIn("var x", document.content)
+        self.assertNotIn("url_fetch_error", document.metadata)
+        chunks = list(document.chunks.order_by("chunk_index").values_list("content", flat=True))
+        self.assertEqual(chunks, split_text_into_chunks(document.content, chunk_size=100, overlap=10))
+
+    @patch("apps.ai.services.ingest_jobs.INGEST_WORKERS", 0)
+    def test_url_reingest_uses_conditional_requests(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _ConditionalPageStandInHandler)
+        server.pages = {"/a": b"alpha bulletin text", "/b": b"bravo bulletin text"}
+        server.requests = []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        first = self.client.post("/api/ai/knowledge_documents/ingest/", {"url": f"{base}/a"}, format="json")
+        self.assertEqual(first.data["chunking"]["source_fetch"], {"status": 200, "not_modified": False})
+        fetch = KnowledgeSourceFetch.objects.get(source_uri=f"{base}/a")
+        self.assertTrue(fetch.etag)
+        chunk_ids = list(KnowledgeChunk.objects.filter(document_id=first.data["id"]).values_list("id", flat=True))
+
+        again = self.client.post("/api/ai/knowledge_documents/ingest/", {"url": f"{base}/a"}, format="json")
+        self.assertEqual(again.data["id"], first.data["id"])
+        self.assertEqual(again.data["chunking"]["source_fetch"], {"status": 304, "not_modified": True})
+        self.assertEqual(again.data["chunking"]["unchanged_chunks"], len(chunk_ids))
+        self.assertEqual(server.requests[-1], ("/a", fetch.etag))
+        self.assertEqual(
+            list(KnowledgeChunk.objects.filter(document_id=first.data["id"]).values_list("id", flat=True)), chunk_ids
+        )
+
+        self.client.post("/api/ai/knowledge_documents/ingest/", {"url": f"{base}/b"}, format="json")
+        server.pages["/a"] = b"alpha bulletin text revised"
+        out = StringIO()
+        call_command("refresh_url_sources", stdout=out)
+        self.assertIn("sources=2 not_modified=1 failed=0", out.getvalue())
+        self.assertEqual(KnowledgeDocument.objects.get(pk=first.data["id"]).content, "alpha bulletin text revised")
+        self.assertEqual(KnowledgeDocument.objects.filter(source_type=KnowledgeDocument.SOURCE_URL).count(), 2)
+        refreshed = KnowledgeSourceFetch.objects.get(source_uri=f"{base}/a")
+        self.assertNotEqual(refreshed.etag, fetch.etag)
+        self.assertEqual((refreshed.fetch_count, refreshed.not_modified_count), (3, 1))
+
+        revised_ids = list(KnowledgeChunk.objects.filter(document_id=first.data["id"]).values_list("id", flat=True))
+        server.pages["/a"] = None
+        outage = self.client.post("/api/ai/knowledge_documents/ingest/", {"url": f"{base}/a"}, format="json")
+        self.assertEqual(outage.data["chunking"]["source_fetch"]["status"], 503)
+        self.assertEqual(outage.data["chunking"]["deleted_chunks"], 0)
+        document = KnowledgeDocument.objects.get(pk=first.data["id"])
+        self.assertEqual(document.content, "alpha bulletin text revised")
+        self.assertEqual(document.metadata["url_fetch_error"], "url_fetch_failed:HTTPError")
+        self.assertEqual(
+            list(KnowledgeChunk.objects.filter(document=document).values_list("id", flat=True)), revised_ids
+        )
+        failed = KnowledgeSourceFetch.objects.get(source_uri=f"{base}/a")
+        self.assertEqual(
+            (failed.status_code, failed.error, failed.etag), (503, "url_fetch_failed:HTTPError", refreshed.etag)
+        )
+
     def test_mcp_oauth_token_requires_oauth_auth_type(self):
         adapter = McpAdapter.objects.create(
             name="plain-mcp",
@@ -321,3 +1560,198 @@ class AIApiTests(TestCase):
         self.assertTrue(resp.data.get("result", {}).get("idempotent_reuse"))
         self.assertEqual(resp.data.get("result", {}).get("reused_proposal_id"), first.id)
         self.assertEqual(Ticket.objects.count(), 0)
+
+
+class MinHashTests(SimpleTestCase):
+    def test_signature_estimates_jaccard_similarity(self):
+        words = [f"w{i}" for i in range(200)]
+        base = minhash_signature(" ".join(words))
+        edited = minhash_signature(" ".join(words[:100] + ["changed"] + words[101:]))
+        unrelated = minhash_signature(" ".join(f"x{i}" for i in range(200)))
+
+        self.assertEqual(signature_bytes(base), signature_bytes(minhash_signature(" ".join(words).upper())))
+        self.assertGreater(estimated_similarity(base, edited), 0.9)
+        self.assertLess(estimated_similarity(base, unrelated), 0.1)
+        self.assertIsNone(minhash_signature("  ...  "))
+
+
+class DeterministicEmbeddingTests(SimpleTestCase):
+    def test_vectorized_embedding_matches_scalar_reference(self):
+        vocabulary = [f"t{i}" for i in range(500)] + ["Brake", "air", "Ünïcode", "x"]
+        texts = ["", "   ", "air brake", " ".join(vocabulary[i % 37 * 13 % len(vocabulary)] for i in range(3000))]
+        for text in texts:
+            for dimensions in (128, 64, 7):
+                self.assertEqual(
+                    deterministic_embedding(text, dimensions), deterministic_embedding_scalar(text, dimensions)
+                )
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_evicts_least_recent_and_expires(self):
+        now = [0.0]
+        cache = LRUCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        now[0] = 11.0
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 2, "hit_ratio": 0.3333, "size": 1})
+
+
+class _PageStandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(self.server.page)))
+        self.end_headers()
+        self.wfile.write(self.server.page)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _ConditionalPageStandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        page = self.server.pages[self.path]
+        self.server.requests.append((self.path, self.headers.get("If-None-Match")))
+        if page is None:
+            self.send_response(503)
+            self.end_headers()
+            return
+        etag = f'"{len(page)}-{hash(page) & 0xFFFF}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(page)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(page)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _RerankStandInHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        results = [
+            {"index": index, "relevance_score": 1.0 / (1 + len(document))}
+            for index, document in enumerate(payload["documents"])
+        ]
+        body = json.dumps({"model": payload["model"], "results": results}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        # A truncated body makes the client raise http.client.IncompleteRead.
+        self.send_header("Content-Length", str(len(body) + (64 if self.server.truncate else 0)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _EmbeddingStandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        texts = payload["input"]
+        with server.lock:
+            server.requests.append(texts)
+            server.client_ports.add(self.client_address[1])
+            throttled = texts[0] in server.throttle_once
+            server.throttle_once.discard(texts[0])
+
+        if throttled:
+            self._reply(429, {"error": "rate limited"}, {"Retry-After": server.retry_after})
+        elif any("fail" in text for text in texts):
+            self._reply(500, {"error": "boom"})
+        else:
+            data = [{"index": i, "embedding": [float(len(text)), 1.0, 0.0]} for i, text in enumerate(texts)]
+            self._reply(200, {"data": list(reversed(data))})
+
+    def _reply(self, status_code, body, headers=None):
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class EmbeddingClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _EmbeddingStandInHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.client_ports = set()
+        self.server.throttle_once = set()
+        self.server.retry_after = "0"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/embeddings"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _client(self, **kwargs):
+        options = {"max_batch_items": 2, "concurrency": 1, "max_retries": 2, "backoff_seconds": 0}
+        options.update(kwargs)
+        return EmbeddingClient(api_key="test", model="stand-in", url=self.url, **options)
+
+    def test_batches_by_item_and_token_budget(self):
+        client = self._client(max_batch_items=3, max_batch_tokens=10)
+        self.assertEqual(client.plan_batches(["a" * 8, "b" * 8, "c" * 32, "d", "e", "f", "g"]), [[0, 1], [2, 3, 4], [5, 6]])
+
+    def test_reuses_connection_and_retries_throttled_batch(self):
+        self.server.throttle_once.add("gamma")
+        client = self._client()
+        result = client.embed(["alpha", "beta", "gamma", "delta", "epsilon"])
+        client.close()
+
+        self.assertEqual(result.batches, 3)
+        self.assertEqual(result.failed_batches, 0)
+        self.assertEqual(result.retries, 1)
+        self.assertEqual([vector[0] for vector in result.vectors], [5.0, 4.0, 5.0, 5.0, 7.0])
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertEqual(len(self.server.client_ports), 1)
+
+    def test_retry_after_is_capped_and_ignored_when_invalid(self):
+        client = self._client(backoff_seconds=0.01, max_backoff_seconds=0.05)
+        for retry_after, expected in (("120", 0.05), ("-5", 0.01), ("nan", 0.01), ("0.02", 0.02)):
+            self.server.retry_after = retry_after
+            self.server.throttle_once.add("gamma")
+            with patch("apps.ai.services.embedding_client.time.sleep") as sleep, patch(
+                "apps.ai.services.embedding_client.random.random", return_value=0.0
+            ):
+                result = client.embed(["gamma"])
+            self.assertEqual(result.failed_batches, 0)
+            sleep.assert_called_once_with(expected)
+        client.close()
+
+    def test_failed_batches_fall_back_individually(self):
+        client = self._client(concurrency=2)
+        with patch("apps.ai.services.retrieval._embedding_client", return_value=client), patch.dict(
+            os.environ, {"OPENAI_API_KEY": "test"}
+        ), patch("apps.ai.services.retrieval.lookup_cached_embeddings", return_value={}), patch(
+            "apps.ai.services.retrieval.store_cached_embeddings"
+        ):
+            outcome = embed_texts(["oil pressure", "fail sensor", "coolant level", "boost leak"])
+        client.close()
+
+        self.assertEqual(outcome.source, "mixed")
+        self.assertEqual(outcome.batches, {"batches": 2, "failed": 1, "retries": 2})
+        self.assertEqual([len(vector) for vector in outcome.vectors], [128, 128, 3, 3])
+        self.assertEqual(outcome.model_tags, ["deterministic-128", "deterministic-128", OPENAI_EMBEDDING_MODEL, OPENAI_EMBEDDING_MODEL])
@@ -9,7 +9,9 @@ from .views import (
     KnowledgeDocumentViewSet,
     KnowledgeEntityViewSet,
     KnowledgeGraphViewSet,
+    KnowledgeIngestJobViewSet,
     KnowledgeRelationViewSet,
+    KnowledgeTransferViewSet,
     McpAdapterViewSet,
     ModelEndpointViewSet,
 )
@@ -17,11 +19,13 @@ from .views import (
 router = DefaultRouter()
 router.register(r"knowledge_documents", KnowledgeDocumentViewSet)
 router.register(r"knowledge_chunks", KnowledgeChunkViewSet)
+router.register(r"knowledge_ingest_jobs", KnowledgeIngestJobViewSet)
 router.register(r"knowledge_entities", KnowledgeEntityViewSet)
 router.register(r"knowledge_relations", KnowledgeRelationViewSet)
 router.register(r"model_endpoints", ModelEndpointViewSet)
 router.register(r"mcp_adapters", McpAdapterViewSet)
 router.register(r"knowledge_graph", KnowledgeGraphViewSet, basename="knowledge_graph")
+router.register(r"knowledge_transfer", KnowledgeTransferViewSet, basename="knowledge_transfer")
 router.register(r"agent_actions", AgentActionProposalViewSet, basename="agent_actions")
 
 urlpatterns = [
@@ -1,14 +1,15 @@
 import json
+import math
 import os
-import re
-from html import unescape
-from django.http import HttpResponse
+import time
+from django.http import HttpResponse, StreamingHttpResponse
 from urllib.error import HTTPError, URLError
 from urllib.request import Request, urlopen
 
 from django.db import transaction
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -21,6 +22,9 @@ from .models import (
     KnowledgeChunk,
     KnowledgeDocument,
     KnowledgeEntity,
+    KnowledgeEntityPosting,
+    KnowledgeIngestItem,
+    KnowledgeIngestJob,
     KnowledgeRelation,
     McpAdapter,
     ModelEndpoint,
@@ -33,6 +37,8 @@ from .serializers import (
     KnowledgeDocumentIngestSerializer,
     KnowledgeDocumentSerializer,
     KnowledgeEntitySerializer,
+    KnowledgeIngestItemSerializer,
+    KnowledgeIngestJobSerializer,
     KnowledgeRelationSerializer,
     McpAdapterSerializer,
     ModelEndpointSerializer,
@@ -49,64 +55,90 @@ from .services.oauth_connector import (
     get_oauth_flow_status,
     start_oauth_flow,
 )
-from .services.retrieval import rebuild_document_chunks, search_knowledge_chunks
-
-
-HTML_TAG_RE = re.compile(r"<[^>]+>")
-NON_ALNUM_RE = re.compile(r"[^a-z0-9_+\-]+")
-STOPWORDS = {
-    "the",
-    "and",
-    "for",
-    "with",
-    "that",
-    "this",
-    "from",
-    "into",
-    "about",
-    "have",
-    "has",
-    "will",
-    "your",
-    "you",
-    "are",
-    "can",
-    "all",
-    "not",
-    "use",
-    "using",
-    "was",
-    "were",
-    "they",
-    "their",
-    "them",
-    "then",
-    "when",
-    "what",
-}
-
-
-def _fetch_url_text(url: str, timeout_seconds: int) -> tuple[str, str | None]:
-    request = Request(
-        url,
-        headers={
-            "User-Agent": "FixItFelixKnowledgeIngest/1.0",
-            "Accept": "text/plain,text/html,application/json,*/*",
-        },
-    )
-    try:
-        with urlopen(request, timeout=timeout_seconds) as response:
-            charset = response.headers.get_content_charset() or "utf-8"
-            raw = response.read().decode(charset, errors="replace")
-            content_type = response.headers.get("Content-Type", "")
-    except (HTTPError, URLError, TimeoutError, ValueError) as exc:
-        return "", f"url_fetch_failed:{exc.__class__.__name__}"
-
-    text = unescape(HTML_TAG_RE.sub(" ", raw)).strip()
-    text = re.sub(r"\s+", " ", text)
-    if not text:
-        return "", f"url_fetch_empty:{content_type or 'unknown'}"
-    return text[:60000], None
+from .services.keyword_index import index_chunks, unindex_chunks
+from .services.retrieval import (
+    DEFAULT_RRF_K,
+    RETRIEVAL_MODES,
+    RETRIEVAL_VECTOR,
+    rebuild_document_chunks,
+    schedule_index_refresh,
+    search_knowledge_chunks,
+)
+from .services.ingest_jobs import create_ingest_job
+from .services.search_cache import bump_corpus_version
+from .services.graph_index import (
+    DIRECTION_BOTH,
+    DIRECTIONS,
+    MAX_HOPS,
+    MAX_TOP,
+    ORDER_DEGREE,
+    ORDER_PAGERANK,
+    ORDER_SCORE,
+    ORDERS,
+    get_graph_adjacency,
+)
+from .services.knowledge_graph import (
+    GRAPH_EXPANSION_TOP,
+    GRAPH_MIN_WEIGHT,
+    TERM_ENTITY,
+    entity_tokens,
+    link_chunk_entities,
+    link_entity_mentions,
+    note_terms,
+    write_note_graph,
+)
+from .services.knowledge_ingest import ingest_knowledge_source
+from .services.knowledge_transfer import export_lines, import_lines
+from .services.minhash import find_near_duplicates
+from .services.reranker import DEFAULT_RERANK_CANDIDATES, MAX_RERANK_CANDIDATES, RERANK_NONE, RERANKERS
+from .services.search_filters import SearchFilters
+from .services.vector_index import MODE_EXACT, SEARCH_MODES
+
+
+BULK_INGEST_MAX_ITEMS = int(os.getenv("KNOWLEDGE_BULK_INGEST_MAX_ITEMS", "10000"))
+GRAPH_BULK_MAX_NOTES = int(os.getenv("KNOWLEDGE_GRAPH_BULK_MAX_NOTES", "500"))
+BULK_INGEST_OPTION_KEYS = ("chunk_size", "overlap", "timeout_seconds")
+JSONL_CONTENT_TYPES = {"application/jsonl", "application/x-ndjson", "application/x-jsonlines"}
+
+
+def _parse_jsonl(lines):
+    items = []
+    for line_number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            items.append(json.loads(line))
+        except json.JSONDecodeError:
+            raise ValueError(f"Invalid JSON on line {line_number}.")
+    return items
+
+
+def _bulk_ingest_payload(request):
+    # Accepts a JSON list, {"items": [...]} with shared options, a raw JSONL body or a JSONL file upload.
+    content_type = (request.content_type or "").split(";")[0].strip().lower()
+    options = request.query_params
+    if content_type in JSONL_CONTENT_TYPES:
+        items = _parse_jsonl(request.body.splitlines())
+    elif "file" in request.FILES:
+        items = _parse_jsonl(request.FILES["file"])
+        options = request.data
+    elif isinstance(request.data, list):
+        items = request.data
+    else:
+        items = request.data.get("items")
+        options = request.data
+        if not isinstance(items, list):
+            raise ValueError("Provide 'items' as a list.")
+
+    defaults = {}
+    for key in BULK_INGEST_OPTION_KEYS:
+        value = options.get(key)
+        if value not in (None, ""):
+            defaults[key] = value
+    return items, defaults
 
 
 def _extract_query_from_messages(messages):
@@ -155,12 +187,21 @@ def _safe_int(value, default, minimum=1, maximum=100):
     return max(minimum, min(parsed, maximum))
 
 
-def _tokenize_for_entities(text: str):
-    normalized = NON_ALNUM_RE.sub(" ", text.lower())
-    for token in normalized.split():
-        if len(token) < 4 or token in STOPWORDS:
-            continue
-        yield token
+def _safe_float(value, default, minimum=0.0, maximum=100.0):
+    try:
+        parsed = float(value)
+    except (TypeError, ValueError):
+        parsed = float(default)
+    if not math.isfinite(parsed):
+        parsed = float(default)
+    return max(minimum, min(parsed, maximum))
+
+
+def _request_param(request, name, default=None):
+    value = request.query_params.get(name)
+    if value is None and hasattr(request.data, "get"):
+        value = request.data.get(name)
+    return default if value is None or value == "" else value
 
 
 def _mcp_auth_headers(adapter: McpAdapter) -> dict[str, str]:
@@ -260,60 +301,61 @@ class KnowledgeDocumentViewSet(viewsets.ModelViewSet):
         user = self.request.user if self.request.user and self.request.user.is_authenticated else None
         serializer.save(created_by=user)
 
+    def perform_update(self, serializer):
+        # Title, source_type and metadata feed result rows and search filters, so cached results go stale.
+        serializer.save()
+        bump_corpus_version()
+
     @action(detail=False, methods=["post"], url_path="ingest")
     def ingest(self, request):
         payload = KnowledgeDocumentIngestSerializer(data=request.data)
         payload.is_valid(raise_exception=True)
         data = payload.validated_data
 
-        content = (data.get("content") or "").strip()
-        url = (data.get("url") or "").strip()
-        metadata = data.get("metadata") or {}
-        timeout_seconds = data.get("timeout_seconds", 15)
-
-        source_type = KnowledgeDocument.SOURCE_TEXT
-        source_uri = ""
-        if url:
-            source_type = KnowledgeDocument.SOURCE_URL
-            source_uri = url
-            if not content:
-                fetched_content, fetch_error = _fetch_url_text(url, timeout_seconds)
-                content = fetched_content
-                if fetch_error:
-                    metadata = {**metadata, "url_fetch_error": fetch_error}
-                if not content:
-                    content = f"URL source registered for deferred retrieval: {url}"
-
-        title = (data.get("title") or "").strip()
-        if not title:
-            title = url or f"Knowledge document {KnowledgeDocument.objects.count() + 1}"
-        title = title[:255]
-
         user = request.user if request.user and request.user.is_authenticated else None
-        document = KnowledgeDocument.objects.create(
-            source_type=source_type,
-            source_uri=source_uri,
-            title=title,
-            content=content,
-            metadata=metadata,
-            created_by=user,
-        )
-
-        chunk_stats = rebuild_document_chunks(
-            document=document,
-            chunk_size=data.get("chunk_size", 120),
-            overlap=data.get("overlap", 20),
-        )
+        document, chunk_stats = ingest_knowledge_source(data, user=user)
         serialized = KnowledgeDocumentSerializer(document).data
+        reused = chunk_stats.get("duplicate", {}).get("action") in ("skipped", "merged")
         return Response(
             {
                 "id": document.id,
                 "document": serialized,
                 "chunking": chunk_stats,
             },
-            status=status.HTTP_201_CREATED,
+            status=status.HTTP_200_OK if reused else status.HTTP_201_CREATED,
         )
 
+    @action(detail=False, methods=["post"], url_path="bulk_ingest")
+    def bulk_ingest(self, request):
+        try:
+            raw_items, defaults = _bulk_ingest_payload(request)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if not raw_items:
+            return Response({"error": "Provide at least one item."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(raw_items) > BULK_INGEST_MAX_ITEMS:
+            return Response(
+                {"error": f"At most {BULK_INGEST_MAX_ITEMS} items per job."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        payloads, errors = [], []
+        for position, raw_item in enumerate(raw_items):
+            if not isinstance(raw_item, dict):
+                errors.append({"position": position, "errors": ["Each item must be an object."]})
+                continue
+            item = KnowledgeDocumentIngestSerializer(data={**defaults, **raw_item})
+            if item.is_valid():
+                payloads.append(item.validated_data)
+            else:
+                errors.append({"position": position, "errors": item.errors})
+        if errors:
+            return Response({"error": "Invalid items.", "items": errors[:50]}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user if request.user and request.user.is_authenticated else None
+        job = create_ingest_job(payloads, user=user, options=defaults)
+        return Response(KnowledgeIngestJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
     @action(detail=True, methods=["post"], url_path="rechunk")
     def rechunk(self, request, pk=None):
         document = self.get_object()
@@ -346,7 +388,69 @@ class KnowledgeDocumentViewSet(viewsets.ModelViewSet):
             minimum=1,
             maximum=50,
         )
-        results = search_knowledge_chunks(query, limit=limit, return_meta=True)
+        mode = str(request.query_params.get("mode") or request.data.get("mode") or MODE_EXACT).strip().lower()
+        if mode not in SEARCH_MODES:
+            return Response(
+                {"error": f"mode must be one of: {', '.join(SEARCH_MODES)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        retrieval = str(_request_param(request, "retrieval", RETRIEVAL_VECTOR)).strip().lower()
+        if retrieval not in RETRIEVAL_MODES:
+            return Response(
+                {"error": f"retrieval must be one of: {', '.join(RETRIEVAL_MODES)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        fusion = {
+            "vector_weight": _safe_float(_request_param(request, "vector_weight"), default=1.0),
+            "keyword_weight": _safe_float(_request_param(request, "keyword_weight"), default=1.0),
+            "rrf_k": _safe_int(_request_param(request, "rrf_k"), default=DEFAULT_RRF_K, minimum=1, maximum=1000),
+        }
+        graph = {
+            "weight": _safe_float(_request_param(request, "graph_weight"), default=1.0),
+            "min_weight": _safe_float(_request_param(request, "graph_min_weight"), default=GRAPH_MIN_WEIGHT),
+            "top": _safe_int(_request_param(request, "graph_top"), default=GRAPH_EXPANSION_TOP, maximum=MAX_TOP),
+            "order": str(_request_param(request, "graph_order", ORDER_SCORE)).strip().lower(),
+        }
+        if graph["order"] not in ORDERS:
+            return Response(
+                {"error": f"graph_order must be one of: {', '.join(ORDERS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        rerank = str(_request_param(request, "rerank", RERANK_NONE)).strip().lower()
+        if rerank not in RERANKERS:
+            return Response(
+                {"error": f"rerank must be one of: {', '.join(RERANKERS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        rerank_candidates = _safe_int(
+            _request_param(request, "rerank_candidates"),
+            default=DEFAULT_RERANK_CANDIDATES,
+            minimum=1,
+            maximum=MAX_RERANK_CANDIDATES,
+        )
+        try:
+            filters = SearchFilters.from_params(
+                source_type=_request_param(request, "source_type"),
+                metadata=_request_param(request, "metadata"),
+                created_after=_request_param(request, "created_after"),
+                created_before=_request_param(request, "created_before"),
+                document_ids=_request_param(request, "document_ids"),
+            )
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        results = search_knowledge_chunks(
+            query,
+            limit=limit,
+            return_meta=True,
+            mode=mode,
+            retrieval=retrieval,
+            fusion=fusion,
+            filters=filters,
+            collapse=str(_request_param(request, "collapse", "true")).strip().lower() not in ("0", "false", "no"),
+            rerank=rerank,
+            rerank_candidates=rerank_candidates,
+            graph=graph,
+        )
         return Response(results)
 
 
@@ -355,12 +459,80 @@ class KnowledgeChunkViewSet(viewsets.ModelViewSet):
     serializer_class = KnowledgeChunkSerializer
     permission_classes = [IsAuthenticated]
 
+    @transaction.atomic
+    def perform_create(self, serializer):
+        chunk = serializer.save()
+        index_chunks([chunk])
+        link_chunk_entities([chunk])
+        schedule_index_refresh(chunk.document_id)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        previous_document_id = serializer.instance.document_id
+        # The old row comes off the postings and corpus totals before its new content is indexed.
+        unindex_chunks(KnowledgeChunk.objects.filter(pk=serializer.instance.pk))
+        KnowledgeEntityPosting.objects.filter(chunk_id=serializer.instance.pk).delete()
+        chunk = serializer.save()
+        index_chunks([chunk])
+        link_chunk_entities([chunk])
+        schedule_index_refresh(chunk.document_id)
+        if previous_document_id != chunk.document_id:
+            schedule_index_refresh(previous_document_id)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        document_id = instance.document_id
+        unindex_chunks(KnowledgeChunk.objects.filter(pk=instance.pk))
+        instance.delete()
+        schedule_index_refresh(document_id)
+
+
+class KnowledgeIngestPagination(LimitOffsetPagination):
+    default_limit = 50
+    max_limit = 500
+
+
+class KnowledgeIngestJobViewSet(viewsets.ReadOnlyModelViewSet):
+    # Jobs carry item counts only; a job can hold thousands of items, so they are paged separately.
+    queryset = KnowledgeIngestJob.objects.order_by("-created_at")
+    serializer_class = KnowledgeIngestJobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KnowledgeIngestPagination
+
+    @action(detail=True, methods=["get"], url_path="items")
+    def items(self, request, pk=None):
+        job = self.get_object()
+        items = job.items.order_by("position")
+        item_status = str(request.query_params.get("status") or "").strip()
+        if item_status:
+            if item_status not in dict(KnowledgeIngestItem.STATUS_CHOICES):
+                return Response({"error": "Unknown item status."}, status=status.HTTP_400_BAD_REQUEST)
+            items = items.filter(status=item_status)
+        page = self.paginate_queryset(items)
+        return self.get_paginated_response(KnowledgeIngestItemSerializer(page, many=True).data)
+
 
 class KnowledgeEntityViewSet(viewsets.ModelViewSet):
     queryset = KnowledgeEntity.objects.all()
     serializer_class = KnowledgeEntitySerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        queryset = self.queryset
+        order = str(self.request.query_params.get("order") or "").strip().lower()
+        # Both centralities are indexed descending, so "most important first" is an index scan.
+        if order == ORDER_PAGERANK:
+            queryset = queryset.order_by("-pagerank", "id")
+        elif order == ORDER_DEGREE:
+            queryset = queryset.order_by("-degree_centrality", "id")
+        return queryset
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        entity = serializer.save()
+        if entity.entity_type == TERM_ENTITY:
+            link_entity_mentions({entity.name: entity.id})
+
 
 class KnowledgeRelationViewSet(viewsets.ModelViewSet):
     queryset = KnowledgeRelation.objects.select_related("source_entity", "target_entity").all()
@@ -833,83 +1005,213 @@ class KnowledgeGraphViewSet(viewsets.ViewSet):
     def ingest(self, request):
         return self._ingest_payload(request)
 
+    @action(detail=False, methods=["get"], url_path="neighbors")
+    def neighbors(self, request):
+        started = time.perf_counter()
+        raw_entity = str(request.query_params.get("entity") or "").strip()
+        raw_entity_id = str(request.query_params.get("entity_id") or "").strip()
+        if bool(raw_entity) == bool(raw_entity_id):
+            return Response({"error": "Provide either 'entity' or 'entity_id'."}, status=status.HTTP_400_BAD_REQUEST)
+        if raw_entity_id and not raw_entity_id.isdigit():
+            return Response({"error": "entity_id must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        direction = str(request.query_params.get("direction") or DIRECTION_BOTH).strip().lower()
+        if direction not in DIRECTIONS:
+            return Response(
+                {"error": f"direction must be one of: {', '.join(DIRECTIONS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        order = str(request.query_params.get("order") or ORDER_SCORE).strip().lower()
+        if order not in ORDERS:
+            return Response(
+                {"error": f"order must be one of: {', '.join(ORDERS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if raw_entity_id:
+            entity = KnowledgeEntity.objects.filter(pk=int(raw_entity_id)).first()
+        else:
+            entity_type = str(request.query_params.get("entity_type") or TERM_ENTITY).strip()
+            entity = KnowledgeEntity.objects.filter(name=raw_entity.lower(), entity_type=entity_type).first()
+        if entity is None:
+            return Response({"error": "Entity not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        hops = _safe_int(request.query_params.get("hops"), default=2, minimum=1, maximum=MAX_HOPS)
+        top = _safe_int(request.query_params.get("top"), default=50, minimum=1, maximum=MAX_TOP)
+        min_weight = _safe_float(request.query_params.get("min_weight"), default=0.0, minimum=0.0, maximum=1e9)
+        adjacency = get_graph_adjacency()
+        neighbours = adjacency.neighbors(
+            entity.id, hops=hops, top=top, min_weight=min_weight, direction=direction, order=order
+        )
+        names = KnowledgeEntity.objects.in_bulk(
+            {row["entity_id"] for row in neighbours} | {row["via_entity_id"] for row in neighbours}
+        )
+        for row in neighbours:
+            neighbour, via = names.get(row["entity_id"]), names.get(row["via_entity_id"])
+            row["name"] = neighbour.name if neighbour else ""
+            row["entity_type"] = neighbour.entity_type if neighbour else ""
+            row["via"] = via.name if via else ""
+
+        return Response(
+            {
+                "entity": {"id": entity.id, "name": entity.name, "entity_type": entity.entity_type},
+                "hops": hops,
+                "top": top,
+                "min_weight": min_weight,
+                "direction": direction,
+                "order": order,
+                "neighbors": neighbours,
+                "graph": {
+                    "version": adjacency.version,
+                    "entities": int(adjacency.entity_ids.shape[0]),
+                    "relations": adjacency.relation_count,
+                    "build_ms": adjacency.build_ms,
+                },
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+            }
+        )
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        notes = request.data.get("notes") if isinstance(request.data, dict) else request.data
+        if not isinstance(notes, list) or not notes:
+            return Response({"error": "notes must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(notes) > GRAPH_BULK_MAX_NOTES:
+            return Response(
+                {"error": f"At most {GRAPH_BULK_MAX_NOTES} notes per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        errors = [
+            {"position": position, "error": "content is required."}
+            for position, note in enumerate(notes)
+            if not isinstance(note, dict) or not _graph_note_content(note)[0]
+        ]
+        if errors:
+            return Response({"error": "Invalid notes.", "notes": errors[:50]}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user if request.user and request.user.is_authenticated else None
+        # Notes are chunked and embedded outside any transaction, so a failure removes the ones already written.
+        created = []
+        try:
+            for note in notes:
+                created.append(_create_graph_note(note, user))
+            with transaction.atomic():
+                graph = write_note_graph([(document.id, terms) for document, _, terms in created])
+        except Exception:
+            for document, _, _ in created:
+                document.delete()
+            raise
+
+        return Response(
+            {
+                "ok": True,
+                "document_ids": [document.id for document, _, _ in created],
+                "entities_upserted": graph["entities"],
+                "relations_upserted": graph["relations"],
+                "relations_created": graph["created_relations"],
+                "chunks_created": sum(chunking["created_chunks"] for _, chunking, _ in created),
+                "duplicates": [
+                    {"document_id": document.id, "duplicate_of": document.metadata["duplicate_of"]}
+                    for document, _, _ in created
+                    if "duplicate_of" in document.metadata
+                ],
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
     def _ingest_payload(self, request):
-        content = str(request.data.get("content") or request.data.get("text") or "").strip()
-        context = str(request.data.get("context") or "").strip()
-        if not content:
+        if not _graph_note_content(request.data)[0]:
             return Response({"error": "content is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        metadata = {
-            "ingestion_source": "knowledge_graph",
-            "provider": request.data.get("provider"),
-            "model": request.data.get("model"),
-            "urls": request.data.get("urls") or [],
-            "mcp_adapters": request.data.get("mcp_adapters") or [],
-            "snippets": request.data.get("snippets") or [],
-        }
-        if context:
-            metadata["context_preview"] = context[:1500]
-
         user = request.user if request.user and request.user.is_authenticated else None
-        title = content.splitlines()[0][:255] if content.splitlines() else f"Knowledge graph note {KnowledgeDocument.objects.count() + 1}"
-        merged_content = content if not context else f"{content}\n\nContext:\n{context}"
-
-        with transaction.atomic():
-            document = KnowledgeDocument.objects.create(
-                source_type=KnowledgeDocument.SOURCE_OTHER,
-                title=title,
-                content=merged_content,
-                metadata=metadata,
-                created_by=user,
-            )
-            chunking = rebuild_document_chunks(document=document, chunk_size=120, overlap=20)
-
-            terms = []
-            seen_terms = set()
-            for token in _tokenize_for_entities(merged_content):
-                if token in seen_terms:
-                    continue
-                seen_terms.add(token)
-                terms.append(token)
-                if len(terms) >= 14:
-                    break
-
-            entities = []
-            for term in terms:
-                entity, _ = KnowledgeEntity.objects.get_or_create(
-                    name=term,
-                    entity_type="term",
-                    defaults={"metadata": {"source": "knowledge_graph_ingest"}},
-                )
-                entities.append(entity)
-
-            relation_count = 0
-            for idx in range(len(entities) - 1):
-                source = entities[idx]
-                target = entities[idx + 1]
-                relation, created = KnowledgeRelation.objects.get_or_create(
-                    source_entity=source,
-                    target_entity=target,
-                    relation_type="related_to",
-                    defaults={"weight": 1.0, "metadata": {"source_document_id": document.id}},
-                )
-                if not created:
-                    relation.weight = round(float(relation.weight) + 0.1, 3)
-                    relation.save(update_fields=["weight"])
-                relation_count += 1
+        document, chunking, terms = _create_graph_note(request.data, user)
+        try:
+            with transaction.atomic():
+                write_note_graph([(document.id, terms)])
+        except Exception:
+            document.delete()
+            raise
 
         return Response(
             {
                 "ok": True,
                 "document_id": document.id,
-                "entities_upserted": len(entities),
-                "relations_upserted": relation_count,
+                "entities_upserted": len(terms),
+                "relations_upserted": max(len(terms) - 1, 0),
                 "chunking": chunking,
+                "duplicate_of": document.metadata.get("duplicate_of"),
             },
             status=status.HTTP_201_CREATED,
         )
 
 
+def _graph_note_content(data):
+    content = str(data.get("content") or data.get("text") or "").strip()
+    context = str(data.get("context") or "").strip()
+    return content, context
+
+
+def _create_graph_note(data, user):
+    content, context = _graph_note_content(data)
+    metadata = {
+        "ingestion_source": "knowledge_graph",
+        "provider": data.get("provider"),
+        "model": data.get("model"),
+        "urls": data.get("urls") or [],
+        "mcp_adapters": data.get("mcp_adapters") or [],
+        "snippets": data.get("snippets") or [],
+    }
+    if context:
+        metadata["context_preview"] = context[:1500]
+
+    title = content.splitlines()[0][:255] if content.splitlines() else f"Knowledge graph note {KnowledgeDocument.objects.count() + 1}"
+    merged_content = content if not context else f"{content}\n\nContext:\n{context}"
+    duplicates = find_near_duplicates(merged_content)
+    if duplicates:
+        metadata["duplicate_of"] = duplicates[0].document_id
+
+    document = KnowledgeDocument.objects.create(
+        source_type=KnowledgeDocument.SOURCE_OTHER,
+        title=title,
+        content=merged_content,
+        metadata=metadata,
+        created_by=user,
+    )
+    try:
+        chunking = rebuild_document_chunks(document=document, chunk_size=120, overlap=20)
+    except Exception:
+        document.delete()
+        raise
+    return document, chunking, note_terms(entity_tokens(merged_content))
+
+
+class KnowledgeTransferViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        response = StreamingHttpResponse(export_lines(), content_type="application/x-ndjson")
+        response["Content-Disposition"] = f'attachment; filename="knowledge-{timezone.now():%Y%m%d-%H%M%S}.jsonl"'
+        return response
+
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_knowledge(self, request):
+        # The JSONL body is read line by line from the request stream instead of request.data.
+        content_type = (request.content_type or "").split(";")[0].strip().lower()
+        if content_type in JSONL_CONTENT_TYPES:
+            lines = request.stream or []
+        elif "file" in request.FILES:
+            lines = request.FILES["file"]
+        else:
+            return Response(
+                {"error": "Send a JSONL body or a JSONL file upload."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        user = request.user if request.user and request.user.is_authenticated else None
+        try:
+            stats = import_lines(lines, user=user)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"ok": True, **stats}, status=status.HTTP_201_CREATED)
+
+
 class AgentActionProposalViewSet(viewsets.ModelViewSet):
     queryset = AgentActionProposal.objects.select_related("created_by", "approved_by").prefetch_related("traces")
     serializer_class = AgentActionProposalSerializer
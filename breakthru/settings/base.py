@@ -113,6 +113,9 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Ingest workers write concurrently; taking the write lock at BEGIN makes them queue on the
+        # busy timeout instead of failing when a read transaction cannot be upgraded.
+        "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 20},
     }
 }
 